@@ -6,8 +6,13 @@ from app.models.project import Project
 from app.models.chat import ChatMessage
 from app.schemas.chat import ChatRequest, ChatMessageResponse, ChatHistoryResponse
 from app.services.rag_service import rag_service
+from app.services.vectorstore_service import EmbeddingModelMismatch
 from app.core.config import settings
+import asyncio
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -41,11 +46,24 @@ async def chat_with_project(
     db.commit()
     
     # Generate response
-    result = await rag_service.chat(
-        project_id=project.id,
-        query=request.message,
-        chat_history=[{"role": m.role, "content": m.content} for m in history]
-    )
+    try:
+        result = await rag_service.chat(
+            project_id=project.id,
+            query=request.message,
+            chat_history=[{"role": m.role, "content": m.content} for m in history],
+            filters=request.filters.model_dump(exclude_none=True) if request.filters else None
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Search timed out, please try again")
+    except EmbeddingModelMismatch as e:
+        # Index predates the current embedding model: migrate it in the background
+        from app.api.routes.projects import queue_reindex
+        job = queue_reindex(db, project.id)
+        logger.warning(f"⚠️ {e}, reindex job {job.id}")
+        raise HTTPException(
+            status_code=409,
+            detail="This project is being re-indexed for a new embedding model, please try again shortly"
+        )
     
     # Save assistant message
     assistant_message = ChatMessage(
@@ -64,7 +82,8 @@ async def chat_with_project(
     
     return {
         "message": assistant_message,
-        "sources": result["sources"]
+        "sources": result["sources"],
+        "context_tokens": result.get("context_tokens")
     }
 
 @router.get("/projects/{slug}/chat/history", response_model=ChatHistoryResponse)
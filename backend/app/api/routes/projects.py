@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from app.db.database import get_db
-from app.models.project import Project, ProjectVersion
+from app.models.project import Project, ProjectVersion, File
 from app.models.job import Job
 from app.schemas.project import (
     ProjectResponse,
@@ -10,6 +10,8 @@ from app.schemas.project import (
     ProjectCreate,
     ProjectUpdate
 )
+from app.services.vectorstore_service import vectorstore_service
+from app.services.lexical_index import lexical_index
 from typing import Optional
 
 router = APIRouter()
@@ -93,6 +95,38 @@ async def regenerate_readme(slug: str, db: Session = Depends(get_db)):
         "status": "pending"
     }
 
+@router.post("/{slug}/reindex")
+async def reindex_project(slug: str, db: Session = Depends(get_db)):
+    """Re-embed the project's chunks with the configured embedding model"""
+    project = db.query(Project).filter(Project.slug == slug).first()
+    
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    job = queue_reindex(db, project.id)
+    
+    return {
+        "job_id": job.id,
+        "message": "Reindex started",
+        "status": job.status
+    }
+
+def queue_reindex(db: Session, project_id: str) -> Job:
+    """Reindex job for the project, reusing one that is already pending or running"""
+    job = db.query(Job).filter(
+        Job.project_id == project_id,
+        Job.type == "reindex",
+        Job.status.in_(["pending", "processing"])
+    ).first()
+    if job:
+        return job
+    
+    job = Job(project_id=project_id, type="reindex")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
 @router.delete("/{slug}")
 async def delete_project(slug: str, db: Session = Depends(get_db)):
     """Delete project"""
@@ -101,7 +135,43 @@ async def delete_project(slug: str, db: Session = Depends(get_db)):
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    project_id = project.id
     db.delete(project)
     db.commit()
     
-    return {"message": "Project deleted successfully"}
\ No newline at end of file
+    # Vectors and keyword postings live outside the database
+    await vectorstore_service.delete_collection(project_id)
+    lexical_index.delete(project_id)
+    
+    return {"message": "Project deleted successfully"}
+
+@router.delete("/{slug}/files/{file_id}")
+async def delete_project_file(slug: str, file_id: str, db: Session = Depends(get_db)):
+    """Remove one file's chunks and vectors from a project (runs as a job on the worker)"""
+    project = db.query(Project).filter(Project.slug == slug).first()
+    
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    file_record = db.query(File).filter(
+        File.id == file_id,
+        File.project_id == project.id
+    ).first()
+    
+    if not file_record:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    job = Job(
+        project_id=project.id,
+        type="delete_file",
+        input_data={"file_id": file_record.id}
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    return {
+        "job_id": job.id,
+        "message": "File removal started",
+        "status": "pending"
+    }
@@ -5,6 +5,9 @@ from typing import Optional, List
 from app.db.database import get_db
 from app.models.project import Project
 from app.schemas.project import ProjectResponse
+from app.core.config import settings
+from app.services.embedding_service import embedding_service
+from app.services.vectorstore_service import vectorstore_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -56,6 +59,67 @@ async def search_projects(
     }
 
 
+
+@router.get("/search/semantic")
+async def semantic_search(
+    q: str = Query(..., min_length=1, description="Search query"),
+    course: Optional[str] = None,
+    module: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Semantic search over lecture content across projects
+    Scoped by course and/or module; every matching project's collection is
+    queried in parallel and the closest chunks overall are returned
+    """
+    
+    query = db.query(Project)
+    
+    # Apply filters
+    if course:
+        query = query.filter(Project.course_name == course)
+    
+    if module:
+        query = query.filter(Project.module_name == module)
+    
+    # Newest projects first when a scope has more than SEMANTIC_SEARCH_MAX_PROJECTS
+    projects = query.order_by(Project.created_at.desc(), Project.id).limit(
+        settings.SEMANTIC_SEARCH_MAX_PROJECTS + 1
+    ).all()
+    truncated = len(projects) > settings.SEMANTIC_SEARCH_MAX_PROJECTS
+    projects = projects[:settings.SEMANTIC_SEARCH_MAX_PROJECTS]
+    if truncated:
+        logger.warning(f"⚠️ Semantic search limited to the newest {len(projects)} projects")
+    by_id = {str(project.id): project for project in projects}
+    
+    query_embedding = await embedding_service.embed_query(q)
+    found = await vectorstore_service.search_projects(list(by_id), query_embedding, top_k=limit)
+    
+    results = []
+    for hit in found["results"]:
+        project = by_id[hit["project_id"]]
+        results.append({
+            **hit,
+            "project_slug": project.slug,
+            "project_name": project.name,
+        })
+    
+    logger.info(
+        f"Semantic search for '{q}' over {len(projects)} projects returned {len(results)} results"
+    )
+    
+    return {
+        "query": q,
+        "results": results,
+        "total": len(results),
+        "projects_searched": found["searched"],
+        "projects_timed_out": [by_id[project_id].slug for project_id in found["timed_out"]],
+        "projects_failed": [by_id[project_id].slug for project_id in found["failed"]],
+        "projects_truncated": truncated
+    }
+
+
 @router.get("/filters")
 async def get_filters(db: Session = Depends(get_db)):
     """
@@ -111,6 +111,87 @@ async def upload_files(
         "status": "pending"
     }
 
+@router.post("/projects/{slug}/files", response_model=UploadResponse)
+async def add_project_files(
+    slug: str,
+    files: list[UploadFile] = File(...),
+    db: Session = Depends(get_db)
+):
+    """Add files to an existing project; only the new files are chunked and embedded"""
+    
+    project = db.query(Project).filter(Project.slug == slug).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    file_paths = []
+    for file in files:
+        file_path = await save_upload_file(file, project.id)
+        file_paths.append(file_path)
+    
+    job = Job(
+        project_id=project.id,
+        type="upload",
+        input_data={
+            "files": file_paths,
+            "project_name": project.name,
+            "incremental": True
+        }
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    return {
+        "job_id": job.id,
+        "project_id": project.id,
+        "message": f"{len(file_paths)} files added. Processing started.",
+        "status": "pending"
+    }
+
+@router.put("/projects/{slug}/files/{file_id}", response_model=UploadResponse)
+async def replace_project_file(
+    slug: str,
+    file_id: str,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """Replace one file; its old chunks and vectors are dropped once the new version is indexed"""
+    from app.models.project import File as ProjectFile
+    
+    project = db.query(Project).filter(Project.slug == slug).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    existing = db.query(ProjectFile).filter(
+        ProjectFile.id == file_id,
+        ProjectFile.project_id == project.id
+    ).first()
+    if not existing:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    file_path = await save_upload_file(file, project.id)
+    
+    job = Job(
+        project_id=project.id,
+        type="upload",
+        input_data={
+            "files": [file_path],
+            "project_name": project.name,
+            "incremental": True,
+            "replaces": {os.path.basename(file_path): existing.id}
+        }
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    return {
+        "job_id": job.id,
+        "project_id": project.id,
+        "message": "Replacement uploaded. Processing started.",
+        "status": "pending"
+    }
+
 @router.get("/jobs/{job_id}")
 async def get_job_status(job_id: str, db: Session = Depends(get_db)):
     """Get job status"""
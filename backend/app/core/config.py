@@ -23,7 +23,21 @@ class Settings(BaseSettings):
     # Chroma Vector DB
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8000
-    VECTOR_DB: str = "chroma"  # Options: chroma, qdrant
+    VECTOR_DB: str = "chroma"  # Options: chroma, local
+    LOCAL_VECTOR_DIR: str = "/app/vectors"  # VECTOR_DB=local: one directory per project, shared by web and worker
+    VECTOR_QUANTIZATION: str = "none"  # VECTOR_DB=local resident vectors: none, float16, int8
+    LOCAL_VECTOR_IVF_MIN_ROWS: int = 50000  # Use the approximate (IVF) index from this many rows
+    LOCAL_VECTOR_IVF_NPROBE: int = 8  # IVF buckets scored per query
+    LOCAL_VECTOR_COMPACT_MIN_DEAD: int = 1000  # Compact once this many rows are deleted/superseded...
+    LOCAL_VECTOR_COMPACT_RATIO: float = 0.3  # ...and they make up this share of the collection
+    CHROMA_MAX_CONCURRENCY: int = 8  # Concurrent Chroma calls per process
+    CHROMA_QUERY_TIMEOUT: float = 10.0  # Seconds for lookups and queries
+    CHROMA_WRITE_TIMEOUT: float = 60.0  # Seconds per upsert batch
+    CHROMA_COLLECTION_CACHE_TTL: int = 300  # Seconds a collection handle is reused
+    VECTOR_WRITE_BATCH_SIZE: int = 128  # Vectors per embed + upsert batch
+    VECTOR_WRITE_MAX_IN_FLIGHT: int = 2  # Upserts pending while the next batch is embedded
+    VECTOR_WRITE_RETRIES: int = 3  # Retries per failed upsert batch
+    VECTOR_WRITE_RETRY_DELAY: float = 1.0  # Seconds before the first retry, doubled each time
     
     # Application Mode
     MODE: str = "local"  # Options: local, cloud
@@ -61,6 +75,13 @@ class Settings(BaseSettings):
     EMBEDDINGS_PROVIDER: str = "sentence-transformers"
     EMBEDDING_MODEL: str = "paraphrase-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384
+    EMBEDDING_BATCH_SIZE: int = 64  # Max texts per model forward pass
+    EMBEDDING_BATCH_TOKENS: int = 16384  # Max padded tokens (texts x longest) per forward pass
+    EMBEDDING_THREADS: int = 0  # torch intra-op threads, 0 = torch default
+    EMBEDDING_EXECUTOR: str = "thread"  # Options: thread, process
+    EMBEDDING_WORKERS: int = 1  # Concurrent inference calls (each uses EMBEDDING_THREADS)
+    EMBEDDING_QUERY_MAX_DELAY_MS: float = 5  # Wait for concurrent chat queries to batch with, 0 = off
+    EMBEDDING_QUERY_MAX_BATCH: int = 64  # Dispatch a query batch early once this many are waiting
     
     # OCR Configuration
     OCR_PROVIDER: str = "tesseract"  # Options: tesseract, trocr, paddle
@@ -101,16 +122,37 @@ class Settings(BaseSettings):
     CHUNK_OVERLAP: int = 200
     MIN_CHUNK_SIZE: int = 100
     PRESERVE_CODE_BLOCKS: bool = True
+    CHUNK_STREAM_BUFFER_CHARS: int = 65536  # Text window held in memory by chunk_stream
+    CHUNK_BATCH_SIZE: int = 256  # Chunks per DB insert / embedding batch
+    CHUNK_PARALLEL: bool = True  # Chunk multi-file uploads on a process pool
+    CHUNK_WORKERS: int = 0  # Chunking processes, 0 = one per CPU core
+    CHUNK_PARALLEL_MAX_CHARS: int = 32 * 1024 * 1024  # Parsed text held for the pool before it is chunked
     
     # RAG
-    RAG_TOP_K: int = 10
-    RAG_SIMILARITY_THRESHOLD: float = 0.7
-    CONTEXT_WINDOW: int = 8000
+    RAG_TOP_K: int = 5  # Chunks handed to the LLM per chat question
+    RAG_CANDIDATES: int = 30  # Candidates fetched per retriever before thresholding and MMR
+    RAG_SIMILARITY_THRESHOLD: float = 0.3  # Minimum query/chunk cosine similarity (keyword hits exempt)
+    RAG_MMR_LAMBDA: float = 0.7  # MMR trade-off, 1.0 = pure relevance, 0.0 = pure diversity
+    HYBRID_SEARCH: bool = True  # Fuse BM25 keyword hits with vector hits in chat retrieval
+    RRF_K: int = 60  # Reciprocal rank fusion constant
+    SEMANTIC_SEARCH_CONCURRENCY: int = 8  # Project collections queried at once by cross-project search
+    SEMANTIC_SEARCH_PROJECT_TIMEOUT: float = 3.0  # Seconds per project query before it is skipped
+    SEMANTIC_SEARCH_DEADLINE: float = 8.0  # Seconds for the whole fan-out, then partial results are returned
+    SEMANTIC_SEARCH_MAX_PROJECTS: int = 200  # Projects searched per request
+    CONTEXT_WINDOW: int = 8000  # Prompt plus output tokens per LLM call
+    CHAT_MAX_OUTPUT_TOKENS: int = 500  # Reserved out of CONTEXT_WINDOW for a chat answer
+    README_MAX_OUTPUT_TOKENS: int = 3000  # Reserved out of CONTEXT_WINDOW for a README
+    README_MAP_OUTPUT_TOKENS: int = 600  # Reserved out of CONTEXT_WINDOW per section summary
+    README_MAP_CONCURRENCY: int = 4  # Section summaries generated at once
+    README_MAX_REDUCE_LEVELS: int = 3  # Summary-of-summaries rounds before the README call truncates
     MAX_CHAT_HISTORY: int = 10
     
     # Storage
     UPLOAD_DIR: str = "/app/uploads"
     MODELS_DIR: str = "/app/models"
+    LEXICAL_INDEX_DIR: str = "/app/lexical"  # BM25 postings, one directory per project, shared by web and worker
+    LEXICAL_SEGMENT_DOCS: int = 20000  # Chunks buffered before a postings segment is written
+    LEXICAL_MAX_SEGMENTS: int = 8  # Merge a project's segments once there are more than this
     TEMP_DIR: str = "/tmp/lecture-docs"
     
     # Scaling
@@ -123,6 +165,13 @@ class Settings(BaseSettings):
     REDIS_MAX_MEMORY: str = "512mb"
     CACHE_TTL_SECONDS: int = 3600
     ENABLE_RESULT_CACHE: bool = True
+    ENABLE_EMBEDDING_CACHE: bool = True
+    EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # In-process LRU bound
+    EMBEDDING_CACHE_TTL_SECONDS: int = 30 * 24 * 3600  # Redis tier; vectors only change with the model
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 4096  # In-process LRU of ranked chat retrievals (ENABLE_RESULT_CACHE)
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 24 * 3600  # Redis tier; re-ingest invalidates via the index version
+    SUMMARY_CACHE_MAX_ENTRIES: int = 2048  # In-process LRU of README section summaries
+    SUMMARY_CACHE_TTL_SECONDS: int = 30 * 24 * 3600  # Redis tier; keys change with the summarized text
     
     # Features
     ENABLE_YOUTUBE_UPLOAD: bool = True
@@ -1,5 +1,5 @@
 import redis.asyncio as redis
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 import json
 from app.core.config import settings
 import logging
@@ -13,6 +13,8 @@ class RedisClient:
     
     def __init__(self):
         self.redis: Optional[redis.Redis] = None
+        # Second connection without response decoding, for packed binary values
+        self.binary: Optional[redis.Redis] = None
     
     async def connect(self):
         """Initialize Redis connection"""
@@ -22,6 +24,7 @@ class RedisClient:
                 encoding="utf-8",
                 decode_responses=True
             )
+            self.binary = redis.from_url(settings.REDIS_URL, decode_responses=False)
             # Test connection
             await self.redis.ping()
             logger.info("✅ Redis connected successfully")
@@ -31,6 +34,9 @@ class RedisClient:
     
     async def disconnect(self):
         """Close Redis connection"""
+        if self.binary:
+            await self.binary.close()
+            self.binary = None
         if self.redis:
             await self.redis.close()
             logger.info("Redis disconnected")
@@ -98,6 +104,30 @@ class RedisClient:
                 return value
         return None
     
+    async def mget_bytes(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Get raw binary values for many keys in one round trip (all None if not connected)"""
+        if not keys or self.binary is None:
+            return [None] * len(keys)
+        try:
+            return await self.binary.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis MGET error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    async def mset_bytes(self, values: Dict[str, bytes], expire: Optional[int] = None) -> bool:
+        """Set raw binary values for many keys in one pipelined round trip"""
+        if not values or self.binary is None:
+            return False
+        try:
+            async with self.binary.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(key, value, ex=expire or settings.CACHE_TTL_SECONDS)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis MSET error for {len(values)} keys: {e}")
+            return False
+    
     async def increment(self, key: str) -> int:
         """Increment a counter"""
         try:
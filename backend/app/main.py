@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.redis_client import redis_client
 from app.db.database import init_db
+from app.services.embedding_service import shutdown_embedding_executor
+from app.services.vectorstore_service import vectorstore_service
 from app.api.routes import auth, upload, projects, chat, health,search
 import logging
 
@@ -43,6 +45,8 @@ async def startup():
 @app.on_event("shutdown")
 async def shutdown():
     await redis_client.disconnect()
+    shutdown_embedding_executor()
+    vectorstore_service.shutdown()
 
 @app.get("/")
 async def root():
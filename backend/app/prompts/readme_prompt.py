@@ -33,6 +33,19 @@ ANALYZE the content provided and create appropriate documentation based on what
 Create professional, comprehensive documentation that captures ALL key information."""
 
 
+def get_section_summary_prompt() -> str:
+    """Map-step prompt: condense one part of a large upload for README writing"""
+    
+    return """You are condensing one part of a larger document so a README can later be written from many such parts.
+
+Write a dense Markdown summary of the content provided:
+- Keep EVERY key concept, definition, name, skill, command, API, formula and example
+- Keep exact identifiers, code signatures and short code snippets verbatim
+- Drop repetition, filler and formatting noise
+- Use short headers and bullet points, no introduction or conclusion
+- Do not mention that this is a summary or a part of something larger"""
+
+
 def get_chat_system_prompt(context: str) -> str:
     """System prompt for RAG chatbot"""
     
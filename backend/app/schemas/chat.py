@@ -27,10 +27,18 @@ class ChatMessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class RetrievalFilters(BaseModel):
+    """Metadata filters applied inside the vector query"""
+    source_files: Optional[List[str]] = None
+    is_code: Optional[bool] = None
+    min_chunk_index: Optional[int] = Field(None, ge=0)
+    max_chunk_index: Optional[int] = Field(None, ge=0)
+
 class ChatRequest(BaseModel):
     """Schema for chat request"""
     message: str = Field(..., min_length=1, max_length=10000)
     stream: bool = False
+    filters: Optional[RetrievalFilters] = None
 
 class ChatHistoryResponse(BaseModel):
     """Schema for chat history"""
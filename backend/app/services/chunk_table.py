@@ -0,0 +1,129 @@
+from array import array
+from typing import Dict, Iterator, List, Optional
+import hashlib
+
+# Bit flags stored per chunk
+FLAG_CODE_BLOCK = 1
+
+
+def content_hash(text: str, is_code: bool = False) -> str:
+    """
+    Hash of chunk text, used to collapse exact duplicates.
+
+    Prose is whitespace-normalized. Code keeps its indentation and line breaks,
+    which carry meaning; only line endings and trailing whitespace are normalized.
+    """
+    if is_code:
+        normalized = "\n".join(line.rstrip() for line in text.splitlines())
+    else:
+        normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ChunkTable:
+    """
+    Compact, column-wise chunk storage for one document.
+
+    Every chunk is a row of (start, end, token_start, token_end, line, flags) in
+    typed arrays pointing into a single shared source buffer, instead of a dict
+    holding its own copy of the content. Per-document strings (source_file,
+    source_type, language) are stored once, and structural metadata (symbol or
+    heading paths) only for the rows that have it.
+
+    Content strings and chunk dicts are only materialized on demand, e.g. batch
+    by batch for embedding and persistence. Tables pickle as one string plus a few
+    arrays, which keeps process-pool results cheap to ship back.
+    """
+
+    __slots__ = (
+        "source", "source_file", "source_type", "language",
+        "base_char", "base_token", "first_index",
+        "starts", "ends", "token_starts", "token_ends", "lines", "flags", "meta"
+    )
+
+    def __init__(
+        self,
+        source: str,
+        source_file: Optional[str] = None,
+        source_type: str = "text",
+        language: Optional[str] = None,
+        base_char: int = 0,
+        base_token: int = 0,
+        first_index: int = 0
+    ):
+        self.source = source
+        self.source_file = source_file
+        self.source_type = source_type
+        self.language = language
+        # Offsets of source within the whole document (non-zero for stream windows)
+        self.base_char = base_char
+        self.base_token = base_token
+        self.first_index = first_index
+
+        self.starts = array('q')
+        self.ends = array('q')
+        self.token_starts = array('q')
+        self.token_ends = array('q')
+        self.lines = array('q')
+        self.flags = array('B')
+        self.meta: Dict[int, Dict] = {}
+
+    def append(
+        self,
+        start: int,
+        end: int,
+        token_start: int,
+        token_end: int,
+        is_code_block: bool = False,
+        line: int = -1,
+        meta: Optional[Dict] = None
+    ):
+        """Add a chunk covering source[start:end]; line is -1 when not tracked"""
+        if meta:
+            self.meta[len(self.starts)] = meta
+        self.starts.append(start)
+        self.ends.append(end)
+        self.token_starts.append(token_start)
+        self.token_ends.append(token_end)
+        self.lines.append(line)
+        self.flags.append(FLAG_CODE_BLOCK if is_code_block else 0)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def content(self, i: int) -> str:
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def to_dict(self, i: int) -> Dict[str, any]:
+        """Materialize one chunk in the dict shape used by the rest of the pipeline"""
+        content = self.content(i)
+        chunk = {
+            "content": content,
+            "chunk_index": self.first_index + i,
+            "source_file": self.source_file,
+            "source_type": self.source_type,
+            "is_code_block": bool(self.flags[i] & FLAG_CODE_BLOCK)
+        }
+        if self.lines[i] >= 0:
+            chunk["start_line"] = self.lines[i]
+            chunk["end_line"] = self.lines[i] + content.count('\n') + 1
+        chunk.update({
+            "start_char": self.base_char + self.starts[i],
+            "end_char": self.base_char + self.ends[i],
+            "start_token": self.base_token + self.token_starts[i],
+            "end_token": self.base_token + self.token_ends[i],
+            "content_hash": content_hash(content, chunk["is_code_block"])
+        })
+        if self.language:
+            chunk["language"] = self.language
+        if i in self.meta:
+            chunk.update(self.meta[i])
+        return chunk
+
+    def iter_dicts(self, start: int = 0) -> Iterator[Dict[str, any]]:
+        """Materialize chunks lazily, one at a time"""
+        for i in range(start, len(self)):
+            yield self.to_dict(i)
+
+    def to_dicts(self) -> List[Dict[str, any]]:
+        return list(self.iter_dicts())
@@ -1,18 +1,183 @@
 import tiktoken
-from typing import List, Dict, Optional
+import asyncio
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Dict, Iterable, Iterator, Optional, Tuple, Union
 from app.core.config import settings
+from app.services.chunk_table import ChunkTable
+import ast
+import os
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# File extensions cut along symbol boundaries (python via ast, the rest by brace scanning)
+CODE_EXTENSIONS = {
+    ".py": "python",
+    ".js": "js",
+    ".jsx": "js",
+    ".ts": "ts",
+    ".tsx": "ts",
+    ".sol": "sol",
+    ".go": "go",
+    ".java": "java",
+    ".cpp": "cpp",
+    ".c": "c",
+    ".cs": "cs",
+    ".rs": "rs",
+}
+
+_CONTROL_KEYWORDS = {
+    "if", "else", "for", "while", "do", "switch", "case", "try", "catch", "finally",
+    "return", "with", "unchecked", "assembly", "select", "defer", "go", "synchronized"
+}
+
+_COMMENT_PREFIXES = ("#", "//", "/*", "*", "@")
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_LINE_BREAK = re.compile(r'\n')
+
+_MD_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_MD_FENCE = re.compile(r'^\s{0,3}(`{3,}|~{3,})')
+_MD_LIST_ITEM = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+')
+
+_DECLARATION_PATTERNS = [
+    # function foo(...) / contract Foo / class Foo / func (r *T) Foo(...) / interface Foo
+    re.compile(
+        r'\b(?:function|class|contract|interface|library|struct|enum|trait|impl|'
+        r'modifier|namespace|fn|func(?:\s*\([^)]*\))?)\s+\*?(\w+)'
+    ),
+    # const foo = (...) => {   /   foo = function (...) {
+    re.compile(
+        r'^\s*(?:export\s+)?(?:const|let|var)?\s*(\w+)\s*[:=]\s*(?:async\s*)?'
+        r'(?:function\b|\([^)]*\)\s*=>|\w+\s*=>)'
+    ),
+    # Solidity constructor/receive/fallback
+    re.compile(r'^\s*(constructor|receive|fallback)\s*\('),
+    # Methods: public int foo(...) {   /   async foo(a, b) {
+    re.compile(r'^\s*(?:[\w<>\[\],.?]+\s+)*(\w+)\s*\([^;]*\)[^;=]*\{'),
+]
+
+
+def _markdown_blocks(text: str) -> List[Tuple[int, int, str, Tuple[str, ...]]]:
+    """
+    Split markdown into (start_char, end_char, kind, heading_path) blocks in one pass.
+    
+    Kinds are heading, code (a whole fenced block), table, list and paragraph.
+    heading_path is the stack of heading titles the block sits under.
+    """
+    blocks = []
+    headings: List[Tuple[int, str]] = []
+    block = None
+    fence = None
+    pos = 0
+    
+    def path() -> Tuple[str, ...]:
+        return tuple(title for _, title in headings)
+    
+    for line in text.splitlines(keepends=True):
+        start, pos = pos, pos + len(line)
+        
+        if fence:
+            block[1] = pos
+            if fence.match(line):
+                blocks.append(tuple(block))
+                block, fence = None, None
+            continue
+        
+        opening = _MD_FENCE.match(line)
+        heading = _MD_HEADING.match(line)
+        stripped = line.strip()
+        
+        if opening or heading or not stripped:
+            if block:
+                blocks.append(tuple(block))
+                block = None
+        if opening:
+            marker = opening.group(1)
+            fence = re.compile(r'^\s{0,3}' + re.escape(marker[0]) + '{' + str(len(marker)) + r',}\s*$')
+            block = [start, pos, "code", path()]
+            continue
+        if heading:
+            level = len(heading.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading.group(2).strip()))
+            blocks.append((start, pos, "heading", path()))
+            continue
+        if not stripped:
+            continue
+        
+        if stripped.startswith('|'):
+            kind = "table"
+        elif _MD_LIST_ITEM.match(line):
+            kind = "list"
+        else:
+            kind = "paragraph"
+        if block and (
+            block[2] == kind == "table"
+            or (block[2] == "list" and kind != "table")
+            or (block[2] == "paragraph" and kind == "paragraph")
+        ):
+            block[1] = pos
+            continue
+        if block:
+            blocks.append(tuple(block))
+        block = [start, pos, kind, path()]
+    
+    # An unterminated fence runs to the end of the document
+    if block:
+        blocks.append(tuple(block))
+    return blocks
+
+
+class _Segment:
+    """Line range [start, end) of a code unit; path is set for named symbols"""
+    
+    __slots__ = ("start", "end", "path", "children")
+    
+    def __init__(self, start: int, end: int, path: Optional[str] = None, children=None):
+        self.start = start
+        self.end = end
+        self.path = path
+        self.children = children or []
+
+
+def _strip_code_line(line: str, in_comment: bool) -> Tuple[str, bool]:
+    """Drop string literals and comments from a line so braces can be counted"""
+    if in_comment:
+        close = line.find('*/')
+        if close < 0:
+            return "", True
+        line = line[close + 2:]
+    line = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`[^`]*`', '""', line)
+    line = re.sub(r'/\*.*?\*/', '', line)
+    line = line.split('//', 1)[0]
+    open_comment = line.find('/*')
+    if open_comment >= 0:
+        return line[:open_comment], True
+    return line, False
+
+
+def _declaration_name(line: str) -> Optional[str]:
+    """Name declared by a block-opening line, or None for control-flow blocks"""
+    for pattern in _DECLARATION_PATTERNS:
+        match = pattern.search(line)
+        if match and match.group(1) not in _CONTROL_KEYWORDS:
+            return match.group(1)
+    return None
+
+
 class ChunkerService:
     """
     Smart chunking service that:
     - Respects code block boundaries
     - Preserves function/method definitions
-    - Uses token-based chunking
-    - Maintains context overlap
+    - Uses token-based chunking (each document is encoded once)
+    - Maintains context overlap as a token offset range
     """
     
     def __init__(self):
@@ -30,25 +195,9 @@ class ChunkerService:
     ) -> List[Dict[str, any]]:
         """Chunk text intelligently"""
         
-        # FIX: Validate input
-        if not text or text.strip() == "":
-            logger.warning(f"⚠️ Empty text received for {source_file}, creating placeholder chunk")
-            return [{
-                "content": f"[Content extraction failed for {source_file or 'file'}]",
-                "chunk_index": 0,
-                "source_file": source_file,
-                "source_type": source_type,
-                "is_code_block": False
-            }]
-        
-        print(f"📄 chunk_text called with text length: {len(text)}")
+        print(f"📄 chunk_text called with text length: {len(text or '')}")
         
-        is_code = self._is_code(text, source_type)
-        
-        if is_code and settings.PRESERVE_CODE_BLOCKS:
-            chunks = self._chunk_code(text, source_file)
-        else:
-            chunks = self._chunk_text_basic(text, source_file)
+        chunks = self.chunk_table(text, source_type, source_file).to_dicts()
         
         print(f"📄 Generated {len(chunks)} chunks")
         if chunks:
@@ -59,6 +208,80 @@ class ChunkerService:
     
         return chunks 
     
+    def chunk_table(
+        self,
+        text: str,
+        source_type: str = "text",
+        source_file: Optional[str] = None
+    ) -> ChunkTable:
+        """Chunk text into a compact ChunkTable that shares text as its source buffer"""
+        
+        # FIX: Validate input
+        if not text or text.strip() == "":
+            logger.warning(f"⚠️ Empty text received for {source_file}, creating placeholder chunk")
+            placeholder = f"[Content extraction failed for {source_file or 'file'}]"
+            table = ChunkTable(placeholder, source_file, source_type)
+            table.append(0, len(placeholder), 0, 0)
+            return table
+        
+        mode = self._chunk_mode(text, source_type, source_file)
+        if mode == "markdown":
+            return self._chunk_markdown(text, source_file)
+        if mode == "code":
+            return self._chunk_code(text, source_file, source_type)
+        return self._chunk_text_basic(text, source_file)
+    
+    async def chunk_documents(
+        self,
+        documents: List[Tuple[str, str, Optional[str]]],
+        return_exceptions: bool = False
+    ) -> AsyncIterator[Union[ChunkTable, Exception]]:
+        """
+        Chunk several (text, source_type, source_file) documents on the process pool
+        into ChunkTables.
+        
+        Results are yielded in input order, so chunk indices match the serial path,
+        and a caller can store file N while later files are still being chunked.
+        Runs serially when CHUNK_PARALLEL is off or the pool breaks. With
+        return_exceptions, a document that fails to chunk yields its exception in
+        place of a table instead of ending the iteration.
+        """
+        def chunk_serially(pending):
+            for text, source_type, source_file in pending:
+                try:
+                    yield self.chunk_table(text, source_type, source_file)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    yield e
+        
+        pool = get_chunk_pool() if settings.CHUNK_PARALLEL and len(documents) > 1 else None
+        if pool is None:
+            for table in chunk_serially(documents):
+                yield table
+            return
+        
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(pool, _chunk_in_worker, text, source_type, source_file)
+            for text, source_type, source_file in documents
+        ]
+        
+        for i, future in enumerate(futures):
+            try:
+                table = await future
+            except BrokenProcessPool as e:
+                logger.warning(f"⚠️ Chunk pool broke ({e}), chunking remaining files serially")
+                shutdown_chunk_pool()
+                for table in chunk_serially(documents[i:]):
+                    yield table
+                return
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                table = e
+            yield table
+    
     def _is_code(self, text: str, source_type: str) -> bool:
         if source_type in ["code", "python", "javascript", "solidity"]:
             return True
@@ -80,102 +303,551 @@ class ChunkerService:
         
         return False
     
+    def chunk_stream(
+        self,
+        segments: Iterable[str],
+        source_type: str = "text",
+        source_file: Optional[str] = None
+    ) -> Iterator[Dict[str, any]]:
+        """
+        Chunk an iterator of text segments (file blocks, transcript segments, PDF pages)
+        and yield chunks as soon as they are complete.
+        
+        Only about CHUNK_STREAM_BUFFER_CHARS of text plus the unfinished tail is held
+        in memory. Offsets are relative to the concatenation of all segments; the tail
+        carried into the next window is the only text that gets encoded twice. Code and
+        markdown are the exception: they are buffered whole so they can be cut at
+        symbol and section boundaries.
+        """
+        window = max(settings.CHUNK_STREAM_BUFFER_CHARS, 1)
+        buffer = ""
+        pending: List[str] = []
+        pending_chars = 0
+        mode = None
+        base_char = base_token = 0
+        next_index = 0
+        
+        def flush(final: bool):
+            nonlocal buffer, base_char, base_token, next_index
+            table, resume_char, resume_token = self._split_window(
+                buffer, False, source_file, final, base_char, base_token, next_index
+            )
+            base_char += resume_char
+            base_token += resume_token
+            next_index += len(table)
+            buffer = buffer[resume_char:]
+            return table.iter_dicts()
+        
+        for segment in segments:
+            if not segment:
+                continue
+            pending.append(segment)
+            pending_chars += len(segment)
+            if pending_chars < window:
+                continue
+            
+            buffer += "".join(pending)
+            pending, pending_chars = [], 0
+            if mode is None:
+                mode = self._chunk_mode(buffer, source_type, source_file)
+            if mode != "text":
+                # Structure needs the whole document; code and notes uploads are size-capped
+                continue
+            yield from flush(final=False)
+        
+        buffer += "".join(pending)
+        pending = []
+        if next_index == 0 and (not buffer.strip() or mode != "text"):
+            yield from self.chunk_text(buffer, source_type, source_file)
+            return
+        yield from flush(final=True)
+    
+    def _chunk_mode(self, text: str, source_type: str, source_file: Optional[str]) -> str:
+        """Pick the chunker for a document: "markdown", "code" or "text" """
+        if self._is_markdown(text, source_type, source_file):
+            return "markdown"
+        if self._is_code(text, source_type) and settings.PRESERVE_CODE_BLOCKS:
+            return "code"
+        return "text"
+    
+    def _is_markdown(self, text: str, source_type: str, source_file: Optional[str]) -> bool:
+        ext = os.path.splitext(source_file or "")[1].lower()
+        if ext in (".md", ".markdown", ".mdx") or source_type == "markdown":
+            return True
+        if source_type != "text" or ext in CODE_EXTENSIONS:
+            return False
+        # Plain text with ATX headings or fenced code is treated as notes
+        return re.search(r'^(?:#{1,6}\s+\S|\s{0,3}(?:```|~~~))', text, re.MULTILINE) is not None
+    
     def _chunk_code(
         self,
         code: str,
-        source_file: Optional[str]
-    ) -> List[Dict[str, any]]:
-        chunks = []
+        source_file: Optional[str],
+        source_type: str = "code"
+    ) -> ChunkTable:
+        """
+        Cut code along function/class boundaries.
+        
+        Python is parsed with ast; brace languages are scanned for declaration
+        blocks. Adjacent small symbols are packed together, oversized ones are split
+        into their members, and leaves that are still too large fall back to line
+        windows. Unknown languages only get line windows.
+        """
+        language = self._code_language(source_file, source_type)
+        segments = None
+        if language == "python":
+            segments = self._python_segments(code)
+        elif language:
+            segments = self._brace_segments(code)
+        
+        if not segments:
+            table, _, _ = self._split_window(code, True, source_file)
+            table.language = language
+            return table
+        
+        offsets = self._token_offsets(code)
+        line_starts = [0] + [m.end() for m in re.finditer(r'\n', code)]
+        spans = []
+        self._pack_segments(offsets, line_starts, segments, "", spans)
+        return self._build_table(code, offsets, spans, True, source_file, language=language)
+    
+    def _code_language(self, source_file: Optional[str], source_type: str) -> Optional[str]:
+        """Language key for structural chunking, or None when only line windows apply"""
+        ext = os.path.splitext(source_file or "")[1].lower()
+        if ext in CODE_EXTENSIONS:
+            return CODE_EXTENSIONS[ext]
+        return {"python": "python", "javascript": "js", "solidity": "sol"}.get(source_type)
+    
+    def _python_segments(self, code: str) -> Optional[List[_Segment]]:
+        """Statements of a Python module as a segment tree"""
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            return None
+        
+        def collect(body, parent: str) -> List[_Segment]:
+            segments = []
+            for node in body:
+                start = node.lineno - 1
+                for decorator in getattr(node, "decorator_list", []):
+                    start = min(start, decorator.lineno - 1)
+                end = node.end_lineno
+                
+                # Several statements on one line belong to the same segment
+                if segments and start < segments[-1].end:
+                    segments[-1].end = max(segments[-1].end, end)
+                    continue
+                
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    path = f"{parent}.{node.name}" if parent else node.name
+                    segments.append(_Segment(start, end, path, collect(node.body, path)))
+                else:
+                    segments.append(_Segment(start, end))
+            return segments
+        
         lines = code.split('\n')
-        current_chunk = []
-        current_tokens = 0
-        chunk_index = 0
+        return self._cover(collect(tree.body, ""), 0, len(lines), lines)
+    
+    def _brace_segments(self, code: str) -> Optional[List[_Segment]]:
+        """Declaration blocks of a brace language (JS/TS/Solidity/Go/Java/...) as a segment tree"""
+        lines = code.split('\n')
+        root: List[_Segment] = []
+        stack: List[Tuple[_Segment, int]] = []
+        depth = 0
+        in_comment = False
         
         for i, line in enumerate(lines):
-            line_tokens = self._count_tokens(line)
+            stripped, in_comment = _strip_code_line(line, in_comment)
+            before = depth
+            depth += stripped.count('{') - stripped.count('}')
+            
+            if depth > before:
+                name = _declaration_name(stripped)
+                if name:
+                    parent = stack[-1][0].path if stack else ""
+                    path = f"{parent}.{name}" if parent else name
+                    stack.append((_Segment(i, i + 1, path, []), before))
+            
+            # Close every symbol whose block ended on this line
+            while stack and depth <= stack[-1][1]:
+                segment, _ = stack.pop()
+                segment.end = i + 1
+                (stack[-1][0].children if stack else root).append(segment)
+        
+        # Unbalanced braces: close what is left at end of file
+        while stack:
+            segment, _ = stack.pop()
+            segment.end = len(lines)
+            (stack[-1][0].children if stack else root).append(segment)
+        
+        if not root:
+            return None
+        return self._cover(root, 0, len(lines), lines)
+    
+    def _cover(
+        self,
+        segments: List[_Segment],
+        start: int,
+        end: int,
+        lines: List[str]
+    ) -> List[_Segment]:
+        """
+        Make segments tile [start, end) exactly.
+        
+        Gap lines become plain segments, except the comment/decorator lines directly
+        above a symbol, which stay attached to that symbol.
+        """
+        covered = []
+        cursor = start
+        for segment in sorted(segments, key=lambda seg: seg.start):
+            segment.start = max(segment.start, cursor)
+            if segment.end <= segment.start:
+                continue
             
-            if current_tokens + line_tokens > settings.CHUNK_SIZE and current_chunk:
-                chunk_text = '\n'.join(current_chunk)
-                chunks.append({
-                    "content": chunk_text,
-                    "chunk_index": chunk_index,
-                    "source_file": source_file,
-                    "source_type": "code",
-                    "is_code_block": True,
-                    "start_line": i - len(current_chunk),
-                    "end_line": i
-                })
+            if segment.start > cursor:
+                attach = segment.start
+                if segment.path:
+                    while attach > cursor and lines[attach - 1].lstrip().startswith(_COMMENT_PREFIXES):
+                        attach -= 1
+                if attach > cursor:
+                    covered.append(_Segment(cursor, attach))
+                segment.start = attach
+            
+            covered.append(segment)
+            cursor = segment.end
+        
+        if cursor < end:
+            covered.append(_Segment(cursor, end))
+        
+        for segment in covered:
+            if segment.children:
+                segment.children = self._cover(segment.children, segment.start, segment.end, lines)
+        return covered
+    
+    def _pack_segments(
+        self,
+        offsets: List[int],
+        line_starts: List[int],
+        segments: List[_Segment],
+        parent: str,
+        spans: List[Tuple[int, int, Dict]]
+    ):
+        """
+        Greedily pack consecutive segments into spans of at most CHUNK_SIZE tokens,
+        recursing into oversized symbols and line-splitting oversized leaves.
+        """
+        size = max(settings.CHUNK_SIZE, 1)
+        
+        def token_at(line: int) -> int:
+            if line >= len(line_starts):
+                return len(offsets)
+            return bisect_left(offsets, line_starts[line])
+        
+        group: List[_Segment] = []
+        
+        def flush():
+            if not group:
+                return
+            named = [seg.path for seg in group if seg.path]
+            spans.append((
+                token_at(group[0].start),
+                token_at(group[-1].end),
+                {"symbol_path": named[0] if len(named) == 1 else parent, "symbols": named}
+            ))
+            group.clear()
+        
+        for segment in segments:
+            start_token, end_token = token_at(segment.start), token_at(segment.end)
+            
+            if end_token - start_token > size:
+                flush()
+                if segment.children:
+                    self._pack_segments(
+                        offsets, line_starts, segment.children, segment.path, spans
+                    )
+                    continue
                 
-                overlap_lines = int(len(current_chunk) * (settings.CHUNK_OVERLAP / settings.CHUNK_SIZE))
-                current_chunk = current_chunk[-overlap_lines:] if overlap_lines > 0 else []
-                current_tokens = self._count_tokens('\n'.join(current_chunk))
-                chunk_index += 1
+                path = segment.path or parent
+                boundaries = self._to_token_boundaries(
+                    offsets, (line_starts[line] for line in range(segment.start + 1, segment.end))
+                )
+                leaf_spans, _ = self._pack_spans(end_token, boundaries, start=start_token)
+                meta = {"symbol_path": path, "symbols": [segment.path] if segment.path else []}
+                spans.extend((a, b, meta) for a, b in leaf_spans)
+                continue
+            
+            if group and end_token - token_at(group[0].start) > size:
+                flush()
+            group.append(segment)
+        
+        flush()
+    
+    def _chunk_markdown(
+        self,
+        text: str,
+        source_file: Optional[str]
+    ) -> ChunkTable:
+        """
+        Pack markdown blocks into chunks along the heading hierarchy.
+        
+        Fenced code, tables and lists are never cut unless they alone exceed
+        CHUNK_SIZE. A heading starts a new chunk once the current one holds at least
+        MIN_CHUNK_SIZE tokens, and headings are never left dangling at a chunk end.
+        Each chunk stores the heading path shared by its blocks.
+        """
+        offsets = self._token_offsets(text)
+        size = max(settings.CHUNK_SIZE, 1)
+        spans = []
+        group = []
+        
+        def token_at(char: int) -> int:
+            return bisect_left(offsets, char)
+        
+        def meta(blocks) -> Tuple[Dict, bool]:
+            shared = blocks[0][3]
+            for block in blocks[1:]:
+                common = 0
+                while common < min(len(shared), len(block[3])) and shared[common] == block[3][common]:
+                    common += 1
+                shared = shared[:common]
+            return {"heading_path": " > ".join(shared)}, all(block[2] == "code" for block in blocks)
+        
+        def flush():
+            # Trailing headings move on with the content they introduce
+            carry = []
+            while group and group[-1][2] == "heading":
+                carry.insert(0, group.pop())
+            if group:
+                spans.append((token_at(group[0][0]), token_at(group[-1][1]), *meta(group)))
+            group[:] = carry
+        
+        for block in _markdown_blocks(text):
+            start_token, end_token = token_at(block[0]), token_at(block[1])
             
-            current_chunk.append(line)
-            current_tokens += line_tokens
-        
-        if current_chunk:
-            chunk_text = '\n'.join(current_chunk)
-            chunks.append({
-                "content": chunk_text,
-                "chunk_index": chunk_index,
-                "source_file": source_file,
-                "source_type": "code",
-                "is_code_block": True,
-                "start_line": len(lines) - len(current_chunk),
-                "end_line": len(lines)
-            })
-        
-        return chunks
+            if end_token - start_token > size:
+                flush()
+                # Oversized block: split at sentences (prose) or lines, keeping its headings
+                start_char = group[0][0] if group else block[0]
+                pattern = _SENTENCE_BREAK if block[2] == "paragraph" else _LINE_BREAK
+                boundaries = self._to_token_boundaries(
+                    offsets, (m.end() for m in pattern.finditer(text, block[0], block[1]))
+                )
+                block_spans, _ = self._pack_spans(end_token, boundaries, start=token_at(start_char))
+                block_meta, is_code_block = meta(group + [block])
+                spans.extend((a, b, block_meta, is_code_block) for a, b in block_spans)
+                group.clear()
+                continue
+            
+            if group:
+                group_start = token_at(group[0][0])
+                if end_token - group_start > size or (
+                    block[2] == "heading"
+                    and start_token - group_start >= settings.MIN_CHUNK_SIZE
+                ):
+                    flush()
+            group.append(block)
+        
+        flush()
+        if group:
+            # Headings at the very end of the document have nothing to introduce
+            spans.append((token_at(group[0][0]), token_at(group[-1][1]), *meta(group)))
+        
+        return self._build_table(text, offsets, spans, False, source_file)
     
     def _chunk_text_basic(
         self,
         text: str,
         source_file: Optional[str]
-    ) -> List[Dict[str, any]]:
-        chunks = []
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+    ) -> ChunkTable:
+        """Cut prose at sentence starts using token offsets from a single encode"""
+        table, _, _ = self._split_window(text, False, source_file)
+        return table
+    
+    def _split_window(
+        self,
+        text: str,
+        is_code: bool,
+        source_file: Optional[str],
+        final: bool = True,
+        base_char: int = 0,
+        base_token: int = 0,
+        first_index: int = 0
+    ) -> Tuple[ChunkTable, int, int]:
+        """
+        Chunk one window of text.
+        
+        Returns the chunk table plus the char and token position to resume from. With
+        final=False the trailing span that may still grow is not emitted.
+        """
+        offsets = self._token_offsets(text)
+        pattern = _LINE_BREAK if is_code else _SENTENCE_BREAK
+        boundaries = self._to_token_boundaries(
+            offsets, (m.end() for m in pattern.finditer(text))
+        )
+        spans, resume_token = self._pack_spans(len(offsets), boundaries, final)
         
-        current_chunk = []
-        current_tokens = 0
-        chunk_index = 0
+        table = self._build_table(
+            text, offsets, spans, is_code, source_file, base_char, base_token, first_index
+        )
         
-        for sentence in sentences:
-            sentence_tokens = self._count_tokens(sentence)
+        resume_char = offsets[resume_token] if resume_token < len(offsets) else len(text)
+        return table, resume_char, resume_token
+    
+    def _build_table(
+        self,
+        text: str,
+        offsets: List[int],
+        spans: List[Tuple],
+        is_code: bool,
+        source_file: Optional[str],
+        base_char: int = 0,
+        base_token: int = 0,
+        first_index: int = 0,
+        language: Optional[str] = None
+    ) -> ChunkTable:
+        """Turn (start_token, end_token[, metadata[, is_code_block]]) spans into a ChunkTable"""
+        table = ChunkTable(
+            text, source_file, "code" if is_code else "text", language,
+            base_char, base_token, first_index
+        )
+        line_pos, line_no = 0, 0
+        for span in spans:
+            start_token, end_token = span[0], span[1]
+            if start_token >= end_token:
+                continue
+            start_char, end_char = self._span_chars(text, offsets, start_token, end_token)
+            if start_char >= end_char:
+                continue
             
-            if current_tokens + sentence_tokens > settings.CHUNK_SIZE and current_chunk:
-                chunk_text = ' '.join(current_chunk)
-                chunks.append({
-                    "content": chunk_text,
-                    "chunk_index": chunk_index,
-                    "source_file": source_file,
-                    "source_type": "text",
-                    "is_code_block": False
-                })
-                
-                overlap_size = int(len(current_chunk) * (settings.CHUNK_OVERLAP / settings.CHUNK_SIZE))
-                current_chunk = current_chunk[-overlap_size:] if overlap_size > 0 else []
-                current_tokens = self._count_tokens(' '.join(current_chunk))
-                chunk_index += 1
+            line = -1
+            if is_code:
+                # Spans only move forward, so line numbers can be counted incrementally
+                line_no += text.count('\n', line_pos, start_char)
+                line_pos = start_char
+                line = line_no
             
-            current_chunk.append(sentence)
-            current_tokens += sentence_tokens
+            table.append(
+                start_char, end_char, start_token, end_token,
+                span[3] if len(span) > 3 else is_code,
+                line,
+                span[2] if len(span) > 2 else None
+            )
         
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            chunks.append({
-                "content": chunk_text,
-                "chunk_index": chunk_index,
-                "source_file": source_file,
-                "source_type": "text",
-                "is_code_block": False
-            })
+        return table
+    
+    def _token_offsets(self, text: str) -> List[int]:
+        """
+        Encode text once and return the character offset where each token starts.
+        Falls back to whitespace-separated words when tiktoken is unavailable.
+        """
+        if self.tokenizer:
+            tokens = self.tokenizer.encode(text, disallowed_special=())
+            _, offsets = self.tokenizer.decode_with_offsets(tokens)
+            return offsets
+        return [m.start() for m in re.finditer(r'\S+', text)]
+    
+    def _to_token_boundaries(self, offsets: List[int], char_positions) -> List[int]:
+        """Map sorted character cut points onto the token index starting at or after them"""
+        boundaries = []
+        for pos in char_positions:
+            token_index = bisect_left(offsets, pos)
+            if 0 < token_index < len(offsets) and (not boundaries or boundaries[-1] != token_index):
+                boundaries.append(token_index)
+        return boundaries
+    
+    def _pack_spans(
+        self,
+        n_tokens: int,
+        boundaries: List[int],
+        final: bool = True,
+        start: int = 0
+    ) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Greedily pack token spans of at most CHUNK_SIZE tokens over [start, n_tokens).
+        
+        Each span ends on the last boundary that fits (or is hard-cut when none does),
+        and the next span starts on the first boundary inside the overlap window, so
+        overlap is an offset range rather than re-joined, re-encoded text.
+        Returns the spans and the token index of the first span not emitted.
+        """
+        size = max(settings.CHUNK_SIZE, 1)
+        overlap = min(max(settings.CHUNK_OVERLAP, 0), size - 1)
+        spans = []
+        
+        while start < n_tokens:
+            limit = start + size
+            if limit >= n_tokens:
+                if not final:
+                    return spans, start
+                spans.append((start, n_tokens))
+                break
+            
+            j = bisect_right(boundaries, limit) - 1
+            hard_cut = j < 0 or boundaries[j] <= start
+            end = limit if hard_cut else boundaries[j]
+            spans.append((start, end))
+            
+            k = bisect_left(boundaries, max(end - overlap, start + 1))
+            if k < len(boundaries) and boundaries[k] < end:
+                start = boundaries[k]
+            elif hard_cut and overlap:
+                start = end - overlap
+            else:
+                start = end
         
-        return chunks
+        return spans, n_tokens
+    
+    def _span_chars(
+        self,
+        text: str,
+        offsets: List[int],
+        start_token: int,
+        end_token: int
+    ) -> Tuple[int, int]:
+        """Character range of a token span, trimmed of surrounding whitespace"""
+        start = offsets[start_token]
+        end = offsets[end_token] if end_token < len(offsets) else len(text)
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
     
     def _count_tokens(self, text: str) -> int:
         if self.tokenizer:
-            return len(self.tokenizer.encode(text))
+            return len(self.tokenizer.encode(text, disallowed_special=()))
         return len(text.split())
 
 chunker_service = ChunkerService()
+
+_chunk_pool: Optional[ProcessPoolExecutor] = None
+
+def get_chunk_pool() -> Optional[ProcessPoolExecutor]:
+    """Lazily start the shared chunking process pool (CHUNK_WORKERS=0 means one per core)"""
+    global _chunk_pool
+    if _chunk_pool is None:
+        workers = settings.CHUNK_WORKERS or os.cpu_count() or 1
+        if workers < 2:
+            return None
+        # spawn keeps children free of the parent's event loop and client threads
+        _chunk_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"✅ Chunk process pool started with {workers} workers")
+    return _chunk_pool
+
+def shutdown_chunk_pool():
+    """Stop the chunking process pool; the next get_chunk_pool() starts a fresh one"""
+    global _chunk_pool
+    if _chunk_pool is not None:
+        _chunk_pool.shutdown(wait=False, cancel_futures=True)
+        _chunk_pool = None
+
+def _chunk_in_worker(
+    text: str,
+    source_type: str,
+    source_file: Optional[str]
+) -> ChunkTable:
+    """Process pool entry point; uses the worker process's own ChunkerService"""
+    return chunker_service.chunk_table(text, source_type, source_file)
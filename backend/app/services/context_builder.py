@@ -0,0 +1,120 @@
+import re
+from typing import Dict, Iterable, Iterator, List
+
+from app.services.chunker_service import chunker_service
+
+# Separator between chunks in the assembled context
+CONTEXT_SEPARATOR = "\n\n"
+
+# A chunk is only trimmed into the leftover budget if at least this much fits
+MIN_TRIMMED_TOKENS = 64
+
+# Places a trimmed chunk may end: after sentence punctuation or at a line break
+_SENTENCE_END = re.compile(r'[.!?](?=\s)|\n')
+_WORD = re.compile(r'\S+')
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the chunker's shared tiktoken encoder (words if unavailable)"""
+    tokenizer = chunker_service.tokenizer
+    if tokenizer:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    return len(text.split())
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Longest prefix of text within max_tokens, cut back to a sentence boundary.
+
+    Falls back to the raw token cut when the last boundary would lose more than
+    half of what fits.
+    """
+    if max_tokens <= 0:
+        return ""
+    tokenizer = chunker_service.tokenizer
+    if tokenizer:
+        tokens = tokenizer.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        head = tokenizer.decode(tokens[:max_tokens])
+    else:
+        words = list(_WORD.finditer(text))
+        if len(words) <= max_tokens:
+            return text
+        head = text[:words[max_tokens - 1].end()]
+
+    ends = [match.end() for match in _SENTENCE_END.finditer(head)]
+    if ends and ends[-1] >= len(head) // 2:
+        head = head[:ends[-1]]
+    return head.rstrip()
+
+
+def build_context(chunks: List[Dict], max_tokens: int) -> Dict:
+    """
+    Pack chunks, best first, into at most max_tokens of context.
+
+    Whole chunks are added in the order given until the next one doesn't fit; that
+    one is trimmed at a sentence boundary into the remaining budget (if at least
+    MIN_TRIMMED_TOKENS remain) and packing stops. Returns the context text, the
+    tokens it uses, the chunks that made it in and how many were dropped.
+    """
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    parts: List[str] = []
+    used: List[Dict] = []
+    tokens = 0
+
+    for chunk in chunks:
+        cost = separator_tokens if parts else 0
+        remaining = max_tokens - tokens - cost
+        chunk_tokens = count_tokens(chunk["content"])
+
+        if chunk_tokens <= remaining:
+            parts.append(chunk["content"])
+            used.append(chunk)
+            tokens += cost + chunk_tokens
+            continue
+
+        if remaining >= MIN_TRIMMED_TOKENS:
+            trimmed = trim_to_tokens(chunk["content"], remaining)
+            if trimmed:
+                parts.append(trimmed)
+                used.append({**chunk, "content": trimmed, "trimmed": True})
+                tokens += cost + count_tokens(trimmed)
+        break
+
+    return {
+        "context": CONTEXT_SEPARATOR.join(parts),
+        "tokens": tokens,
+        "chunks": used,
+        "dropped": len(chunks) - len(used),
+    }
+
+
+def group_chunks(chunks: Iterable[Dict], max_tokens: int, by_file: bool = True) -> Iterator[List[Dict]]:
+    """
+    Split a chunk stream into consecutive groups of at most max_tokens each.
+
+    With by_file, a group never spans two source files. A chunk that alone exceeds
+    max_tokens is trimmed to fit and forms its own group. Groups are yielded as
+    they fill, so the stream is never held in memory as a whole.
+    """
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    group: List[Dict] = []
+    tokens = 0
+
+    for chunk in chunks:
+        chunk_tokens = count_tokens(chunk["content"])
+        if chunk_tokens > max_tokens:
+            chunk = {**chunk, "content": trim_to_tokens(chunk["content"], max_tokens), "trimmed": True}
+            chunk_tokens = count_tokens(chunk["content"])
+
+        new_file = by_file and group and chunk.get("source_file") != group[0].get("source_file")
+        if group and (new_file or tokens + separator_tokens + chunk_tokens > max_tokens):
+            yield group
+            group, tokens = [], 0
+
+        tokens += (separator_tokens if group else 0) + chunk_tokens
+        group.append(chunk)
+
+    if group:
+        yield group
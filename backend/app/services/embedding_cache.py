@@ -0,0 +1,137 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.services.chunk_table import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Vectors are stored little-endian float32 in Redis regardless of host byte order
+_WIRE_DTYPE = np.dtype("<f4")
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model id, content hash), the same hash as the
+    chunk's vector id (code keeps its layout, prose is whitespace-normalized).
+
+    Tier 1 is an in-process LRU bounded by total vector bytes; tier 2 is Redis, shared
+    across API and worker processes, holding packed float32 bytes rather than JSON.
+    Lookups for a whole chunk list go to Redis as a single MGET, and only the texts
+    missing from both tiers are handed to the provider, each distinct text once.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl: int = None):
+        self.max_bytes = settings.EMBEDDING_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = settings.EMBEDDING_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_id: str, text: str, is_code: bool = False) -> str:
+        return f"emb:{model_id}:{content_hash(text, is_code)}"
+
+    def _get_local(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def _put_local(self, key: str, vector: np.ndarray):
+        if vector.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    async def get_or_compute(
+        self,
+        model_id: str,
+        texts: List[str],
+        dimension: int,
+        compute: Callable[[List[str]], Awaitable[np.ndarray]],
+        is_code: Optional[List[bool]] = None
+    ) -> np.ndarray:
+        """Embeddings for texts in order, computing only what neither tier has"""
+        # Filled row by row; stacked at the end so a provider whose real width differs
+        # from the configured dimension (model not loaded yet) still works
+        result: List[Optional[np.ndarray]] = [None] * len(texts)
+        keys = [self.key(model_id, text, code) for text, code in zip(texts, is_code or [False] * len(texts))]
+
+        # Tier 1: in-process LRU
+        missing: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            vector = self._get_local(key)
+            if vector is not None and vector.shape[0] == dimension:
+                result[i] = vector
+                self.hits += 1
+            else:
+                missing.setdefault(key, []).append(i)
+
+        # Tier 2: Redis, one MGET for every distinct miss
+        if missing:
+            pending = list(missing)
+            for key, raw in zip(pending, await redis_client.mget_bytes(pending)):
+                if raw is None or len(raw) != dimension * _WIRE_DTYPE.itemsize:
+                    continue
+                vector = np.frombuffer(raw, dtype=_WIRE_DTYPE).astype(np.float32)
+                self._put_local(key, vector)
+                rows = missing.pop(key)
+                for i in rows:
+                    result[i] = vector
+                self.redis_hits += len(rows)
+
+        # Compute the rest in one provider call and fill both tiers
+        if missing:
+            pending = list(missing)
+            computed = await compute([texts[missing[key][0]] for key in pending])
+            packed = {}
+            for key, vector in zip(pending, computed):
+                vector = np.array(vector, dtype=np.float32)
+                self._put_local(key, vector)
+                for i in missing[key]:
+                    result[i] = vector
+                packed[key] = vector.astype(_WIRE_DTYPE).tobytes()
+                self.misses += len(missing[key])
+            await redis_client.mset_bytes(packed, expire=self.ttl)
+
+        if not result:
+            return np.empty((0, dimension), dtype=np.float32)
+        return np.stack(result)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters since start and current LRU size"""
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def clear(self):
+        """Drop the in-process tier (Redis entries expire on their own)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,182 @@
+import hashlib
+import importlib.util
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider:
+    """
+    Base class for embedding backends.
+
+    embed() is synchronous and CPU-bound; EmbeddingService decides whether to call it
+    inline or on an executor (see the blocking flag).
+    """
+
+    name = "base"
+    # Whether embed() is slow enough to be moved off the event loop
+    blocking = True
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vector space; vectors from different model ids are not comparable"""
+        return self.name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashEmbeddingProvider(EmbeddingProvider):
+    """Deterministic SHA-256 vectors; no model, no semantic similarity"""
+
+    name = "hash"
+    blocking = False
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        digest_size = hashlib.sha256().digest_size
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        digests = np.frombuffer(
+            b"".join(hashlib.sha256(text.encode('utf-8')).digest() for text in texts),
+            dtype=np.uint8
+        ).reshape(len(texts), digest_size)
+
+        # Mix each byte with its cyclic neighbour, then repeat the digest across the vector
+        mixed = digests ^ np.roll(digests, -1, axis=1)
+        reps = -(-self.dimension // digest_size)
+        embeddings = np.tile(mixed, (1, reps))[:, :self.dimension].astype(np.float32)
+        embeddings /= 255.0
+        return np.ascontiguousarray(embeddings)
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """
+    Local sentence-transformers model on CPU.
+
+    The model is loaded on first use, not at import. Texts are sorted by token length
+    and packed into batches bounded by both item count and padded token count, so one
+    long chunk doesn't pad a whole batch of short ones to its length.
+    """
+
+    name = "sentence-transformers"
+
+    def __init__(self, dimension: int, model_name: str = None):
+        super().__init__(dimension)
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model_name}"
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                import torch
+                from sentence_transformers import SentenceTransformer
+
+                if settings.EMBEDDING_THREADS > 0:
+                    torch.set_num_threads(settings.EMBEDDING_THREADS)
+
+                self._model = SentenceTransformer(
+                    self.model_name,
+                    device="cpu",
+                    cache_folder=settings.MODELS_DIR
+                )
+                self.dimension = self._model.get_sentence_embedding_dimension()
+                logger.info(f"✅ Embedding model loaded: {self.model_name} ({self.dimension} dims)")
+        return self._model
+
+    def _token_lengths(self, model, texts: List[str]) -> List[int]:
+        """Token count per text, capped at the model's max sequence length"""
+        max_length = model.max_seq_length
+        encoded = model.tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        model = self._load()
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+
+        lengths = self._token_lengths(model, texts)
+        for batch in plan_batches(lengths, settings.EMBEDDING_BATCH_SIZE, settings.EMBEDDING_BATCH_TOKENS):
+            embeddings[batch] = model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        return embeddings
+
+
+def plan_batches(lengths: List[int], max_items: int, max_tokens: int) -> List[List[int]]:
+    """
+    Group text indices into inference batches.
+
+    Indices are ordered by length so each batch pads to similar sizes, and a batch is
+    closed once it holds max_items texts or its padded size (items x longest) would
+    exceed max_tokens. A single text longer than max_tokens gets a batch of its own.
+    """
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    longest = 0
+
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        padded = (len(batch) + 1) * max(longest, lengths[i])
+        if batch and (len(batch) >= max_items or padded > max_tokens):
+            batches.append(batch)
+            batch, longest = [], 0
+        batch.append(i)
+        longest = max(longest, lengths[i])
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _sentence_transformers_factory() -> EmbeddingProvider:
+    # Optional dependency: fall back to hashing when the package isn't installed
+    if importlib.util.find_spec("sentence_transformers") is None:
+        logger.warning("⚠️ sentence-transformers not installed, using hash embeddings")
+        return HashEmbeddingProvider(settings.EMBEDDING_DIMENSION)
+    return SentenceTransformerProvider(settings.EMBEDDING_DIMENSION)
+
+
+# Provider name -> factory; extend with register_provider()
+_FACTORIES: Dict[str, Callable[[], EmbeddingProvider]] = {
+    "hash": lambda: HashEmbeddingProvider(settings.EMBEDDING_DIMENSION),
+    "sentence-transformers": _sentence_transformers_factory,
+}
+_providers: Dict[str, EmbeddingProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def register_provider(name: str, factory: Callable[[], EmbeddingProvider]):
+    """Register (or replace) an embedding provider factory"""
+    with _providers_lock:
+        _FACTORIES[name] = factory
+        _providers.pop(name, None)
+
+
+def get_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """Shared provider instance by name (defaults to settings.EMBEDDINGS_PROVIDER)"""
+    name = name or settings.EMBEDDINGS_PROVIDER
+    with _providers_lock:
+        if name not in _providers:
+            if name not in _FACTORIES:
+                raise ValueError(f"Unknown embedding provider: {name}")
+            _providers[name] = _FACTORIES[name]()
+        return _providers[name]
@@ -1,64 +1,131 @@
-import hashlib
+import asyncio
+import multiprocessing
 import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Union, Optional
 import logging
+from app.core.config import settings
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_providers import EmbeddingProvider, get_provider
 
 logger = logging.getLogger(__name__)
 print("✅ EmbeddingService module loaded")
 
 class EmbeddingService:
-    """Simple deterministic embedding service"""
+    """Embedding service backed by a pluggable provider (see embedding_providers)"""
     
-    def __init__(self):
-        self.embedding_dim = 384
-        print("✅ EmbeddingService instance created")
+    def __init__(self, provider: Optional[str] = None):
+        self.provider = get_provider(provider)
+        self.embedding_dim = self.provider.dimension
+        self.query_batcher = EmbeddingBatcher(
+            self.embed_batch,
+            max_delay=settings.EMBEDDING_QUERY_MAX_DELAY_MS / 1000,
+            max_batch=settings.EMBEDDING_QUERY_MAX_BATCH
+        )
+        print(f"✅ EmbeddingService instance created ({self.provider.name})")
     
     async def generate_embeddings(
         self,
         texts: Union[str, List[str]],
         provider: Optional[str] = None
     ) -> Union[List[float], List[List[float]]]:
-        """Generate embeddings with proper validation"""
+        """Generate embeddings with proper validation (as Python lists)"""
         
         # Handle None or empty
         if texts is None or texts == "":
             logger.warning("⚠️ Received None/empty text, using default")
             return [0.1] * self.embedding_dim
         
-        # Convert to list
         single_input = isinstance(texts, str)
-        if single_input:
-            texts = [texts] if texts else [""]
+        embeddings = await self.embed_batch([texts] if single_input else texts, provider)
+        embeddings = embeddings.tolist()
+        
+        return embeddings[0] if single_input else embeddings
+    
+    async def embed_batch(
+        self,
+        texts: List[str],
+        provider: Optional[str] = None,
+        is_code: Optional[List[bool]] = None
+    ) -> np.ndarray:
+        """
+        Embed a list of texts as one contiguous float32 matrix of shape (len(texts), dim)
+        
+        Model inference runs on the embedding executor so the event loop stays free;
+        cheap providers (hashing) run inline. is_code flags code chunks, whose cache
+        keys keep their layout like their content hashes do.
+        """
+        backend = get_provider(provider) if provider else self.provider
         
         # Filter out empty strings
         texts = [t if t and t.strip() else "empty" for t in texts]
         
-        logger.info(f"🔍 Generating embeddings for {len(texts)} texts")
+        logger.info(f"🔍 Generating embeddings for {len(texts)} texts ({backend.model_id})")
         
-        embeddings = [self._text_to_embedding(text) for text in texts]
+        if not backend.blocking or not texts:
+            return backend.embed(texts)
         
-        return embeddings[0] if single_input else embeddings
+        # Model-backed vectors are worth caching; hashing is cheaper than a lookup
+        if settings.ENABLE_EMBEDDING_CACHE:
+            return await embedding_cache.get_or_compute(
+                backend.model_id,
+                texts,
+                backend.dimension,
+                lambda missing: self._run_provider(backend, missing),
+                is_code
+            )
+        return await self._run_provider(backend, texts)
+    
+    async def _run_provider(self, backend: EmbeddingProvider, texts: List[str]) -> np.ndarray:
+        """Run model inference on the embedding executor"""
+        loop = asyncio.get_running_loop()
+        if settings.EMBEDDING_EXECUTOR == "process":
+            return await loop.run_in_executor(get_embedding_executor(), _embed_in_worker, backend.name, texts)
+        return await loop.run_in_executor(get_embedding_executor(), backend.embed, texts)
+    
+    async def embed_query(self, text: str) -> np.ndarray:
+        """Embed one query; concurrent calls are coalesced into a single model batch"""
+        if not self.provider.blocking or settings.EMBEDDING_QUERY_MAX_DELAY_MS <= 0:
+            return (await self.embed_batch([text]))[0]
+        return await self.query_batcher.embed(text)
     
     def _text_to_embedding(self, text: str) -> List[float]:
-        """Convert text to deterministic embedding using SHA-256"""
-        print(f"🔍 _text_to_embedding called for text length: {len(text)}")
-        
-        # Create hash from text
-        hash_obj = hashlib.sha256(text.encode('utf-8'))
-        hash_bytes = hash_obj.digest()
-        
-        # Generate 384-dimensional vector
-        embedding = []
-        for i in range(self.embedding_dim):
-            # Use hash bytes cyclically with mixing
-            byte_idx = i % len(hash_bytes)
-            next_byte = (i + 1) % len(hash_bytes)
-            # Mix bytes for better distribution
-            val = (hash_bytes[byte_idx] ^ hash_bytes[next_byte]) / 255.0
-            embedding.append(float(val))
-        
-        print(f"🔍 Final embedding length: {len(embedding)}")
-        return embedding
+        """Embed a single text synchronously"""
+        return self.provider.embed([text])[0].tolist()
+
+
+_embedding_executor: Optional[Executor] = None
+
+def get_embedding_executor() -> Executor:
+    """Lazily start the shared inference executor (EMBEDDING_EXECUTOR: thread or process)"""
+    global _embedding_executor
+    if _embedding_executor is None:
+        workers = max(settings.EMBEDDING_WORKERS, 1)
+        if settings.EMBEDDING_EXECUTOR == "process":
+            # Each worker process loads its own copy of the model on first use
+            _embedding_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _embedding_executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="embedding"
+            )
+        logger.info(f"✅ Embedding {settings.EMBEDDING_EXECUTOR} executor started with {workers} workers")
+    return _embedding_executor
+
+def shutdown_embedding_executor():
+    """Stop the inference executor; the next get_embedding_executor() starts a fresh one"""
+    global _embedding_executor
+    if _embedding_executor is not None:
+        _embedding_executor.shutdown(wait=False, cancel_futures=True)
+        _embedding_executor = None
+
+def _embed_in_worker(provider: str, texts: List[str]) -> np.ndarray:
+    """Process-pool entry point; the provider (and its model) is cached per worker"""
+    return get_provider(provider).embed(texts)
 
 
 # Create global instance
@@ -1,5 +1,8 @@
+import os
 import uuid
 import asyncio
+import itertools
+from typing import Dict, Iterable, Iterator, List, Optional
 from app.db.database import SessionLocal
 from app.models.job import Job
 from app.services.ocr_service import ocr_service
@@ -8,10 +11,16 @@ from app.services.chunker_service import chunker_service
 from app.services.vectorstore_service import vectorstore_service
 from app.services.rag_service import rag_service
 from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.services.lexical_index import LexicalIndexWriter, lexical_index
 import logging
 from app.models.project import Chunk 
 logger = logging.getLogger(__name__)
 
+# Job.progress range covered while a file's vectors are being written
+INGEST_PROGRESS_START = 60
+INGEST_PROGRESS_END = 79
+
 async def process_job(job_id: str):
     """Process a single job"""
     db = SessionLocal()
@@ -31,6 +40,10 @@ async def process_job(job_id: str):
             await process_upload_job(job, db)
         elif job.type == "regenerate":
             await process_regenerate_job(job, db)
+        elif job.type == "delete_file":
+            await process_delete_file_job(job, db)
+        elif job.type == "reindex":
+            await process_reindex_job(job, db)
         
         # Mark complete
         job.status = "completed"
@@ -54,6 +67,7 @@ async def process_upload_job(job: Job, db):
     from app.services.chunker_service import chunker_service
     from app.services.vectorstore_service import vectorstore_service
     from app.services.rag_service import rag_service
+    from app.utils.file_utils import iter_text_file
     import uuid
     import logging
     import os
@@ -62,10 +76,49 @@ async def process_upload_job(job: Job, db):
     
     files = job.input_data.get("files", [])
     project_id = job.project_id
+    # Adding to / replacing files in an existing project rather than building it
+    incremental = job.input_data.get("incremental", False)
+    replaces = job.input_data.get("replaces", {})  # new file name -> id of the File it replaces
     
     logger.info(f"📦 Processing {len(files)} files for project {project_id}")
     
-    all_chunks = []
+    # Chunks are stored and embedded batch by batch; README generation reads
+    # them back from the database afterwards
+    total_chunks = 0
+    ingested: Dict[str, int] = {}
+    
+    # Multi-file uploads are parsed first, then chunked on the process pool, at most
+    # CHUNK_PARALLEL_MAX_CHARS of parsed text at a time
+    parallel = settings.CHUNK_PARALLEL and len(files) > 1
+    pending = []
+    pending_chars = 0
+    
+    # Keyword (BM25) postings are built alongside the vectors, batch by batch
+    keywords = lexical_index.writer(project_id)
+    
+    async def ingest_pending() -> int:
+        nonlocal pending, pending_chars
+        logger.info(f"✂️ Chunking {len(pending)} files ({pending_chars} chars) on the process pool")
+        documents, pending, pending_chars = pending, [], 0
+        names = iter([name for _, _, name in documents])
+        chunks = 0
+        
+        # Tables keep one source buffer per file; dicts are built batch by batch.
+        # A file that fails to chunk or ingest is skipped, the rest of the batch goes on
+        async for table in chunker_service.chunk_documents(documents, return_exceptions=True):
+            name = next(names)
+            try:
+                if isinstance(table, Exception):
+                    raise table
+                count = await _ingest_chunks(
+                    job, db, project_id, name, table.iter_dicts(), keywords, len(table.source)
+                )
+            except Exception as e:
+                logger.error(f"❌ Error processing {name}: {e}", exc_info=True)
+                continue
+            ingested[name] = count
+            chunks += count
+        return chunks
     
     for file_path in files:
         try:
@@ -101,7 +154,8 @@ async def process_upload_job(job: Job, db):
                     logger.warning(f"⚠️ Empty content from {file_path}")
                     continue
             
-            content = parsed["content"]
+            content = parsed.pop("content")
+            source_type = parsed.get("type", "text")
             logger.info(f"📄 Content length: {len(content)} chars")
             
             # Save file record
@@ -109,7 +163,7 @@ async def process_upload_job(job: Job, db):
                 project_id=project_id,
                 filename=os.path.basename(file_path),
                 original_name=os.path.basename(file_path),
-                file_type=parsed.get("type", "text"),
+                file_type=source_type,
                 file_path=file_path,
                 file_size=len(content),
                 is_processed=True,
@@ -117,74 +171,64 @@ async def process_upload_job(job: Job, db):
             )
             db.add(file_record)
             db.commit()
-            
-            # Chunk content
-            logger.info(f"✂️ Chunking {len(content)} chars...")
-            chunks = chunker_service.chunk_text(
-                text=content,
-                source_type=parsed.get("type", "text"),
-                source_file=os.path.basename(file_path)
+        except Exception as e:
+            logger.error(f"❌ Error processing {file_path}: {e}", exc_info=True)
+            continue
+        
+        if parallel:
+            pending.append((content, source_type, os.path.basename(file_path)))
+            pending_chars += len(content)
+            content = None
+            if pending_chars >= settings.CHUNK_PARALLEL_MAX_CHARS:
+                total_chunks += await ingest_pending()
+            continue
+        
+        # Text and code are re-read from disk in blocks; parsed content (PDF, image)
+        # is handed over so the chunker owns the only reference
+        if source_type in ("text", "code"):
+            segments = iter_text_file(file_path)
+        else:
+            segments = iter((content,))
+        total_chars, content = len(content), None
+        
+        name = os.path.basename(file_path)
+        try:
+            stream = chunker_service.chunk_stream(
+                segments,
+                source_type=source_type,
+                source_file=name
+            )
+            ingested[name] = await _ingest_chunks(
+                job, db, project_id, name, stream, keywords, total_chars
             )
-            
-            logger.info(f"✂️ Generated {len(chunks)} chunks")
-            
-            if not chunks:
-                logger.error(f"❌ No chunks generated from {file_path}")
-                continue
-            
-            # Save chunks
-            for i, chunk_data in enumerate(chunks):
-                chunk_id = str(uuid.uuid4())
-                
-                # Validate chunk content
-                if not chunk_data.get("content") or len(chunk_data["content"].strip()) < 5:
-                    logger.warning(f"⚠️ Skipping empty chunk {i}")
-                    continue
-                
-                chunk = Chunk(
-                    id=chunk_id,
-                    project_id=project_id,
-                    content=chunk_data["content"],
-                    chunk_index=i,
-                    source_file=chunk_data.get("source_file"),
-                    source_type=chunk_data.get("source_type"),
-                    is_code_block=chunk_data.get("is_code_block", False)
-                )
-                db.add(chunk)
-                
-                chunk_data["id"] = chunk_id
-                all_chunks.append(chunk_data)
-            
-            db.commit()
-            logger.info(f"✅ Saved {len(all_chunks)} chunks to DB")
-            
         except Exception as e:
             logger.error(f"❌ Error processing {file_path}: {e}", exc_info=True)
             continue
+        total_chunks += ingested[name]
+    
+    if pending:
+        total_chunks += await ingest_pending()
     
     # Validate we have chunks
-    if not all_chunks:
+    if not total_chunks:
         logger.error("❌ NO CHUNKS GENERATED")
-        job.status = "failed"
-        job.error = "Failed to extract any content from uploaded files"
-        db.commit()
-        return
+        raise ValueError("Failed to extract any content from uploaded files")
     
-    logger.info(f"📊 Total valid chunks: {len(all_chunks)}")
+    logger.info(f"📊 Total valid chunks: {total_chunks}")
+    await keywords.flush()
     
-    # Add to vectorstore
-    job.current_step = "Creating embeddings"
-    job.progress = 60
-    db.commit()
+    # Replaced files are removed only once their new version is indexed, so queries
+    # see the old chunks until then, never neither
+    for name, old_file_id in replaces.items():
+        if not ingested.get(name):
+            logger.warning(f"⚠️ New version of file {old_file_id} produced no chunks, keeping the old one")
+            continue
+        old_file = db.query(File).filter(File.id == old_file_id, File.project_id == project_id).first()
+        if old_file:
+            await remove_file_from_index(db, project_id, old_file)
     
-    try:
-        await vectorstore_service.add_chunks(project_id, all_chunks)
-        logger.info(f"✅ Added to vectorstore")
-    except Exception as e:
-        logger.error(f"❌ Vectorstore error: {e}")
-        job.status = "failed"
-        job.error = str(e)
-        db.commit()
+    if incremental:
+        logger.info("📄 Incremental update, README left as is (regenerate to refresh it)")
         return
     
     # Generate README
@@ -194,7 +238,7 @@ async def process_upload_job(job: Job, db):
     
     try:
         readme = await rag_service.generate_documentation(
-            chunks=all_chunks,
+            chunks=_iter_project_chunks(db, project_id),
             project_name=job.input_data.get("project_name", "Project")
         )
         logger.info(f"✅ README: {len(readme)} chars")
@@ -206,15 +250,228 @@ async def process_upload_job(job: Job, db):
     project.readme_content = readme
     db.commit()
 
+async def remove_file_from_index(db, project_id: str, file_record) -> Dict[str, int]:
+    """Delete one file's vectors (unless shared with other files), keyword docs, chunks and record"""
+    from app.models.project import File
+    
+    chunks = db.query(Chunk.id, Chunk.content_hash).filter(
+        Chunk.project_id == project_id,
+        Chunk.source_file == file_record.filename
+    ).all()
+    removed = await vectorstore_service.remove_source(
+        project_id,
+        [content_hash or chunk_id for chunk_id, content_hash in chunks],
+        file_record.filename
+    )
+    # Keyword docs share the vector ids; shared vectors stay searchable
+    removed["keyword_docs"] = await lexical_index.remove(project_id, removed.pop("deleted_ids"))
+    
+    db.query(Chunk).filter(
+        Chunk.project_id == project_id,
+        Chunk.source_file == file_record.filename
+    ).delete(synchronize_session=False)
+    db.query(File).filter(File.id == file_record.id).delete(synchronize_session=False)
+    db.commit()
+    
+    try:
+        os.remove(file_record.file_path)
+    except OSError:
+        pass
+    
+    logger.info(f"🗑️ Removed {file_record.filename} ({len(chunks)} chunks) from project {project_id}")
+    return {"chunks": len(chunks), **removed}
+
+async def _ingest_chunks(
+    job: Job,
+    db,
+    project_id: str,
+    filename: str,
+    chunks: Iterable[Dict],
+    keywords: Optional[LexicalIndexWriter] = None,
+    total_chars: int = 0
+) -> int:
+    """
+    Store and embed one file's chunks batch by batch; returns the number kept.
+    
+    If chunking, saving or embedding fails partway, the chunk rows, vectors and
+    keyword docs already written for the file are removed before the error is raised.
+    """
+    from app.services.vectorstore_service import vectorstore_service
+    
+    job.current_step = f"Chunking and embedding {filename}"
+    job.progress = INGEST_PROGRESS_START
+    db.commit()
+    
+    def report_progress(landed: List[Dict]):
+        # Position in the file of the last chunk whose vectors landed
+        if not total_chars:
+            return
+        done = max(chunk.get("end_char", 0) for chunk in landed) / total_chars
+        progress = INGEST_PROGRESS_START + int((INGEST_PROGRESS_END - INGEST_PROGRESS_START) * min(done, 1.0))
+        if progress > job.progress:
+            job.progress = progress
+            db.commit()
+    
+    file_chunks = 0
+    written: List[Dict] = []
+    try:
+        async with vectorstore_service.batch_writer(project_id, on_batch=report_progress) as writer:
+            for batch in _batched(chunks, settings.CHUNK_BATCH_SIZE):
+                saved = _save_chunk_batch(db, project_id, batch)
+                if not saved:
+                    continue
+                written.extend(saved)
+                
+                # Embeds now; the upsert overlaps with chunking and saving the next batch
+                await writer.add(saved)
+                if keywords is not None:
+                    await keywords.add(saved)
+                
+                file_chunks += len(saved)
+    except Exception:
+        await _discard_chunks(db, project_id, filename, written, keywords)
+        raise
+    
+    logger.info(f"✅ Saved and embedded {file_chunks} chunks from {filename}")
+    return file_chunks
+
+async def _discard_chunks(
+    db,
+    project_id: str,
+    filename: str,
+    chunks: List[Dict],
+    keywords: Optional[LexicalIndexWriter] = None
+):
+    """Undo a failed ingest: drop the file's saved chunk rows, vectors only it used and their keyword docs"""
+    db.rollback()
+    if not chunks:
+        return
+    
+    db.query(Chunk).filter(
+        Chunk.id.in_([chunk["id"] for chunk in chunks])
+    ).delete(synchronize_session=False)
+    db.commit()
+    
+    vector_ids = list(dict.fromkeys(chunk.get("content_hash") or chunk["id"] for chunk in chunks))
+    try:
+        await vectorstore_service.remove_source(project_id, vector_ids, filename)
+        # Vectors still stored are shared with other files; the rest were deleted or
+        # never written, and their keyword docs go too
+        kept = {chunk["id"] for chunk in await vectorstore_service.get_chunks(project_id, vector_ids)}
+        gone = [vector_id for vector_id in vector_ids if vector_id not in kept]
+        if keywords is not None:
+            keywords.discard(gone)
+        await lexical_index.remove(project_id, gone)
+    except Exception as e:
+        logger.error(f"❌ Could not remove vectors of failed file {filename}: {e}")
+        return
+    logger.info(f"🗑️ Rolled back {len(chunks)} chunks of failed file {filename}")
+
+def _iter_project_chunks(db, project_id: str) -> Iterator[Dict]:
+    """All of a project's chunks in document order, streamed from the database"""
+    rows = db.query(Chunk.content, Chunk.source_file, Chunk.chunk_index).filter(
+        Chunk.project_id == project_id
+    ).order_by(Chunk.source_file, Chunk.chunk_index).yield_per(settings.CHUNK_BATCH_SIZE)
+    
+    for content, source_file, chunk_index in rows:
+        yield {"content": content, "source_file": source_file, "chunk_index": chunk_index}
+
+def _batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, max(size, 1)))
+        if not batch:
+            return
+        yield batch
+
+def _save_chunk_batch(db, project_id: str, batch: List[Dict]) -> List[Dict]:
+    """Insert one batch of chunk rows and return the chunks that were kept"""
+    saved = []
+    
+    for chunk_data in batch:
+        # Validate chunk content
+        if not chunk_data.get("content") or len(chunk_data["content"].strip()) < 5:
+            logger.warning(f"⚠️ Skipping empty chunk {chunk_data.get('chunk_index')}")
+            continue
+        
+        chunk_id = str(uuid.uuid4())
+        chunk = Chunk(
+            id=chunk_id,
+            project_id=project_id,
+            content=chunk_data["content"],
+            chunk_index=chunk_data.get("chunk_index", 0),
+            source_file=chunk_data.get("source_file"),
+            source_type=chunk_data.get("source_type"),
+            start_token=chunk_data.get("start_token"),
+            end_token=chunk_data.get("end_token"),
+            language=chunk_data.get("language"),
+            content_hash=chunk_data.get("content_hash"),
+            is_code_block=chunk_data.get("is_code_block", False)
+        )
+        db.add(chunk)
+        
+        chunk_data["id"] = chunk_id
+        saved.append(chunk_data)
+    
+    db.commit()
+    return saved
+
+async def process_delete_file_job(job: Job, db):
+    """Remove one file from a project's indexes (queued so only the worker writes them)"""
+    from app.models.project import File
+    
+    file_record = db.query(File).filter(
+        File.id == job.input_data["file_id"],
+        File.project_id == job.project_id
+    ).first()
+    if not file_record:
+        logger.warning(f"⚠️ File {job.input_data['file_id']} already removed")
+        return
+    
+    job.current_step = f"Removing {file_record.filename}"
+    db.commit()
+    await remove_file_from_index(db, job.project_id, file_record)
+
+async def process_reindex_job(job: Job, db):
+    """Re-embed a project's stored chunks into a new collection, e.g. after the embedding model changed"""
+    project_id = job.project_id
+    job.current_step = "Re-embedding chunks"
+    db.commit()
+    
+    await vectorstore_service.delete_collection(project_id)
+    rows = db.query(
+        Chunk.id, Chunk.content, Chunk.content_hash, Chunk.source_file, Chunk.chunk_index, Chunk.is_code_block
+    ).filter(Chunk.project_id == project_id).order_by(
+        Chunk.source_file, Chunk.chunk_index
+    ).yield_per(settings.CHUNK_BATCH_SIZE)
+    chunks = (
+        {
+            "id": chunk_id,
+            "content": content,
+            "content_hash": content_hash,
+            "source_file": source_file,
+            "chunk_index": chunk_index,
+            "is_code_block": is_code_block,
+        }
+        for chunk_id, content, content_hash, source_file, chunk_index, is_code_block in rows
+    )
+    
+    async with vectorstore_service.batch_writer(project_id) as writer:
+        for batch in _batched(chunks, settings.CHUNK_BATCH_SIZE):
+            await writer.add(batch)
+    
+    logger.info(f"✅ Reindexed project {project_id}: {writer.written} vectors")
+
 async def process_regenerate_job(job: Job, db):
     """Regenerate README for existing project"""
     from app.models.project import Project
     
     project = db.query(Project).filter(Project.id == job.project_id).first()
-    chunks = db.query(Chunk).filter(Chunk.project_id == job.project_id).all()
     
+    # Unchanged files hit the section summary cache, leaving mostly the README call
     readme = await rag_service.generate_documentation(
-        chunks=[{"content": c.content} for c in chunks],
+        chunks=_iter_project_chunks(db, job.project_id),
         project_name=project.name
     )
     
@@ -225,6 +482,18 @@ async def worker_loop():
     """Main worker loop"""
     logger.info("🚀 Worker started")
     
+    # Redis backs the shared embedding cache; ingest still works without it. With the
+    # result cache on it also holds the index versions the API's cached retrievals are
+    # keyed on, and a worker that can't bump them would leave chat serving stale rankings
+    try:
+        await redis_client.connect()
+    except Exception as e:
+        if settings.ENABLE_RESULT_CACHE:
+            raise RuntimeError(
+                f"Redis unreachable and ENABLE_RESULT_CACHE is on, index writes could not invalidate cached results: {e}"
+            ) from e
+        logger.warning(f"⚠️ Worker running without Redis: {e}")
+    
     while True:
         db = SessionLocal()
         
@@ -0,0 +1,421 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.retrieval_cache import retrieval_cache
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = "manifest.json"
+
+# Tombstoned documents are purged by a merge once they are this share of the index
+MAX_DELETED_SHARE = 0.25
+
+# BM25 parameters (Robertson/Sparck Jones defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"\w+")
+# Splits identifiers like parseHTTPResponse or load_data into their parts
+_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens; identifiers also yield their camelCase/snake_case parts.
+
+    "parseJSONFile" indexes as parsejsonfile, parse, json and file, so both the exact
+    name and its words match.
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        tokens.append(word.lower())
+        parts = [part.lower() for piece in word.split("_") for part in _PART_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class _Segment:
+    """
+    One immutable batch of documents as postings arrays.
+
+    terms is sorted; postings for terms[i] are docs/freqs[offsets[i]:offsets[i + 1]],
+    with docs indexing into doc_ids/doc_lengths of this segment.
+    """
+
+    def __init__(self, doc_ids, doc_lengths, terms, offsets, docs, freqs):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.freqs = freqs
+
+    @classmethod
+    def build(cls, doc_ids: List[str], term_counts: List[Counter]) -> "_Segment":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counts in enumerate(term_counts):
+            for term, freq in counts.items():
+                postings.setdefault(term, []).append((doc, freq))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        pairs = np.array(
+            [pair for term in terms for pair in postings[term]], dtype=np.int64
+        ).reshape(-1, 2)
+        return cls(
+            np.array(doc_ids, dtype=str),
+            np.array([sum(counts.values()) for counts in term_counts], dtype=np.int32),
+            np.array(terms, dtype=str),
+            offsets,
+            pairs[:, 0].astype(np.int32),
+            np.minimum(pairs[:, 1], np.iinfo(np.uint16).max).astype(np.uint16),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "_Segment":
+        with np.load(path, allow_pickle=False) as data:
+            # Materialize now: a merge may delete the file while this segment is in use
+            return cls(*(np.array(data[key]) for key in (
+                "doc_ids", "doc_lengths", "terms", "offsets", "docs", "freqs"
+            )))
+
+    def save(self, path: Path):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                doc_ids=self.doc_ids,
+                doc_lengths=self.doc_lengths,
+                terms=self.terms,
+                offsets=self.offsets,
+                docs=self.docs,
+                freqs=self.freqs,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return self.docs[:0], self.freqs[:0]
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:stop], self.freqs[start:stop]
+
+    def term_counts(self) -> List[Counter]:
+        """Inverse of build(), used when merging segments"""
+        counts = [Counter() for _ in range(len(self.doc_ids))]
+        for i, term in enumerate(self.terms.tolist()):
+            start, stop = self.offsets[i], self.offsets[i + 1]
+            for doc, freq in zip(self.docs[start:stop].tolist(), self.freqs[start:stop].tolist()):
+                counts[doc][term] = freq
+        return counts
+
+
+class ProjectLexicalIndex:
+    """
+    BM25 index over one project's chunks, stored as immutable postings segments.
+
+    Each flush writes a new segment and then atomically replaces manifest.json, so a
+    reader sees either the old or the new set of segments. Once there are more than
+    LEXICAL_MAX_SEGMENTS they are merged into one. Documents are keyed by vector id
+    (content hash, else chunk id), so hits line up with vector search results.
+
+    Segments are immutable, so removed documents are tombstoned in the manifest, per
+    segment: they are left out of scoring and of the document frequencies and length
+    statistics, and dropped for good by the next merge.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.segments: List[_Segment] = []
+        self.segment_names: List[str] = []
+        self.deleted: Dict[str, List[str]] = {}  # segment name -> tombstoned doc ids
+        self._alive: List[np.ndarray] = []  # per segment, False for tombstoned docs
+        self._doc_ids: Optional[set] = None
+        self._manifest_mtime: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def _manifest_path(self) -> Path:
+        return self.path / _MANIFEST
+
+    def refresh(self):
+        """(Re)load the segments if another process changed the manifest"""
+        with self._lock:
+            try:
+                mtime = self._manifest_path().stat().st_mtime_ns
+            except FileNotFoundError:
+                self.segments, self.segment_names, self.deleted = [], [], {}
+                self._alive, self._doc_ids = [], None
+                self._manifest_mtime = None
+                return
+            if mtime == self._manifest_mtime:
+                return
+
+            manifest = json.loads(self._manifest_path().read_text())
+            names = manifest["segments"]
+            loaded = dict(zip(self.segment_names, self.segments))
+            self.segments = [loaded.get(name) or _Segment.load(self.path / name) for name in names]
+            self.segment_names = names
+            self.deleted = manifest.get("deleted", {})
+            self._apply_tombstones()
+            self._manifest_mtime = mtime
+
+    def _apply_tombstones(self):
+        self._alive = [
+            ~np.isin(segment.doc_ids, self.deleted.get(name, []))
+            for name, segment in zip(self.segment_names, self.segments)
+        ]
+        self._doc_ids = None
+
+    @property
+    def doc_count(self) -> int:
+        return sum(int(alive.sum()) for alive in self._alive)
+
+    def contains(self, doc_id: str) -> bool:
+        with self._lock:
+            if self._doc_ids is None:
+                self._doc_ids = {
+                    i for segment, alive in zip(self.segments, self._alive) for i in segment.doc_ids[alive].tolist()
+                }
+            return doc_id in self._doc_ids
+
+    def add_segment(self, doc_ids: List[str], term_counts: List[Counter]):
+        """Persist a batch of documents as a new segment and commit it"""
+        with self._lock:
+            self.refresh()
+            self.path.mkdir(parents=True, exist_ok=True)
+            segment = _Segment.build(doc_ids, term_counts)
+            number = max((int(name.split(".")[1]) for name in self.segment_names), default=-1) + 1
+            name = f"segment.{number}.npz"
+            segment.save(self.path / name)
+
+            self.segments.append(segment)
+            self.segment_names.append(name)
+            self._alive.append(np.ones(len(doc_ids), dtype=bool))
+            if self._doc_ids is not None:
+                self._doc_ids.update(doc_ids)
+
+            if len(self.segments) > settings.LEXICAL_MAX_SEGMENTS:
+                self._merge(number + 1)
+            else:
+                self._commit()
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """Tombstone documents in every segment holding them; returns how many were live"""
+        with self._lock:
+            self.refresh()
+            doc_ids = list(doc_ids)
+            removed = 0
+            for name, segment, alive in zip(self.segment_names, self.segments, self._alive):
+                hit = np.isin(segment.doc_ids, doc_ids) & alive
+                if hit.any():
+                    self.deleted.setdefault(name, []).extend(segment.doc_ids[hit].tolist())
+                    removed += int(hit.sum())
+            if not removed:
+                return 0
+
+            self._apply_tombstones()
+            tombstones = sum(len(ids) for ids in self.deleted.values())
+            if tombstones > MAX_DELETED_SHARE * (self.doc_count + tombstones):
+                number = max(int(name.split(".")[1]) for name in self.segment_names) + 1
+                self._merge(number)
+            else:
+                self._commit()
+            return removed
+
+    def _merge(self, number: int):
+        """Rewrite the live documents of all segments as one, purging tombstones"""
+        doc_ids, term_counts = [], []
+        for segment, alive in zip(self.segments, self._alive):
+            counts = segment.term_counts()
+            for doc in np.flatnonzero(alive).tolist():
+                doc_ids.append(str(segment.doc_ids[doc]))
+                term_counts.append(counts[doc])
+
+        name = f"segment.{number}.npz"
+        merged = _Segment.build(doc_ids, term_counts)
+        merged.save(self.path / name)
+        stale = self.segment_names
+        self.segments, self.segment_names, self.deleted = [merged], [name], {}
+        self._apply_tombstones()
+        self._commit()
+        for old in stale:
+            (self.path / old).unlink(missing_ok=True)
+        logger.info(f"🧹 Merged {len(stale)} lexical segments for {self.path.name} ({len(doc_ids)} docs)")
+
+    def _commit(self):
+        tmp = self.path / f"{_MANIFEST}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"segments": self.segment_names, "deleted": self.deleted}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._manifest_path())
+        self._manifest_mtime = self._manifest_path().stat().st_mtime_ns
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Top-k (doc id, BM25 score) for a free-text query"""
+        with self._lock:
+            self.refresh()
+            segments, alive = self.segments, self._alive
+        terms = list(dict.fromkeys(tokenize(query)))
+        total_docs = sum(int(mask.sum()) for mask in alive)
+        if not terms or not total_docs or top_k <= 0:
+            return []
+
+        average_length = sum(
+            int(segment.doc_lengths[mask].sum()) for segment, mask in zip(segments, alive)
+        ) / total_docs
+        # Tombstoned docs are dropped from the postings, so they count nowhere
+        postings = [
+            [(docs[mask[docs]], freqs[mask[docs]]) for docs, freqs in map(segment.postings, terms)]
+            for segment, mask in zip(segments, alive)
+        ]
+        # Document frequency is global across segments
+        df = np.array([
+            sum(len(per_segment[t][0]) for per_segment in postings) for t in range(len(terms))
+        ], dtype=np.float64)
+        idf = np.log(1.0 + (total_docs - df + 0.5) / (df + 0.5))
+
+        hits_ids, hits_scores = [], []
+        for segment, per_term in zip(segments, postings):
+            scores = np.zeros(len(segment.doc_ids), dtype=np.float64)
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * segment.doc_lengths / average_length)
+            for t, (docs, freqs) in enumerate(per_term):
+                if len(docs):
+                    tf = freqs.astype(np.float64)
+                    # A doc appears once per term's postings, so fancy-index += is safe
+                    scores[docs] += idf[t] * tf * (BM25_K1 + 1) / (tf + norms[docs])
+
+            matched = np.flatnonzero(scores)
+            if len(matched) > top_k:
+                matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+            hits_ids.extend(segment.doc_ids[matched].tolist())
+            hits_scores.extend(scores[matched].tolist())
+
+        ranked = sorted(zip(hits_ids, hits_scores), key=lambda hit: -hit[1])
+        return ranked[:top_k]
+
+
+class LexicalIndexWriter:
+    """
+    Collects tokenized chunks during ingest and flushes them as segments.
+
+    A segment is written every LEXICAL_SEGMENT_DOCS documents and on flush(), so
+    memory stays bounded on large uploads. Chunks already indexed (same vector id)
+    are skipped.
+    """
+
+    def __init__(self, service: "LexicalIndexService", project_id: str):
+        self.service = service
+        self.project_id = project_id
+        self.index = service.get(project_id)
+        self.index.refresh()
+        self._doc_ids: List[str] = []
+        self._term_counts: List[Counter] = []
+        self._pending = set()
+        self.added = 0
+
+    async def add(self, chunks: Iterable[Dict]):
+        for chunk in chunks:
+            doc_id = chunk.get("content_hash") or chunk["id"]
+            if doc_id in self._pending or self.index.contains(doc_id):
+                continue
+            self._pending.add(doc_id)
+            self._doc_ids.append(doc_id)
+            self._term_counts.append(Counter(tokenize(chunk["content"])))
+        if len(self._doc_ids) >= settings.LEXICAL_SEGMENT_DOCS:
+            await self.flush()
+
+    def discard(self, doc_ids: Iterable[str]):
+        """Drop documents that were added but not flushed yet, e.g. from a file that failed"""
+        doc_ids = set(doc_ids) & self._pending
+        if not doc_ids:
+            return
+        self._pending -= doc_ids
+        kept = [i for i, doc_id in enumerate(self._doc_ids) if doc_id not in doc_ids]
+        self._doc_ids = [self._doc_ids[i] for i in kept]
+        self._term_counts = [self._term_counts[i] for i in kept]
+
+    async def flush(self):
+        if not self._doc_ids:
+            return
+        doc_ids, term_counts = self._doc_ids, self._term_counts
+        self._doc_ids, self._term_counts = [], []
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.index.add_segment, doc_ids, term_counts)
+        self.added += len(doc_ids)
+        await retrieval_cache.bump(self.project_id)
+        logger.info(f"🔤 Indexed {len(doc_ids)} chunks for keyword search in {self.project_id}")
+
+
+class LexicalIndexService:
+    """Per-project BM25 indexes under LEXICAL_INDEX_DIR, loaded lazily and cached"""
+
+    def __init__(self, root: str = None):
+        self.root = Path(root or settings.LEXICAL_INDEX_DIR)
+        self._indexes: Dict[str, ProjectLexicalIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, project_id: str) -> ProjectLexicalIndex:
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is None:
+                index = self._indexes[project_id] = ProjectLexicalIndex(self.root / f"project_{project_id}")
+            return index
+
+    def writer(self, project_id: str) -> LexicalIndexWriter:
+        return LexicalIndexWriter(self, project_id)
+
+    async def search(self, project_id: str, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """Top-k (vector id, BM25 score) for query; empty if the project has no index"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.get(project_id).search, query, top_k)
+        )
+
+    async def remove(self, project_id: str, doc_ids: List[str]) -> int:
+        """Tombstone documents (vector ids) whose chunks were removed from the project"""
+        if not doc_ids:
+            return 0
+        loop = asyncio.get_running_loop()
+        removed = await loop.run_in_executor(None, self.get(project_id).remove, doc_ids)
+        if removed:
+            await retrieval_cache.bump(project_id)
+        return removed
+
+    def delete(self, project_id: str):
+        """Drop a project's index from memory and disk"""
+        with self._lock:
+            self._indexes.pop(project_id, None)
+        shutil.rmtree(self.root / f"project_{project_id}", ignore_errors=True)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it is in.
+
+    Only ranks are used, so BM25 scores and vector distances need no calibration.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+lexical_index = LexicalIndexService()
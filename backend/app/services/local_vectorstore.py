@@ -0,0 +1,663 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.quantization import QuantizedMatrix
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = "manifest.json"
+_LOCK_FILE = ".lock"
+
+
+def _fsync_write(path: Path, data: bytes, mode: str = "ab"):
+    with open(path, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def matches_where(metadata: Optional[Dict], where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma-style metadata filter ($eq, $ne, $in, $nin, $gt/$gte/$lt/$lte, $and, $or)"""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if op == "$gt" and not value > operand:
+                        return False
+                    if op == "$gte" and not value >= operand:
+                        return False
+                    if op == "$lt" and not value < operand:
+                        return False
+                    if op == "$lte" and not value <= operand:
+                        return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+_RANGE_OPS = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+def _compare(column: np.ndarray, op: str, operand) -> np.ndarray:
+    """Boolean mask of one where operator applied to a metadata column"""
+    if op == "$eq":
+        return np.asarray(column == operand, dtype=bool)
+    if op == "$ne":
+        return np.asarray(column != operand, dtype=bool)
+    if op in ("$in", "$nin"):
+        hit = np.zeros(len(column), dtype=bool)
+        for value in operand:
+            hit |= np.asarray(column == value, dtype=bool)
+        return hit if op == "$in" else ~hit
+    if op in _RANGE_OPS:
+        present = np.asarray(column != None, dtype=bool)  # noqa: E711 - elementwise
+        values = np.where(present, column, operand)
+        return present & np.asarray(_RANGE_OPS[op](values, operand), dtype=bool)
+    raise ValueError(f"Unsupported where operator: {op}")
+
+
+class _IVFIndex:
+    """
+    Inverted-file approximate index: rows are bucketed under their nearest k-means
+    centroid, and a query only scores the rows of its nprobe nearest buckets.
+    """
+
+    def __init__(self, matrix: QuantizedMatrix, rows: int, seed: int = 0):
+        self.rows = rows
+        vectors = matrix.dequantize(0, rows)
+        lists = max(int(np.sqrt(rows)), 1)
+
+        # A few Lloyd iterations on a sample are plenty for bucketing
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(rows, size=min(rows, 50 * lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+        for _ in range(10):
+            assignment = self._nearest(centroids, sample)
+            for c in range(lists):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+        self.centroids = centroids
+
+        assignment = np.concatenate([
+            self._nearest(centroids, vectors[start:start + 65536])
+            for start in range(0, rows, 65536)
+        ])
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(lists + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(lists)]
+
+    @staticmethod
+    def _nearest(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        distances = (
+            np.einsum("ij,ij->i", centroids, centroids)[None, :]
+            - 2 * vectors @ centroids.T
+        )
+        return distances.argmin(axis=1)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        distances = np.einsum("ij,ij->i", self.centroids, self.centroids) - 2 * self.centroids @ query
+        probe = np.argsort(distances)[:min(nprobe, len(self.lists))]
+        return np.concatenate([self.lists[c] for c in probe])
+
+
+class LocalCollection:
+    """
+    One project's vectors on local disk, with the subset of the chromadb Collection
+    API that VectorStoreService uses (add, upsert, update, get, query, count, delete).
+
+    Storage is a generation of three files:
+      vectors.<gen>.f32   raw float32 rows, memory-mapped for search
+      records.<gen>.jsonl append-only sidecar log of row ids, documents, metadata,
+                          metadata updates and deletions
+      manifest.json       committed row count and log length for the generation
+
+    Appends write vectors and log records first and then atomically replace the
+    manifest; anything past the committed lengths (an interrupted append) is ignored
+    by readers and cut off by the next writer. Compaction writes the live rows to a
+    new generation and switches the manifest, so readers only ever see a whole
+    generation.
+
+    The API workers and the job worker are separate processes sharing the directory.
+    Every call takes an flock on the collection's lock file (shared for reads,
+    exclusive for writes and compaction) and first catches up with the manifest:
+    a grown log is replayed from where this process stopped, a new generation (or a
+    collection dropped and recreated) is loaded from scratch.
+    """
+
+    def __init__(self, path: Path, name: str, metadata: Optional[Dict] = None):
+        self.path = path
+        self.name = name
+        self.metadata = metadata or {}
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._instance = ""  # Random per creation, so a recreated collection is never mistaken for this one
+        self._dimension: Optional[int] = None
+        self._rows = 0
+        self._log_bytes = 0
+
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_of: Dict[str, int] = {}
+
+        self._matrix: Optional[QuantizedMatrix] = None
+        self._ivf: Optional[_IVFIndex] = None
+        # Metadata key -> values per row, for column-wise where filters
+        self._columns: Dict[str, np.ndarray] = {}
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock_fd = os.open(self.path / _LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._lock, self._file_lock(exclusive=True):
+            manifest = self._read_manifest()
+            if manifest is not None:
+                self._load(manifest)
+            else:
+                self._instance = uuid.uuid4().hex
+                self._commit()
+
+    # ------------------------------------------------------------ storage
+
+    @property
+    def _vectors_file(self) -> Path:
+        return self.path / f"vectors.{self._generation}.f32"
+
+    @property
+    def _records_file(self) -> Path:
+        return self.path / f"records.{self._generation}.jsonl"
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Cross-process flock on the lock file (a no-op where fcntl is unavailable)"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False):
+        """Thread and file lock for one collection call, with state refreshed from disk"""
+        with self._lock, self._file_lock(exclusive):
+            self._refresh()
+            yield
+
+    def close(self):
+        """Release the lock file descriptor"""
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            return json.loads((self.path / _MANIFEST).read_text())
+        except FileNotFoundError:
+            return None
+
+    def _commit(self):
+        manifest = {
+            "name": self.name,
+            "metadata": self.metadata,
+            "instance": self._instance,
+            "generation": self._generation,
+            "dimension": self._dimension,
+            "rows": self._rows,
+            "log_bytes": self._log_bytes,
+        }
+        tmp = self.path / f"{_MANIFEST}.tmp"
+        _fsync_write(tmp, json.dumps(manifest).encode("utf-8"), mode="wb")
+        os.replace(tmp, self.path / _MANIFEST)
+
+    def _refresh(self):
+        """Catch up with whatever other processes committed since this one last looked"""
+        manifest = self._read_manifest()
+        if manifest is None:
+            raise ValueError(f"Collection {self.name} does not exist.")
+        if (
+            manifest.get("instance", "") != self._instance
+            or manifest["generation"] != self._generation
+            or manifest["log_bytes"] < self._log_bytes
+        ):
+            self._load(manifest)
+        elif manifest["log_bytes"] > self._log_bytes:
+            self._read_log(manifest)
+
+    def _load(self, manifest: Dict):
+        """Rebuild in-memory state from a committed manifest"""
+        self.metadata = manifest.get("metadata") or self.metadata
+        self._instance = manifest.get("instance", "")
+        self._generation = manifest["generation"]
+        self._ids, self._documents, self._metadatas = [], [], []
+        self._row_of = {}
+        self._alive = np.zeros(manifest["rows"], dtype=bool)
+        self._rows = 0
+        self._log_bytes = 0
+        self._matrix, self._ivf = None, None
+        self._read_log(manifest)
+
+    def _read_log(self, manifest: Dict):
+        """Replay the committed log from where this process stopped"""
+        if self._records_file.exists():
+            with open(self._records_file, "rb") as f:
+                f.seek(self._log_bytes)
+                for line in f.read(manifest["log_bytes"] - self._log_bytes).splitlines():
+                    self._replay(json.loads(line))
+        self._dimension = manifest["dimension"]
+        self._rows = manifest["rows"]
+        self._log_bytes = manifest["log_bytes"]
+        self._columns = {}
+
+    def _truncate_uncommitted(self):
+        """Cut off the tail of an append that never reached the manifest (writers only)"""
+        for file, size in (
+            (self._vectors_file, self._rows * (self._dimension or 0) * 4),
+            (self._records_file, self._log_bytes),
+        ):
+            if file.exists() and file.stat().st_size > size:
+                logger.warning(f"⚠️ Discarding uncommitted tail of {file}")
+                with open(file, "r+b") as f:
+                    f.truncate(size)
+
+    def _replay(self, record: Dict):
+        op = record["op"]
+        if op == "add":
+            self._add_row(record["id"], record.get("document") or "", record.get("metadata") or {})
+        elif op == "update":
+            row = self._row_of.get(record["id"])
+            if row is not None:
+                self._metadatas[row] = {**self._metadatas[row], **record["metadata"]}
+                if "document" in record:
+                    self._documents[row] = record["document"]
+        elif op == "delete":
+            row = self._row_of.pop(record["id"], None)
+            if row is not None:
+                self._alive[row] = False
+
+    def _add_row(self, id_: str, document: str, metadata: Dict):
+        row = len(self._ids)
+        previous = self._row_of.get(id_)
+        if previous is not None:
+            self._alive[previous] = False
+        self._ids.append(id_)
+        self._documents.append(document)
+        self._metadatas.append(metadata)
+        self._row_of[id_] = row
+        if row >= len(self._alive):
+            grown = np.zeros(max(2 * len(self._alive), row + 1, 1024), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+        self._alive[row] = True
+
+    def _append(self, records: List[Dict], vectors: Optional[np.ndarray] = None):
+        """Durably append log records (and their vector rows), then commit the manifest"""
+        self._truncate_uncommitted()
+        if vectors is not None and len(vectors):
+            if self._dimension is None:
+                self._dimension = int(vectors.shape[1])
+            elif vectors.shape[1] != self._dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self._dimension}"
+                )
+            _fsync_write(self._vectors_file, np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+
+        log = b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records)
+        _fsync_write(self._records_file, log)
+
+        for record in records:
+            self._replay(record)
+        self._rows = len(self._ids)
+        self._log_bytes += len(log)
+        self._commit()
+        self._columns = {}
+
+        if vectors is not None and len(vectors):
+            self._matrix = None
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        dead = self._rows - len(self._row_of)
+        if dead >= max(settings.LOCAL_VECTOR_COMPACT_MIN_DEAD, settings.LOCAL_VECTOR_COMPACT_RATIO * self._rows):
+            self._compact()
+
+    def compact(self):
+        """Rewrite live rows into a new generation, dropping deleted and superseded rows"""
+        with self._locked(exclusive=True):
+            self._compact()
+
+    def _compact(self):
+        live = np.flatnonzero(self._alive[:self._rows])
+        old_vectors, old_records = self._vectors_file, self._records_file
+        source = self._memmap()
+
+        self._generation += 1
+        if self._vectors_file.exists():
+            self._vectors_file.unlink()
+        for start in range(0, len(live), 65536):
+            block = live[start:start + 65536]
+            _fsync_write(self._vectors_file, np.ascontiguousarray(source[block], dtype="<f4").tobytes())
+        if not len(live):
+            _fsync_write(self._vectors_file, b"")
+
+        records = [
+            {"op": "add", "id": self._ids[row], "document": self._documents[row], "metadata": self._metadatas[row]}
+            for row in live
+        ]
+        log = b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records)
+        _fsync_write(self._records_file, log, mode="wb")
+
+        ids, documents, metadatas = self._ids, self._documents, self._metadatas
+        self._ids, self._documents, self._metadatas = [], [], []
+        self._row_of, self._alive = {}, np.zeros(0, dtype=bool)
+        for row in live:
+            self._add_row(ids[row], documents[row], metadatas[row])
+        self._rows = len(self._ids)
+        self._log_bytes = len(log)
+        self._commit()
+
+        del source
+        self._matrix, self._ivf, self._columns = None, None, {}
+        for file in (old_vectors, old_records):
+            file.unlink(missing_ok=True)
+        logger.info(f"🧹 Compacted {self.name}: {len(live)} live rows (generation {self._generation})")
+
+    # ------------------------------------------------------------ search state
+
+    def _memmap(self) -> np.ndarray:
+        if not self._rows or self._dimension is None:
+            return np.empty((0, self._dimension or 0), dtype=np.float32)
+        return np.memmap(self._vectors_file, dtype="<f4", mode="r", shape=(self._rows, self._dimension))
+
+    def _search_matrix(self) -> QuantizedMatrix:
+        """
+        Matrix used for scoring, rebuilt lazily after appends.
+
+        Unquantized collections score straight off the memory map; float16/int8
+        (VECTOR_QUANTIZATION) keep a compact resident copy instead.
+        """
+        if self._matrix is None or len(self._matrix) != self._rows:
+            self._matrix = QuantizedMatrix.from_float(self._memmap(), settings.VECTOR_QUANTIZATION)
+        return self._matrix
+
+    def _approximate_index(self, matrix: QuantizedMatrix) -> Optional[_IVFIndex]:
+        """IVF index for large collections; rebuilt once enough rows were added since"""
+        if self._rows < settings.LOCAL_VECTOR_IVF_MIN_ROWS:
+            return None
+        if self._ivf is None or self._rows > self._ivf.rows * 1.2:
+            self._ivf = _IVFIndex(matrix, self._rows)
+            logger.info(f"✅ Built IVF index for {self.name}: {len(self._ivf.lists)} lists, {self._rows} rows")
+        return self._ivf
+
+    def _column(self, key: str) -> np.ndarray:
+        """Values of one metadata key for every row, cached until the next write"""
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(self._rows, dtype=object)
+            column[:] = [metadata.get(key) for metadata in self._metadatas[:self._rows]]
+            self._columns[key] = column
+        return column
+
+    def _mask_where(self, where: Dict) -> np.ndarray:
+        """Row bitmap for a where filter, evaluated a metadata column at a time"""
+        mask = np.ones(self._rows, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._mask_where(clause)
+            elif key == "$or":
+                hit = np.zeros(self._rows, dtype=bool)
+                for clause in condition:
+                    hit |= self._mask_where(clause)
+                mask &= hit
+            else:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for op, operand in condition.items():
+                    mask &= _compare(self._column(key), op, operand)
+        return mask
+
+    def _rows_where(self, where: Optional[Dict], ids: Optional[List[str]] = None) -> np.ndarray:
+        if ids is not None:
+            rows = [self._row_of[i] for i in ids if i in self._row_of]
+            if where:
+                rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+            return np.asarray(rows, dtype=np.int64)
+
+        mask = self._alive[:self._rows].copy()
+        if where:
+            mask &= self._mask_where(where)
+        return np.flatnonzero(mask)
+
+    # ------------------------------------------------------------ collection API
+
+    def count(self) -> int:
+        with self._locked():
+            return len(self._row_of)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """Add new rows; ids that already exist are skipped, as in Chroma"""
+        with self._locked(exclusive=True):
+            keep = [i for i, id_ in enumerate(ids) if id_ not in self._row_of]
+            self._write_rows(
+                [ids[i] for i in keep],
+                np.asarray(embeddings, dtype=np.float32)[keep] if keep else None,
+                [documents[i] for i in keep] if documents else None,
+                [metadatas[i] for i in keep] if metadatas else None,
+            )
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        """Add rows, superseding existing rows with the same ids"""
+        with self._locked(exclusive=True):
+            self._write_rows(ids, np.asarray(embeddings, dtype=np.float32), documents, metadatas)
+
+    def _write_rows(self, ids, vectors, documents, metadatas):
+        if not ids:
+            return
+        records = [
+            {
+                "op": "add",
+                "id": id_,
+                "document": documents[i] if documents else "",
+                "metadata": metadatas[i] if metadatas else {},
+            }
+            for i, id_ in enumerate(ids)
+        ]
+        self._append(records, vectors)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        """Merge metadata into existing rows; new embeddings supersede the row"""
+        with self._locked(exclusive=True):
+            positions = [(i, self._row_of[id_]) for i, id_ in enumerate(ids) if id_ in self._row_of]
+            if not positions:
+                return
+            if embeddings is not None:
+                vectors = np.asarray(embeddings, dtype=np.float32)
+                self._write_rows(
+                    [ids[i] for i, _ in positions],
+                    vectors[[i for i, _ in positions]],
+                    [documents[i] if documents else self._documents[row] for i, row in positions],
+                    [{**self._metadatas[row], **(metadatas[i] if metadatas else {})} for i, row in positions],
+                )
+                return
+            records = []
+            for i, _ in positions:
+                record = {"op": "update", "id": ids[i], "metadata": metadatas[i] if metadatas else {}}
+                if documents:
+                    record["document"] = documents[i]
+                records.append(record)
+            self._append(records)
+
+    def delete(self, ids=None, where=None):
+        with self._locked(exclusive=True):
+            rows = self._rows_where(where, ids)
+            if len(rows):
+                self._append([{"op": "delete", "id": self._ids[row]} for row in rows])
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=None):
+        with self._locked():
+            rows = self._rows_where(where, ids)[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._documents[row] for row in rows],
+                "metadatas": [self._metadatas[row] for row in rows],
+            }
+            if include and "embeddings" in include:
+                result["embeddings"] = np.asarray(self._memmap()[rows]).tolist() if len(rows) else []
+            return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        """
+        Nearest rows by squared l2 distance (Chroma's default space).
+
+        A where filter is applied first, as a row bitmap, and only the matching rows
+        are scored, so all n_results slots go to rows that pass the filter.
+        """
+        with self._locked():
+            result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+            if not self._rows:
+                for _ in queries:
+                    for key in result:
+                        result[key].append([])
+                return result
+
+            matrix = self._search_matrix()
+            index = None if where else self._approximate_index(matrix)
+            dead = len(self._row_of) < self._rows
+            filtered = self._rows_where(where) if where or dead else None
+
+            for query in queries:
+                rows = filtered
+                if index is not None:
+                    # Probed buckets plus rows appended after the index was built
+                    rows = np.concatenate([
+                        index.candidates(query, settings.LOCAL_VECTOR_IVF_NPROBE),
+                        np.arange(index.rows, self._rows),
+                    ])
+                    if dead:
+                        rows = rows[self._alive[rows]]
+                if rows is not None and not len(rows):
+                    found, distances = np.empty((1, 0), dtype=np.int64), np.empty((1, 0))
+                else:
+                    found, distances = matrix.search(query, n_results, "l2", rows)
+                result["ids"].append([self._ids[row] for row in found[0]])
+                result["documents"].append([self._documents[row] for row in found[0]])
+                result["metadatas"].append([self._metadatas[row] for row in found[0]])
+                result["distances"].append([float(d) for d in distances[0]])
+                if include and "embeddings" in include:
+                    vectors = self._memmap()[found[0]] if len(found[0]) else []
+                    result.setdefault("embeddings", []).append(np.asarray(vectors).tolist())
+            return result
+
+
+class LocalVectorClient:
+    """
+    Stands in for chromadb.HttpClient, with one directory per collection.
+
+    Collection objects are kept per process; each call re-checks the directory, so
+    collections dropped or recreated by another process are noticed.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+        if fcntl is None:
+            logger.warning("⚠️ fcntl unavailable: the local vector store must only be used by one process")
+
+    def _dir(self, name: str) -> Path:
+        return self.path / name
+
+    def _exists(self, name: str) -> bool:
+        return (self._dir(name) / _MANIFEST).exists()
+
+    def _forget(self, name: str):
+        collection = self._collections.pop(name, None)
+        if collection is not None:
+            collection.close()
+
+    def get_collection(self, name: str, **kwargs) -> LocalCollection:
+        with self._lock:
+            if not self._exists(name):
+                self._forget(name)
+                raise ValueError(f"Collection {name} does not exist.")
+            if name not in self._collections:
+                self._collections[name] = LocalCollection(self._dir(name), name)
+            return self._collections[name]
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None, **kwargs) -> LocalCollection:
+        with self._lock:
+            if not self._exists(name):
+                self._forget(name)
+            if name not in self._collections:
+                self._collections[name] = LocalCollection(self._dir(name), name, metadata)
+            return self._collections[name]
+
+    def create_collection(self, name: str, metadata: Optional[Dict] = None, **kwargs) -> LocalCollection:
+        if self._exists(name):
+            raise ValueError(f"Collection {name} already exists.")
+        return self.get_or_create_collection(name, metadata)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            if not self._exists(name):
+                self._forget(name)
+                raise ValueError(f"Collection {name} does not exist.")
+            collection = self._collections.pop(name, None) or LocalCollection(self._dir(name), name)
+            # Waits for other processes' calls on it; they fail cleanly afterwards
+            with collection._lock, collection._file_lock(exclusive=True):
+                (self._dir(name) / _MANIFEST).unlink(missing_ok=True)
+                shutil.rmtree(self._dir(name), ignore_errors=True)
+            collection.close()
+
+    def list_collections(self) -> List[LocalCollection]:
+        return [
+            self.get_collection(entry.name)
+            for entry in sorted(self.path.iterdir())
+            if (entry / _MANIFEST).exists()
+        ]
+
+    def heartbeat(self) -> int:
+        return 0
+
@@ -1,7 +1,18 @@
-from typing import List, Dict
+import asyncio
+import itertools
+import numpy as np
+from typing import Iterable, List, Dict, Optional, Set, Tuple
+from app.core.config import settings
+from app.services.context_builder import (
+    CONTEXT_SEPARATOR, build_context, count_tokens, group_chunks, trim_to_tokens
+)
 from app.services.embedding_service import embedding_service
+from app.services.lexical_index import lexical_index, reciprocal_rank_fusion
 from app.services.llm_service import llm_service
-from app.services.vectorstore_service import vectorstore_service
+from app.services.retrieval_cache import retrieval_cache
+from app.services.retrieval_ranking import cosine_similarities, mmr_select
+from app.services.summary_cache import summary_cache
+from app.services.vectorstore_service import vectorstore_service, build_where
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,78 +22,324 @@ class RAGService:
     
     async def generate_documentation(
         self,
-        chunks: List[Dict],
+        chunks: Iterable[Dict],
         project_name: str
     ) -> str:
-        """Generate README from chunks"""
+        """
+        Generate README from chunks, given in document order.
         
-        # Combine chunks
-        context = "\n\n".join([c["content"] for c in chunks[:20]])
+        Content that fits the README prompt is documented in a single call. Larger
+        uploads are map-reduced: each file's chunks are grouped to fit one LLM call,
+        the groups are summarized README_MAP_CONCURRENCY at a time, and the README is
+        written from the summaries (summarized again while they don't fit). Summaries
+        are cached by group text, so regenerating an unchanged project costs one call.
+        """
         
         # Use prompt from prompts/readme_prompt.py
         from app.prompts.readme_prompt import get_readme_prompt
         
         system_prompt = get_readme_prompt()
-        user_prompt = f"""Project: {project_name}
+        
+        def user_prompt(context: str) -> str:
+            return f"""Project: {project_name}
 
 Content to document:
 {context}
 
 Generate a comprehensive, kid-friendly README with examples."""
         
+        budget = self._context_budget(settings.README_MAX_OUTPUT_TOKENS, system_prompt, user_prompt(""))
+        
+        # Read ahead only until the content is known not to fit
+        chunks = iter(chunks)
+        head, tokens = [], 0
+        for chunk in chunks:
+            head.append(chunk)
+            tokens += count_tokens(chunk["content"])
+            if tokens > budget:
+                sections = await self._summarize(itertools.chain(head, chunks), budget)
+                break
+        else:
+            sections = head
+        
+        packed = build_context(sections, budget)
+        logger.info(f"📝 README context: {len(packed['chunks'])} sections, {packed['tokens']} tokens")
+        
         readme = await llm_service.generate_text(
-            prompt=user_prompt,
+            prompt=user_prompt(packed["context"]),
             system_prompt=system_prompt,
-            max_tokens=3000,
+            max_tokens=settings.README_MAX_OUTPUT_TOKENS,
             temperature=0.7
         )
         
         return readme
     
-    async def chat(
+    async def _summarize(self, chunks: Iterable[Dict], budget: int) -> List[Dict]:
+        """Summaries of all chunks, reduced further until they fit budget (or levels run out)"""
+        from app.prompts.readme_prompt import get_section_summary_prompt
+        
+        system_prompt = get_section_summary_prompt()
+        group_budget = self._context_budget(
+            settings.README_MAP_OUTPUT_TOKENS, system_prompt, self._section_prompt("")
+        )
+        
+        sections = await self._summarize_groups(group_chunks(chunks, group_budget), system_prompt, headed=True)
+        for _ in range(settings.README_MAX_REDUCE_LEVELS):
+            if not build_context(sections, budget)["dropped"]:
+                break
+            groups = list(group_chunks(sections, group_budget, by_file=False))
+            if len(groups) >= len(sections):
+                break  # Summaries too long to combine; build_context truncates instead
+            sections = await self._summarize_groups(groups, system_prompt, headed=False)
+        return sections
+    
+    async def _summarize_groups(
+        self,
+        groups: Iterable[List[Dict]],
+        system_prompt: str,
+        headed: bool
+    ) -> List[Dict]:
+        """Summarize groups in order, at most README_MAP_CONCURRENCY LLM calls at once"""
+        semaphore = asyncio.Semaphore(max(settings.README_MAP_CONCURRENCY, 1))
+        tasks = []
+        try:
+            for group in groups:
+                # The next group is only read from the stream once a slot is free
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(
+                    self._summarize_group(group, system_prompt, headed, semaphore)
+                ))
+            sections = list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        cached = sum(section.pop("cached") for section in sections)
+        logger.info(f"🗜️ Summarized {len(sections)} sections ({cached} cached)")
+        return sections
+    
+    async def _summarize_group(
+        self,
+        group: List[Dict],
+        system_prompt: str,
+        headed: bool,
+        semaphore: asyncio.Semaphore
+    ) -> Dict:
+        """One map call, skipped when the same text was summarized before"""
+        try:
+            text = CONTEXT_SEPARATOR.join(chunk["content"] for chunk in group)
+            prompt = self._section_prompt(text)
+            key = summary_cache.key(system_prompt, prompt)
+            summary = await summary_cache.get(key)
+            cached = summary is not None
+            if not cached:
+                try:
+                    summary = await llm_service.generate_text(
+                        prompt=prompt,
+                        system_prompt=system_prompt,
+                        max_tokens=settings.README_MAP_OUTPUT_TOKENS,
+                        temperature=0.3
+                    )
+                    await summary_cache.put(key, summary)
+                except Exception as e:
+                    # Not cached, so the next regeneration retries it
+                    logger.error(f"❌ Section summary failed, using its opening text: {e}")
+                    summary = trim_to_tokens(text, settings.README_MAP_OUTPUT_TOKENS)
+        finally:
+            semaphore.release()
+        
+        source_file = group[0].get("source_file") if headed else None
+        if source_file:
+            summary = f"## {source_file}\n\n{summary}"
+        return {"content": summary, "source_file": source_file, "cached": cached}
+    
+    @staticmethod
+    def _section_prompt(context: str) -> str:
+        return f"""Content:
+{context}"""
+    
+    def _context_budget(self, output_tokens: int, *prompt_parts: str) -> int:
+        """Tokens left for context in CONTEXT_WINDOW after the output reserve and fixed prompt text"""
+        fixed = sum(count_tokens(part) for part in prompt_parts)
+        return max(settings.CONTEXT_WINDOW - output_tokens - fixed, 0)
+    
+    async def retrieve(
         self,
         project_id: str,
         query: str,
-        chat_history: List[Dict] = None
-    ) -> Dict:
-        """RAG-based chat with proper context"""
+        filters: Optional[Dict] = None,
+        top_k: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Most relevant chunks for a query (top_k defaults to RAG_TOP_K).
+        
+        Repeated questions are answered from the retrieval cache: its ranked ids are
+        only valid for the project's current index version, and a hit skips both the
+        query embedding and the vector search.
+        """
+        top_k = top_k or settings.RAG_TOP_K
+        version = await retrieval_cache.version(project_id)
+        key = retrieval_cache.key(project_id, version, query, filters, top_k) if version is not None else None
         
-        # Get embeddings for query
-        query_embedding = await embedding_service.generate_embeddings(query)
+        if key:
+            ranked = await retrieval_cache.get(key)
+            if ranked is not None:
+                chunks = await vectorstore_service.get_chunks(project_id, [entry["id"] for entry in ranked])
+                if len(chunks) == len(ranked):
+                    return [
+                        {**chunk, "distance": entry["distance"], "score": entry["score"], "similarity": entry["similarity"]}
+                        for chunk, entry in zip(chunks, ranked)
+                    ]
+        
+        results = await self._search(project_id, query, filters, top_k)
+        if key:
+            await retrieval_cache.put(key, [
+                {
+                    "id": result["id"],
+                    "distance": result["distance"],
+                    "score": result["score"],
+                    "similarity": result["similarity"],
+                }
+                for result in results
+            ])
+        return results
+    
+    async def _search(
+        self,
+        project_id: str,
+        query: str,
+        filters: Optional[Dict],
+        top_k: int
+    ) -> List[Dict]:
+        """
+        RAG_CANDIDATES vector hits, plus BM25 keyword hits when HYBRID_SEARCH is on,
+        are fetched concurrently and merged by reciprocal rank fusion, so exact
+        identifiers and error messages rank even when the embeddings miss them.
+        Keyword-only hits are loaded from the vector store, which also applies the
+        filters to them. The pool is then thresholded and diversified by _select.
+        """
+        where = build_where(filters)  # Scoping happens inside the index query
+        query_embedding = await embedding_service.embed_query(query)
         
-        # Search vector store
-        results = await vectorstore_service.search(
+        pool = max(settings.RAG_CANDIDATES, top_k)
+        vector_search = vectorstore_service.search(
             project_id=project_id,
             query_embedding=query_embedding,
-            top_k=5  # Get top 5 most relevant chunks
+            top_k=pool,
+            where=where,
+            include_embeddings=True
         )
+        if settings.HYBRID_SEARCH:
+            vector_hits, keyword_hits = await asyncio.gather(
+                vector_search,
+                self._keyword_search(project_id, query, pool)
+            )
+        else:
+            vector_hits, keyword_hits = await vector_search, []
+        
+        fused = reciprocal_rank_fusion(
+            [[hit["id"] for hit in vector_hits], [doc_id for doc_id, _ in keyword_hits]],
+            k=settings.RRF_K
+        )[:pool]
+        
+        by_id = {hit["id"]: hit for hit in vector_hits}
+        missing = [doc_id for doc_id, _ in fused if doc_id not in by_id]
+        for chunk in await vectorstore_service.get_chunks(project_id, missing, where, include_embeddings=True):
+            by_id[chunk["id"]] = chunk
+        candidates = [{**by_id[doc_id], "score": score} for doc_id, score in fused if doc_id in by_id]
+        
+        return self._select(query_embedding, candidates, top_k, {doc_id for doc_id, _ in keyword_hits})
+    
+    def _select(
+        self,
+        query_embedding: np.ndarray,
+        candidates: List[Dict],
+        top_k: int,
+        keyword_ids: Set[str]
+    ) -> List[Dict]:
+        """
+        Drop weak candidates, then pick a diverse top_k by Maximal Marginal Relevance.
+        
+        Candidates below RAG_SIMILARITY_THRESHOLD cosine similarity are dropped unless
+        they matched the query's keywords; if none is left, nothing is returned rather
+        than handing the LLM unrelated text. MMR then skips near-duplicates such as
+        overlapping neighbouring chunks. Relevance is the fused rank score in hybrid
+        mode, the cosine similarity otherwise.
+        """
+        if not candidates:
+            return []
+        
+        vectors = np.stack([candidate.pop("embedding") for candidate in candidates])
+        similarity = cosine_similarities(query_embedding, vectors)
+        keep = similarity >= settings.RAG_SIMILARITY_THRESHOLD
+        keep |= np.array([candidate["id"] in keyword_ids for candidate in candidates])
+        
+        rows = np.flatnonzero(keep)
+        if not len(rows):
+            logger.info(f"🎯 None of {len(candidates)} candidates reached the similarity threshold")
+            return []
+        if keyword_ids:
+            scores = np.array([candidates[row]["score"] for row in rows], dtype=np.float32)
+            relevance = scores / scores.max()
+        else:
+            relevance = similarity[rows]
+        
+        picked = mmr_select(query_embedding, vectors[rows], top_k, settings.RAG_MMR_LAMBDA, relevance)
+        logger.info(f"🎯 Selected {len(picked)} of {len(candidates)} candidates ({len(rows)} above threshold)")
+        return [
+            {**candidates[rows[i]], "similarity": round(float(similarity[rows[i]]), 4)}
+            for i in picked
+        ]
+    
+    async def _keyword_search(self, project_id: str, query: str, top_k: int) -> List[Tuple[str, float]]:
+        try:
+            return await lexical_index.search(project_id, query, top_k=top_k)
+        except Exception as e:
+            logger.warning(f"⚠️ Keyword search failed for {project_id}, using vector results only: {e}")
+            return []
+    
+    async def chat(
+        self,
+        project_id: str,
+        query: str,
+        chat_history: List[Dict] = None,
+        filters: Optional[Dict] = None
+    ) -> Dict:
+        """RAG-based chat with proper context, optionally scoped by metadata filters"""
+        
+        # Most relevant chunks, thresholded and diversified
+        results = await self.retrieve(project_id, query, filters=filters)
         
         if not results:
             return {
-                "response": "I don't have any context about this project yet. Please make sure the files were processed correctly.",
+                "response": "I couldn't find anything in this project's files that answers this question. If you just uploaded them, make sure they finished processing.",
                 "sources": [],
                 "model": "none"
             }
         
-        # Build context from results
-        context = "\n\n".join([r["content"] for r in results])
-        
         # Import and use the chat prompt
         from app.prompts.readme_prompt import get_chat_system_prompt
-        system_prompt = get_chat_system_prompt(context)
+        
+        # Build context from results, within what's left of the window
+        packed = build_context(results, self._context_budget(
+            settings.CHAT_MAX_OUTPUT_TOKENS, get_chat_system_prompt(""), query
+        ))
+        system_prompt = get_chat_system_prompt(packed["context"])
         
         # Generate response
         response = await llm_service.generate_text(
             prompt=query,
             system_prompt=system_prompt,
-            max_tokens=500,
+            max_tokens=settings.CHAT_MAX_OUTPUT_TOKENS,
             temperature=0.7
         )
         
         return {
             "response": response,
-            "sources": results,
-            "model": "llm"
+            "sources": packed["chunks"],
+            "model": "llm",
+            "context_tokens": packed["tokens"]
         }
 
 rag_service = RAGService()
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalCache:
+    """
+    Ranked retrieval results keyed by (project id, index version, normalized query).
+
+    Values are the ranked vector ids with their scores, not chunk text, so a hit
+    costs one chunk lookup instead of a query embedding plus a vector search.
+    Tier 1 is an in-process LRU, tier 2 Redis, shared by all API workers.
+
+    Every index write (ingest, file removal, project deletion) bumps the project's
+    version counter in Redis; entries for older versions are never read again and
+    simply expire. Without Redis there is no shared version, so nothing is cached;
+    the worker, which does the writes, won't start without Redis while the cache is on.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: int = None):
+        self.max_entries = settings.RETRIEVAL_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl = settings.RETRIEVAL_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._entries: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case, whitespace and trailing punctuation don't change the question"""
+        return " ".join(query.lower().split()).strip(" ?!.")
+
+    @classmethod
+    def key(cls, project_id: str, version: str, query: str, filters: Optional[Dict], top_k: int) -> str:
+        scope = json.dumps([cls.normalize(query), filters or {}, top_k], sort_keys=True)
+        return f"ret:{project_id}:{version}:{hashlib.sha256(scope.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def _version_key(project_id: str) -> str:
+        return f"index_version:{project_id}"
+
+    async def version(self, project_id: str) -> Optional[str]:
+        """Current index version of a project, None if it can't be known (no Redis)"""
+        if not settings.ENABLE_RESULT_CACHE or redis_client.redis is None:
+            return None
+        return await redis_client.get(self._version_key(project_id)) or "0"
+
+    async def bump(self, project_id: str):
+        """Invalidate a project's cached results after its index changed"""
+        if redis_client.redis is None:
+            return
+        await redis_client.increment(self._version_key(project_id))
+
+    async def get(self, key: str) -> Optional[List[Dict]]:
+        with self._lock:
+            ranked = self._entries.get(key)
+            if ranked is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return ranked
+
+        ranked = await redis_client.get_json(key)
+        if isinstance(ranked, list):
+            self._put_local(key, ranked)
+            self.redis_hits += 1
+            return ranked
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, ranked: List[Dict]):
+        self._put_local(key, ranked)
+        await redis_client.set(key, ranked, expire=self.ttl)
+
+    def _put_local(self, key: str, ranked: List[Dict]):
+        with self._lock:
+            self._entries[key] = ranked
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters since start and current LRU size"""
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+retrieval_cache = RetrievalCache()
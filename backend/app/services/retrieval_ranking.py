@@ -0,0 +1,54 @@
+from typing import List, Optional
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Unit-length copies of the rows (zero rows stay zero)"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def cosine_similarities(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Cosine similarity of one query vector to each row of an (n, dim) matrix"""
+    return normalize_rows(vectors) @ normalize_rows(query)[0]
+
+
+def mmr_select(
+    query: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_: float = 0.7,
+    relevance: Optional[np.ndarray] = None
+) -> List[int]:
+    """
+    Maximal Marginal Relevance: pick k rows, each maximizing
+    lambda * relevance - (1 - lambda) * (max similarity to rows already picked).
+
+    relevance defaults to cosine similarity with the query. Pairwise similarities
+    come from one (n, n) matrix product, so each step is a vector max and argmax.
+    Returns row indices in selection order.
+    """
+    vectors = normalize_rows(vectors)
+    n = vectors.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    if relevance is None:
+        relevance = vectors @ normalize_rows(query)[0]
+    relevance = np.asarray(relevance, dtype=np.float32)
+    pairwise = vectors @ vectors.T
+
+    selected: List[int] = []
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(k):
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best]) if len(selected) > 1 else pairwise[best].copy()
+    return selected
@@ -0,0 +1,76 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryCache:
+    """
+    README map-step summaries keyed by a hash of (summary prompt, group text).
+
+    A group whose chunks didn't change hashes the same on the next generation, so
+    regenerating a README only summarizes new or edited groups. Keys carry no
+    project id: the same file uploaded to two projects shares its summaries.
+    Tier 1 is an in-process LRU (the worker keeps it across jobs), tier 2 Redis.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: int = None):
+        self.max_entries = settings.SUMMARY_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl = settings.SUMMARY_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(prompt: str, text: str) -> str:
+        digest = hashlib.sha256(f"{prompt}\0{text}".encode("utf-8")).hexdigest()
+        return f"sum:{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return summary
+
+        summary = await redis_client.get(key) if redis_client.redis is not None else None
+        if summary is not None:
+            self._put_local(key, summary)
+            self.redis_hits += 1
+            return summary
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, summary: str):
+        self._put_local(key, summary)
+        if redis_client.redis is not None:
+            await redis_client.set(key, summary, expire=self.ttl)
+
+    def _put_local(self, key: str, summary: str):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit/miss counters since start and current LRU size"""
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+
+summary_cache = SummaryCache()
@@ -1,106 +1,383 @@
-import chromadb
-from typing import List, Dict
+import asyncio
+import functools
+import heapq
+import itertools
+import json
+import time
+import numpy as np
+from typing import Any, Callable, List, Dict, Optional, Set, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
 from app.core.config import settings
 from app.services.embedding_service import embedding_service
+from app.services.retrieval_cache import retrieval_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Collections created before the provider registry carry no model tag; they hold hash vectors
+LEGACY_EMBEDDING_MODEL = "hash"
+
+
+def source_key(source_file: str) -> str:
+    """
+    Metadata flag set (True) on every vector that source_file contains.
+    
+    Deduplicated vectors belong to several files but have one primary source_file;
+    one boolean key per file lets a where filter match any of them.
+    """
+    return f"src:{source_file}"
+
+
+class EmbeddingModelMismatch(Exception):
+    """A project's vectors come from another embedding model than the configured one"""
+    
+    def __init__(self, project_id: str, stored: str, configured: str):
+        super().__init__(
+            f"Project {project_id} is indexed with {stored} but the configured embedding "
+            f"model is {configured}; reindex the project"
+        )
+        self.project_id = project_id
+        self.stored = stored
+        self.configured = configured
+
+
 class VectorStoreService:
     """Chroma vector database wrapper"""
     
     def __init__(self):
+        self.client = self._create_client()
+        
+        # The Chroma client is synchronous; calls run on a dedicated, bounded pool so a
+        # slow round trip never blocks the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(settings.CHROMA_MAX_CONCURRENCY, 1),
+            thread_name_prefix="chroma"
+        )
+        
+        # project_id -> (collection handle, expiry on the monotonic clock)
+        self._collections: Dict[str, Tuple[Any, float]] = {}
+        self._index_info: Dict[str, Dict] = {}
+    
+    def _create_client(self):
+        if settings.VECTOR_DB == "local":
+            # Embedded, file-backed index; everything above the client is shared
+            from app.services.local_vectorstore import LocalVectorClient
+            client = LocalVectorClient(settings.LOCAL_VECTOR_DIR)
+            logger.info(f"✅ Local vector store at {settings.LOCAL_VECTOR_DIR}")
+            return client
+        
+        # Imported here so VECTOR_DB=local deployments don't need chromadb installed
+        import chromadb
+        
         # Use HTTP client to connect to Docker Chroma
-        self.client = chromadb.HttpClient(
+        client = chromadb.HttpClient(
             host=settings.CHROMA_HOST,
             port=settings.CHROMA_PORT,
         )
         logger.info("✅ Chroma HTTP client initialized")
+        return client
+    
+    async def _call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Run a blocking Chroma call on the executor, failing with asyncio.TimeoutError
+        after timeout seconds (CHROMA_QUERY_TIMEOUT by default).
+        
+        A timed-out call keeps its pool thread until Chroma answers, but the caller
+        and the event loop move on.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout or settings.CHROMA_QUERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Chroma {getattr(fn, '__name__', 'call')} timed out")
+            raise
+    
+    def shutdown(self):
+        """Stop the Chroma call pool without waiting for in-flight calls"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
     
     async def create_collection(self, project_id: str):
+        """Collection for the project, created on first use"""
+        return await self.get_collection(project_id, create=True)
+    
+    async def get_collection(self, project_id: str, create: bool = False):
+        """
+        Cached collection handle (refreshed after CHROMA_COLLECTION_CACHE_TTL seconds).
+        
+        Saves the get_collection round trip on every query and the failed
+        create_collection attempt on every ingest.
+        """
+        cached = self._collections.get(project_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        
         collection_name = f"project_{project_id}"
-
-        try:
-            return self.client.create_collection(
+        if create:
+            collection = await self._call(
+                self.client.get_or_create_collection,
                 name=collection_name,
-                metadata={"description": f"Collection for project {project_id}"},
+                metadata={
+                    "description": f"Collection for project {project_id}",
+                    # Vectors of different models share nothing but, at most, a dimension
+                    "embedding_model": embedding_service.provider.model_id,
+                },
             )
+        else:
+            collection = await self._call(self.client.get_collection, name=collection_name)
+        
+        self._collections[project_id] = (collection, time.monotonic() + settings.CHROMA_COLLECTION_CACHE_TTL)
+        return collection
+    
+    def check_model(self, project_id: str, collection):
+        """Raise EmbeddingModelMismatch unless the collection was built by the configured model"""
+        stored = (collection.metadata or {}).get("embedding_model") or LEGACY_EMBEDDING_MODEL
+        configured = embedding_service.provider.model_id
+        if stored != configured:
+            raise EmbeddingModelMismatch(project_id, stored, configured)
+    
+    def invalidate(self, project_id: str):
+        """Forget the cached handle and index info, e.g. after a project is deleted or reindexed"""
+        self._collections.pop(project_id, None)
+        self._index_info.pop(project_id, None)
+    
+    async def index_info(self, project_id: str) -> Optional[Dict]:
+        """
+        Per-project index metadata kept in process: chunk_count, embedding_dim, updated_at.
+        
+        Loaded with one count() the first time, then maintained by the batch writer.
+        Returns None if the project has no collection.
+        """
+        if project_id not in self._index_info:
+            try:
+                collection = await self.get_collection(project_id)
+            except asyncio.TimeoutError:
+                raise
+            except Exception:
+                return None
+            count = await self._call(collection.count)
+            self._index_info.setdefault(project_id, {
+                "chunk_count": count,
+                "embedding_dim": embedding_service.embedding_dim,
+                "updated_at": None,
+            })
+        return dict(self._index_info[project_id])
+    
+    def _record_write(self, project_id: str, vectors: int, dimension: Optional[int] = None):
+        info = self._index_info.get(project_id)
+        if info is None:
+            # Unknown starting count; index_info() loads it on first request
+            return
+        info["chunk_count"] += vectors
+        if dimension is not None:
+            info["embedding_dim"] = dimension
+        info["updated_at"] = time.time()
+    
+    async def remove_source(self, project_id: str, vector_ids: List[str], source_file: str) -> Dict[str, int]:
+        """
+        Detach source_file from the given vectors, e.g. when a file is replaced or deleted.
+        
+        Vectors that only source_file used are deleted; vectors shared with other files
+        (deduplicated content) just drop it from source_files, and their primary
+        source_file moves to a remaining file so filters keep matching. Returns the
+        counts and the ids of the deleted vectors.
+        """
+        try:
+            collection = await self.get_collection(project_id)
+        except asyncio.TimeoutError:
+            raise
         except Exception as e:
-            # Collection might already exist
-            logger.info(f"ℹ️ Collection {collection_name} already exists or error: {e}")
-            return self.client.get_collection(name=collection_name)
+            logger.warning(f"⚠️ No collection to remove {source_file} from in {project_id}: {e}")
+            return {"deleted": 0, "detached": 0, "deleted_ids": []}
+        
+        existing = await self._call(collection.get, ids=list(dict.fromkeys(vector_ids)), include=["metadatas"])
+        delete_ids, update_ids, update_metadatas = [], [], []
+        for vector_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            metadata = metadata or {}
+            known = json.loads(metadata.get("source_files") or "[]") or [metadata.get("source_file")]
+            remaining = [f for f in known if f != source_file]
+            if not remaining:
+                delete_ids.append(vector_id)
+            elif len(remaining) < len(known):
+                update_ids.append(vector_id)
+                # False rather than a missing key: Chroma updates merge metadata
+                update_metadatas.append({
+                    **metadata,
+                    "source_file": remaining[0],
+                    "source_files": json.dumps(remaining),
+                    source_key(source_file): False,
+                })
+        
+        if update_ids:
+            await self._call(
+                collection.update, ids=update_ids, metadatas=update_metadatas, timeout=settings.CHROMA_WRITE_TIMEOUT
+            )
+        if delete_ids:
+            await self._call(collection.delete, ids=delete_ids, timeout=settings.CHROMA_WRITE_TIMEOUT)
+            self._record_write(project_id, -len(delete_ids))
+        if delete_ids or update_ids:
+            await retrieval_cache.bump(project_id)
+        
+        logger.info(
+            f"🗑️ Removed {source_file} from {project_id}: {len(delete_ids)} vectors deleted, {len(update_ids)} shared"
+        )
+        return {"deleted": len(delete_ids), "detached": len(update_ids), "deleted_ids": delete_ids}
+    
+    async def delete_collection(self, project_id: str):
+        """Drop a project's collection (missing collections are ignored)"""
+        self.invalidate(project_id)
+        await retrieval_cache.bump(project_id)
+        try:
+            await self._call(self.client.delete_collection, name=f"project_{project_id}")
+            logger.info(f"🗑️ Deleted collection for project {project_id}")
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Could not delete collection for project {project_id}: {e}")
 
     async def add_chunks(self, project_id: str, chunks: List[Dict]):
-        """Add chunks with validation"""
+        """
+        Add chunks with validation.
+        
+        Vectors are keyed by the chunk's content hash, so identical text is embedded
+        and stored once per project; later copies only extend its source_files list.
+        Writes go through a VectorBatchWriter, so large inputs are embedded and
+        upserted batch by batch.
+        """
         
         # FIX: Validate chunks
         if not chunks or len(chunks) == 0:
             logger.error("❌ No chunks provided to add_chunks")
             raise ValueError("Cannot add empty chunks to vector store")
         
-        collection = await self.create_collection(project_id)
-        
-        # Extract data
-        texts = [chunk["content"] for chunk in chunks]
-        
         # FIX: Validate texts
-        if not texts or all(not t or t.strip() == "" for t in texts):
+        if all(not chunk["content"] or chunk["content"].strip() == "" for chunk in chunks):
             logger.error("❌ All chunk texts are empty")
             raise ValueError("Cannot add chunks with empty content")
         
-        logger.info(f"🔍 Generating embeddings for {len(texts)} texts")
-        embeddings = await embedding_service.generate_embeddings(texts)
-        
-        # FIX: Validate embeddings
-        if not embeddings or len(embeddings) == 0:
-            logger.error("❌ Embedding generation returned empty")
-            raise ValueError("Failed to generate embeddings")
+        async with self.batch_writer(project_id) as writer:
+            await writer.add(chunks)
         
-        ids = [chunk["id"] for chunk in chunks]
-        metadatas = [
-            {
-                "source_file": chunk.get("source_file", "unknown"),
-                "chunk_index": chunk.get("chunk_index", 0),
-                "is_code": chunk.get("is_code_block", False),
-            }
-            for chunk in chunks
-        ]
+        logger.info(f"✅ Successfully added {writer.written} chunks to {project_id}")
+    
+    def batch_writer(
+        self,
+        project_id: str,
+        on_batch: Optional[Callable[[List[Dict]], None]] = None
+    ) -> "VectorBatchWriter":
+        """Writer that streams chunks into the project's collection (use as async context manager)"""
+        return VectorBatchWriter(self, project_id, on_batch)
+    
+    async def _extend_sources(self, collection, sources: Dict[str, List[str]]) -> List[str]:
+        """
+        Add source files to vectors that already exist; returns the ids that were found.
         
-        logger.info(f"🔍 Adding to Chroma: {len(ids)} ids, {len(texts)} docs, {len(embeddings)} embeddings")
+        The source lists are stored as JSON in the source_files metadata field, with a
+        source_key flag per file for filtering.
+        """
+        existing = await self._call(collection.get, ids=list(sources), include=["metadatas"])
+        updated_ids, updated_metadatas = [], []
+        for vector_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            known = json.loads((metadata or {}).get("source_files") or "[]")
+            merged = known + [f for f in sources[vector_id] if f not in known]
+            if len(merged) > len(known):
+                updated_ids.append(vector_id)
+                updated_metadatas.append({
+                    **metadata,
+                    "source_files": json.dumps(merged),
+                    **{source_key(f): True for f in merged},
+                })
         
-        collection.add(
-            ids=ids,
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=metadatas,
-        )
+        if updated_ids:
+            await self._call(collection.update, ids=updated_ids, metadatas=updated_metadatas)
+        return existing["ids"]
+
+    async def get_chunks(
+        self,
+        project_id: str,
+        ids: List[str],
+        where: Optional[Dict] = None,
+        include_embeddings: bool = False,
+    ) -> List[Dict]:
+        """Stored chunks by vector id, in the order given (missing or filtered-out ids are dropped)"""
+        if not ids:
+            return []
+        try:
+            collection = await self.get_collection(project_id)
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Collection not found for project {project_id}: {e}")
+            return []
         
-        logger.info(f"✅ Successfully added {len(chunks)} chunks to {project_id}")
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        found = await self._call(collection.get, ids=list(ids), where=where or None, include=include)
+        by_id = {}
+        for i, vector_id in enumerate(found["ids"]):
+            by_id[vector_id] = {
+                "id": vector_id,
+                "content": found["documents"][i],
+                "metadata": found["metadatas"][i],
+                "distance": None,
+            }
+            if include_embeddings:
+                by_id[vector_id]["embedding"] = np.asarray(found["embeddings"][i], dtype=np.float32)
+        return [by_id[vector_id] for vector_id in ids if vector_id in by_id]
 
     async def search(
         self,
         project_id: str,
-        query_embedding: List[float],
+        query_embedding: Union[List[float], np.ndarray],
         top_k: int = 10,
+        where: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        include_embeddings: bool = False,
     ) -> List[Dict]:
+        """
+        Nearest chunks to query_embedding, optionally restricted by a metadata filter.
+        
+        The where filter (see build_where) is evaluated inside the index query, so the
+        top_k results all match it instead of being filtered out afterwards. timeout
+        overrides CHROMA_QUERY_TIMEOUT for the query itself. With include_embeddings
+        each hit also carries its stored vector as "embedding".
+        """
         try:
-            collection = self.client.get_collection(
-                name=f"project_{project_id}"
-            )
+            collection = await self.get_collection(project_id)
+        except asyncio.TimeoutError:
+            raise
         except Exception as e:
             logger.error(f"❌ Collection not found for project {project_id}: {e}")
             return []
+        # Distances to a query from another model's vector space are meaningless
+        self.check_model(project_id, collection)
 
-        results = collection.query(
-            query_embeddings=[query_embedding],
+        query = dict(
+            query_embeddings=[np.asarray(query_embedding, dtype=np.float32).tolist()],
             n_results=top_k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else []),
         )
+        try:
+            results = await self._call(collection.query, timeout=timeout, **query)
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            # The cached handle may point at a collection that was dropped and recreated
+            logger.warning(f"⚠️ Query failed on cached collection for {project_id}, refreshing: {e}")
+            self.invalidate(project_id)
+            try:
+                collection = await self.get_collection(project_id)
+            except asyncio.TimeoutError:
+                raise
+            except Exception:
+                return []
+            results = await self._call(collection.query, timeout=timeout, **query)
 
         # Handle empty results
         if not results["ids"][0]:
             return []
 
-        return [
+        hits = [
             {
                 "id": results["ids"][0][i],
                 "content": results["documents"][0][i],
@@ -109,6 +386,272 @@ class VectorStoreService:
             }
             for i in range(len(results["ids"][0]))
         ]
+        if include_embeddings:
+            for hit, embedding in zip(hits, results["embeddings"][0]):
+                hit["embedding"] = np.asarray(embedding, dtype=np.float32)
+        return hits
+
+    
+    async def search_projects(
+        self,
+        project_ids: List[str],
+        query_embedding: Union[List[float], np.ndarray],
+        top_k: int = 10,
+        where: Optional[Dict] = None,
+    ) -> Dict:
+        """
+        Top-k chunks across many project collections, e.g. every lecture in a course.
+        
+        Projects are queried concurrently, at most SEMANTIC_SEARCH_CONCURRENCY at a time,
+        each within SEMANTIC_SEARCH_PROJECT_TIMEOUT. When SEMANTIC_SEARCH_DEADLINE passes,
+        unfinished projects are cancelled and what has arrived is returned; their ids
+        are listed in timed_out, and projects whose search raised in failed.
+        Per-project lists come back sorted, so the merge into a bounded heap stops
+        reading a list at its first hit that can't make the top k.
+        """
+        semaphore = asyncio.Semaphore(max(settings.SEMANTIC_SEARCH_CONCURRENCY, 1))
+        
+        async def search_one(project_id: str) -> List[Dict]:
+            async with semaphore:
+                # The timeout covers the collection lookup as well as the query
+                timeout = settings.SEMANTIC_SEARCH_PROJECT_TIMEOUT
+                return await asyncio.wait_for(
+                    self.search(project_id, query_embedding, top_k=top_k, where=where, timeout=timeout),
+                    timeout,
+                )
+        
+        tasks = {asyncio.create_task(search_one(project_id)): project_id for project_id in project_ids}
+        done, pending = set(), set()
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=settings.SEMANTIC_SEARCH_DEADLINE)
+        for task in pending:
+            task.cancel()
+        
+        timed_out = [tasks[task] for task in pending]
+        failed = []
+        # Max-heap on distance (negated), holding the best top_k seen so far
+        heap: List = []
+        order = itertools.count()
+        for task in done:
+            project_id = tasks[task]
+            if task.exception() is not None:
+                if isinstance(task.exception(), asyncio.TimeoutError):
+                    timed_out.append(project_id)
+                else:
+                    logger.error(f"❌ Search failed for project {project_id}: {task.exception()}")
+                    failed.append(project_id)
+                continue
+            for hit in task.result():
+                distance = hit["distance"] if hit["distance"] is not None else float("inf")
+                entry = (-distance, next(order), {**hit, "project_id": project_id})
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif distance < -heap[0][0]:
+                    heapq.heapreplace(heap, entry)
+                else:
+                    break
+        
+        if timed_out:
+            logger.warning(f"⚠️ {len(timed_out)} of {len(tasks)} projects timed out in cross-project search")
+        
+        return {
+            "results": [entry[2] for entry in sorted(heap, key=lambda entry: (-entry[0], entry[1]))],
+            "searched": len(tasks) - len(timed_out) - len(failed),
+            "timed_out": timed_out,
+            "failed": failed,
+        }
+
+
+def build_where(filters: Optional[Dict]) -> Optional[Dict]:
+    """
+    Translate retrieval filters into a Chroma where clause over chunk metadata.
+    
+    Supported keys: source_files (list of file names; a deduplicated vector matches
+    if any file it belongs to is listed), is_code (bool) and min_chunk_index /
+    max_chunk_index. Returns None when nothing is filtered.
+    """
+    if not filters:
+        return None
+    
+    clauses = []
+    if filters.get("source_files"):
+        names = list(filters["source_files"])
+        # Vectors written before source_key flags existed only have their primary file
+        clauses.append({"$or": [{"source_file": {"$in": names}}] + [
+            {source_key(name): {"$eq": True}} for name in names
+        ]})
+    if filters.get("is_code") is not None:
+        clauses.append({"is_code": {"$eq": bool(filters["is_code"])}})
+    if filters.get("min_chunk_index") is not None:
+        clauses.append({"chunk_index": {"$gte": int(filters["min_chunk_index"])}})
+    if filters.get("max_chunk_index") is not None:
+        clauses.append({"chunk_index": {"$lte": int(filters["max_chunk_index"])}})
+    
+    if not clauses:
+        return None
+    # Chroma requires an explicit $and for more than one condition
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class VectorBatchWriter:
+    """
+    Streams chunks into a project collection in bounded batches.
+    
+    Each batch of VECTOR_WRITE_BATCH_SIZE new vectors is embedded, then upserted on a
+    background task while the next batch is embedded; at most
+    VECTOR_WRITE_MAX_IN_FLIGHT writes are pending at a time, which also bounds how many
+    embedding matrices are held in memory. Failed writes are retried with backoff
+    (upserts are idempotent). on_batch is called with each batch's chunks once it has
+    landed (at once for batches that were all duplicates), e.g. to report job progress.
+    """
+    
+    def __init__(
+        self,
+        service: VectorStoreService,
+        project_id: str,
+        on_batch: Optional[Callable[[List[Dict]], None]] = None
+    ):
+        self.service = service
+        self.project_id = project_id
+        self.on_batch = on_batch
+        self.collection = None
+        self.written = 0
+        self._slots = asyncio.Semaphore(max(settings.VECTOR_WRITE_MAX_IN_FLIGHT, 1))
+        self._tasks: Set[asyncio.Task] = set()
+        # Ids written by this writer, and sources seen for them after they were scheduled
+        self._scheduled: Set[str] = set()
+        self._late_sources: Dict[str, List[str]] = {}
+    
+    async def __aenter__(self) -> "VectorBatchWriter":
+        self.collection = await self.service.create_collection(self.project_id)
+        self.service.check_model(self.project_id, self.collection)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Writes already on the pool threads can't be stopped; let them settle so a
+            # caller rolling the batch back sees every vector that landed
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+            return
+        await self.flush()
+    
+    async def add(self, chunks: List[Dict]):
+        """Embed and schedule writes for chunks; returns once they are all in flight"""
+        for start in range(0, len(chunks), max(settings.VECTOR_WRITE_BATCH_SIZE, 1)):
+            batch = chunks[start:start + settings.VECTOR_WRITE_BATCH_SIZE]
+            ids, new_chunks, sources = await self._collapse(batch)
+            if not ids:
+                # Nothing to write, but the batch is done as far as progress goes
+                if self.on_batch:
+                    self.on_batch(batch)
+                continue
+            
+            texts = [chunk["content"] for chunk in new_chunks]
+            embeddings = await embedding_service.embed_batch(
+                texts, is_code=[chunk.get("is_code_block", False) for chunk in new_chunks]
+            )
+            
+            # FIX: Validate embeddings
+            if embeddings.shape[0] != len(texts):
+                logger.error("❌ Embedding generation returned empty")
+                raise ValueError("Failed to generate embeddings")
+            
+            metadatas = [
+                {
+                    "source_file": chunk.get("source_file", "unknown"),
+                    "source_files": json.dumps(sources[vector_id]),
+                    **{source_key(f): True for f in sources[vector_id]},
+                    "chunk_index": chunk.get("chunk_index", 0),
+                    "is_code": chunk.get("is_code_block", False),
+                    "symbol_path": chunk.get("symbol_path") or "",
+                    "heading_path": chunk.get("heading_path") or "",
+                }
+                for vector_id, chunk in zip(ids, new_chunks)
+            ]
+            
+            # Wait for a write slot; surfaces failures of earlier batches early
+            await self._slots.acquire()
+            self._raise_failed()
+            self._scheduled.update(ids)
+            task = asyncio.create_task(self._write(ids, texts, embeddings, metadatas, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def flush(self):
+        """Wait for every pending write, then merge sources seen for already-written ids"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks))
+        if self._late_sources:
+            await self.service._extend_sources(self.collection, self._late_sources)
+            self._late_sources = {}
+        # Cached retrievals for this project may now miss new chunks
+        await retrieval_cache.bump(self.project_id)
+    
+    async def _collapse(self, batch: List[Dict]):
+        """
+        Collapse exact duplicates: one vector per content hash, with every source file.
+        
+        Returns (ids, chunks, sources) for vectors that still need embedding; hashes
+        already indexed only get their source file list extended.
+        """
+        unique: Dict[str, Dict] = {}
+        sources: Dict[str, List[str]] = {}
+        for chunk in batch:
+            vector_id = chunk.get("content_hash") or chunk["id"]
+            source_file = chunk.get("source_file", "unknown")
+            if vector_id in self._scheduled:
+                late = self._late_sources.setdefault(vector_id, [])
+                if source_file not in late:
+                    late.append(source_file)
+                continue
+            unique.setdefault(vector_id, chunk)
+            files = sources.setdefault(vector_id, [])
+            if source_file not in files:
+                files.append(source_file)
+        
+        if unique:
+            for vector_id in await self.service._extend_sources(self.collection, sources):
+                unique.pop(vector_id, None)
+        
+        skipped = len(batch) - len(unique)
+        if skipped:
+            logger.info(f"♻️ {skipped} duplicate chunks reuse existing vectors in {self.project_id}")
+        
+        return list(unique), list(unique.values()), sources
+    
+    async def _write(self, ids, texts, embeddings: np.ndarray, metadatas, batch: List[Dict]):
+        try:
+            # chromadb 0.4 only accepts lists; the matrix is converted once, at the client boundary
+            payload = dict(ids=ids, documents=texts, embeddings=embeddings.tolist(), metadatas=metadatas)
+            del embeddings
+            
+            retries = max(settings.VECTOR_WRITE_RETRIES, 0)
+            for attempt in range(retries + 1):
+                try:
+                    await self.service._call(
+                        self.collection.upsert, timeout=settings.CHROMA_WRITE_TIMEOUT, **payload
+                    )
+                    break
+                except Exception as e:
+                    if attempt == retries:
+                        logger.error(f"❌ Vector write of {len(ids)} chunks failed after {attempt + 1} attempts: {e}")
+                        raise
+                    delay = settings.VECTOR_WRITE_RETRY_DELAY * 2 ** attempt
+                    logger.warning(f"⚠️ Vector write failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            
+            self.written += len(ids)
+            self.service._record_write(self.project_id, len(ids), len(payload["embeddings"][0]))
+            logger.info(f"🔍 Wrote {len(ids)} vectors to {self.project_id} ({self.written} so far)")
+            if self.on_batch:
+                self.on_batch(batch)
+        finally:
+            self._slots.release()
+    
+    def _raise_failed(self):
+        for task in list(self._tasks):
+            if task.done() and not task.cancelled() and task.exception():
+                raise task.exception()
 
 
 # ⚠️ still okay for now, but better moved to FastAPI startup later
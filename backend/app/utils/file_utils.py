@@ -4,6 +4,7 @@ from pathlib import Path
 from fastapi import UploadFile
 from app.core.config import settings
 import uuid
+from typing import Iterator
 
 async def save_upload_file(upload_file: UploadFile, project_id: str) -> str:
     """
@@ -29,4 +30,22 @@ async def save_upload_file(upload_file: UploadFile, project_id: str) -> str:
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(upload_file.file, buffer)
     
-    return str(file_path)
\ No newline at end of file
+    return str(file_path)
+
+def iter_text_file(file_path: str, block_size: int = 65536) -> Iterator[str]:
+    """
+    Read a UTF-8 text file in blocks instead of loading it whole
+    
+    Args:
+        file_path: Path to text file
+        block_size: Characters per block
+    
+    Yields:
+        Text blocks in file order
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield block
@@ -0,0 +1,14 @@
+"""
+Ingestion micro-benchmarks.
+
+Run from the backend directory:
+
+    python -m benchmarks.run              # full suite, results in benchmarks/results/
+    python -m benchmarks.run --quick      # small corpora, for a fast sanity check
+    python -m benchmarks.compare OLD.json NEW.json
+
+Chroma and the LLM are replaced by in-memory stand-ins (benchmarks.stubs) and the
+pipeline runs against an in-memory SQLite database, so the numbers cover our own
+parsing, chunking, embedding and persistence code. Pipeline stage times are self
+times: embedding is reported separately from the vector store write that calls it.
+"""
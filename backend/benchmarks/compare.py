@@ -0,0 +1,76 @@
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+
+Exits non-zero with --fail-on-regression when any benchmark got slower than the
+threshold, so the comparison can gate CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Metrics where a larger value is worse
+_LOWER_IS_BETTER = ("seconds", "peak_mb")
+
+
+def _load(path: Path) -> Dict:
+    return json.loads(path.read_text())
+
+
+def compare(old: Dict, new: Dict, threshold: float) -> List[str]:
+    """Print a per-benchmark diff and return the names that regressed"""
+    regressions = []
+    old_results, new_results = old["benchmarks"], new["benchmarks"]
+
+    print(f"{old['meta']['commit']} → {new['meta']['commit']}  (threshold {threshold:.0%})\n")
+    print(f"{'benchmark':<22} {'metric':<10} {'old':>12} {'new':>12} {'change':>9}")
+
+    for name in sorted(set(old_results) | set(new_results)):
+        before, after = old_results.get(name, {}), new_results.get(name, {})
+        if "seconds" not in before or "seconds" not in after:
+            print(f"{name:<22} {'(missing or skipped on one side)':>46}")
+            continue
+
+        for metric in _LOWER_IS_BETTER:
+            a, b = before.get(metric), after.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            flag = ""
+            if change > threshold:
+                flag = " ⚠️"
+                if metric == "seconds":
+                    regressions.append(name)
+            print(f"{name:<22} {metric:<10} {a:>12.4f} {b:>12.4f} {change:>+8.1%}{flag}")
+
+        for stage in sorted(set(before.get("stages", {})) | set(after.get("stages", {}))):
+            a, b = before.get("stages", {}).get(stage), after.get("stages", {}).get(stage)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a:>+8.1%}" if a else f"{'-':>8}"
+            print(f"  {stage:<30} {a:>12.4f} {b:>12.4f} {change}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown to flag")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    regressions = compare(_load(args.old), _load(args.new), args.threshold)
+    if regressions:
+        print(f"\n⚠️ Slower than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1 if args.fail_on_regression else 0
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Synthetic corpora for the ingestion benchmarks (deterministic for a given seed)"""
+import keyword
+import random
+from pathlib import Path
+from typing import List
+
+_WORDS = (
+    "block chain hash node miner ledger token wallet contract gas consensus proof stake "
+    "validator merkle tree root signature key public private nonce difficulty reward fork "
+    "peer network transaction input output script address balance state storage event "
+    "function modifier require emit mapping struct array loop index value lecture today "
+    "we will look at how this works and why it matters for the final exam so please note"
+).split()
+
+# Words that are also safe as Python identifiers
+_NAMES = [w for w in _WORDS if not keyword.iskeyword(w)]
+
+_SPEAKERS = ["Instructor", "Student", "Guest"]
+
+
+def _sentence(rng: random.Random, min_words: int = 6, max_words: int = 22) -> str:
+    words = rng.choices(_WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+
+
+def transcript(size_bytes: int, seed: int = 0) -> str:
+    """Lecture transcript: timestamped speaker turns of a few sentences each"""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    total = 0
+    seconds = 0
+    while total < size_bytes:
+        seconds += rng.randint(3, 40)
+        stamp = f"[{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}]"
+        turn = " ".join(_sentence(rng) for _ in range(rng.randint(1, 6)))
+        line = f"{stamp} {rng.choice(_SPEAKERS)}: {turn}"
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def python_module(size_bytes: int, seed: int = 0) -> str:
+    """Large Python file: imports, module constants, classes with methods, free functions"""
+    rng = random.Random(seed)
+    parts = ["import os\nimport json\nfrom typing import Dict, List, Optional\n"]
+    total = len(parts[0])
+    n = 0
+    while total < size_bytes:
+        n += 1
+        name = f"{rng.choice(_NAMES)}_{n}"
+        if rng.random() < 0.4:
+            methods = []
+            for m in range(rng.randint(2, 6)):
+                body = "\n".join(
+                    f"        {rng.choice(_NAMES)}_{i} = self.{rng.choice(_NAMES)} + {i}"
+                    for i in range(rng.randint(3, 25))
+                )
+                methods.append(
+                    f"    def {rng.choice(_NAMES)}_{m}(self, value: int) -> int:\n"
+                    f'        """{_sentence(rng)}"""\n{body}\n        return value\n'
+                )
+            part = (
+                f"class {name.title().replace('_', '')}:\n"
+                f'    """{_sentence(rng)}"""\n\n' + "\n".join(methods)
+            )
+        else:
+            body = "\n".join(
+                f"    if {rng.choice(_NAMES)}_{i} > {i}:\n        items.append({i})"
+                for i in range(rng.randint(2, 30))
+            )
+            part = (
+                f"# {_sentence(rng)}\n"
+                f"def {name}(items: List[int]) -> List[int]:\n"
+                f'    """{_sentence(rng)}"""\n{body}\n    return items\n'
+            )
+        parts.append(part)
+        total += len(part) + 2
+    return "\n\n".join(parts)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_pdf(pages: int, seed: int = 0) -> bytes:
+    """
+    Minimal multi-page PDF with a real text layer (Helvetica, ~50 lines per page).
+
+    Written by hand so the benchmarks need no PDF authoring dependency; pdfplumber
+    extracts it like any other digital lecture handout.
+    """
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(50):
+            line = _sentence(rng, 8, 14)
+            lines.append(f"({_pdf_escape(line[:95])}) Tj T*")
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td\n" + "\n".join(lines) + "\nET").encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (page_tree, font, content)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % p for p in page_ids)
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref
+    )
+    return bytes(out)
+
+
+def write(directory: Path, name: str, data) -> Path:
+    """Write a corpus to directory/name and return its path"""
+    path = directory / name
+    if isinstance(data, bytes):
+        path.write_bytes(data)
+    else:
+        path.write_text(data, encoding="utf-8")
+    return path
@@ -0,0 +1,120 @@
+"""
+Recall vs size report for quantized vector storage.
+
+    python -m benchmarks.quantization_report                   # synthetic clustered vectors
+    python -m benchmarks.quantization_report --source corpus   # embed a synthetic transcript
+
+For each storage mode (float32, float16, int8) it reports bytes per vector, total
+size, search time per query and recall@k against exact float32 search.
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.quantization import QUANTIZATION_MODES, QuantizedMatrix
+
+MB = 1024 * 1024
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors around a few hundred topic centres, like sentence embeddings of lectures"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(256, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, len(centres), n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+async def corpus_vectors(n: int) -> np.ndarray:
+    """Embed chunks of a synthetic transcript with the configured provider"""
+    from benchmarks import corpora
+    from app.services.chunker_service import chunker_service
+    from app.services.embedding_service import embedding_service
+
+    texts: List[str] = []
+    seed = 0
+    while len(texts) < n:
+        transcript = corpora.transcript(4 * MB, seed=seed)
+        texts.extend(c["content"] for c in chunker_service.chunk_text(transcript, source_type="text"))
+        seed += 1
+    return await embedding_service.embed_batch(texts[:n])
+
+
+def _queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of stored vectors, so every query has real near neighbours"""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    noise = rng.normal(scale=np.abs(picks).mean(), size=picks.shape).astype(np.float32)
+    return picks + 0.5 * noise
+
+
+def report(vectors: np.ndarray, queries: np.ndarray, k: int, metric: str) -> Dict[str, Dict]:
+    exact = QuantizedMatrix.from_float(vectors, "none")
+    truth, _ = exact.search(queries, k, metric)
+
+    results = {}
+    for mode in QUANTIZATION_MODES:
+        matrix = QuantizedMatrix.from_float(vectors, mode)
+        start = time.perf_counter()
+        found, _ = matrix.search(queries, k, metric)
+        elapsed = time.perf_counter() - start
+
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)])
+        results["float32" if mode == "none" else mode] = {
+            "bytes_per_vector": round(matrix.nbytes / len(matrix), 2),
+            "size_mb": round(matrix.nbytes / MB, 3),
+            "compression": round(exact.nbytes / matrix.nbytes, 2),
+            "ms_per_query": round(1000 * elapsed / len(queries), 4),
+            f"recall@{k}": round(float(recall), 4),
+        }
+    return results
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Quantized vector storage: recall vs size")
+    parser.add_argument("--source", choices=["synthetic", "corpus"], default="synthetic")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vectors only")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--metric", choices=["l2", "cosine", "ip"], default="l2")
+    parser.add_argument("--output", type=Path, help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.source == "corpus":
+        vectors = await corpus_vectors(args.vectors)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim)
+    queries = _queries(vectors, args.queries)
+
+    results = report(vectors, queries, args.k, args.metric)
+
+    print(f"\n{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, {args.metric}")
+    print(f"{'mode':<10} {'B/vector':>10} {'size MB':>10} {'ratio':>7} {'ms/query':>10} {'recall@' + str(args.k):>10}")
+    for mode, row in results.items():
+        print(
+            f"{mode:<10} {row['bytes_per_vector']:>10} {row['size_mb']:>10} {row['compression']:>7} "
+            f"{row['ms_per_query']:>10} {row[f'recall@{args.k}']:>10}"
+        )
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({
+            "source": args.source,
+            "vectors": len(vectors),
+            "dimension": int(vectors.shape[1]),
+            "queries": args.queries,
+            "k": args.k,
+            "metric": args.metric,
+            "modes": results,
+        }, indent=2))
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
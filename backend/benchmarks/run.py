@@ -0,0 +1,471 @@
+"""
+Ingestion benchmark runner.
+
+Covers ChunkerService, EmbeddingService, ParserService._parse_text/_parse_code/_parse_pdf
+and the full process_upload_job pipeline on synthetic corpora, with Chroma and the LLM
+replaced by the local stand-ins in benchmarks.stubs. Every benchmark reports wall time
+(best and median of --repeat runs), throughput (MB/s, chunks/s) and peak traced Python
+memory; the pipeline also reports per-stage self time. Results are written as JSON so
+two commits can be compared with benchmarks.compare.
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+from unittest import mock
+
+from benchmarks import corpora, stubs
+
+RESULTS_DIR = Path(__file__).parent / "results"
+MB = 1024 * 1024
+
+SIZES = {
+    "full": {"transcript_mb": 8, "python_mb": 4, "pdf_pages": 60, "embed_texts": 20000, "pipeline_files": 6},
+    "quick": {"transcript_mb": 0.5, "python_mb": 0.25, "pdf_pages": 5, "embed_texts": 1000, "pipeline_files": 3},
+}
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Services print on hot paths; keep that off the terminal so it can't skew timings"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class StageTimer:
+    """
+    Accumulates self time per pipeline stage.
+
+    Stages may nest (add_chunks calls the embedder); time spent in an inner stage is
+    charged to it and subtracted from the outer one, so stage totals add up to at
+    most the wall time.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self._stack: List[List] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        frame = [name, 0.0]  # name, time spent in nested stages
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed - frame[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def wrap_async(self, name: str, fn: Callable) -> Callable:
+        async def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+
+    def wrap_sync(self, name: str, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def wrap_iter(self, name: str, fn: Callable) -> Callable:
+        """Time a generator function item by item, as the consumer pulls from it"""
+        def wrapper(*args, **kwargs):
+            iterator = iter(fn(*args, **kwargs))
+            while True:
+                with self.stage(name):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        return wrapper
+
+    def wrap_aiter(self, name: str, fn: Callable) -> Callable:
+        async def wrapper(*args, **kwargs):
+            iterator = fn(*args, **kwargs).__aiter__()
+            while True:
+                with self.stage(name):
+                    try:
+                        item = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                yield item
+        return wrapper
+
+
+async def _measure(
+    run: Callable[..., Awaitable[Dict]],
+    repeat: int,
+    setup: Optional[Callable] = None
+) -> Dict:
+    """
+    Time run() repeat times, then once more under tracemalloc for peak memory.
+
+    run() returns its work counts ({"bytes": ..., "chunks": ...}), which are turned
+    into throughput figures against the best time.
+    """
+    times = []
+    counts: Dict = {}
+    for _ in range(max(repeat, 1)):
+        arg = setup() if setup else None
+        gc.collect()
+        with _quiet():
+            start = time.perf_counter()
+            counts = await (run(arg) if setup else run())
+            times.append(time.perf_counter() - start)
+
+    arg = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with _quiet():
+            await (run(arg) if setup else run())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    result = {
+        "seconds": round(best, 6),
+        "seconds_median": round(statistics.median(times), 6),
+        "runs": len(times),
+        "peak_mb": round(peak / MB, 3),
+    }
+    extra = counts.pop("extra", {})
+    for key, value in counts.items():
+        result[key] = value
+        if key == "bytes":
+            result["mb_per_s"] = round(value / MB / best, 3) if best else None
+        else:
+            result[f"{key}_per_s"] = round(value / best, 1) if best else None
+    result.update(extra)
+    return result
+
+
+# ---------------------------------------------------------------- benchmarks
+
+async def bench_chunker(ctx: SimpleNamespace, repeat: int) -> Dict[str, Dict]:
+    from app.services.chunker_service import chunker_service, shutdown_chunk_pool
+    from app.utils.file_utils import iter_text_file
+
+    transcript, module = ctx.transcript, ctx.module
+    results = {}
+
+    async def text():
+        chunks = chunker_service.chunk_text(transcript, source_type="text", source_file="lecture.txt")
+        return {"bytes": len(transcript.encode()), "chunks": len(chunks)}
+    results["chunker.text"] = await _measure(text, repeat)
+
+    async def code():
+        chunks = chunker_service.chunk_text(module, source_type="code", source_file="module.py")
+        return {"bytes": len(module.encode()), "chunks": len(chunks)}
+    results["chunker.code"] = await _measure(code, repeat)
+
+    async def table():
+        chunks = chunker_service.chunk_table(transcript, source_type="text", source_file="lecture.txt")
+        return {"bytes": len(transcript.encode()), "chunks": len(chunks)}
+    results["chunker.table"] = await _measure(table, repeat)
+
+    async def stream():
+        count = 0
+        segments = iter_text_file(str(ctx.transcript_path))
+        for _ in chunker_service.chunk_stream(segments, source_type="text", source_file="lecture.txt"):
+            count += 1
+        return {"bytes": ctx.transcript_path.stat().st_size, "chunks": count}
+    results["chunker.stream"] = await _measure(stream, repeat)
+
+    documents = [
+        (corpora.transcript(len(transcript) // ctx.pipeline_files, seed=i), "text", f"part_{i}.txt")
+        for i in range(ctx.pipeline_files)
+    ]
+
+    async def parallel():
+        count = 0
+        async for chunks in chunker_service.chunk_documents(documents):
+            count += len(chunks)
+        return {"bytes": sum(len(d[0].encode()) for d in documents), "chunks": count}
+
+    # Start the pool outside the timed runs
+    async for _ in chunker_service.chunk_documents([("warm up " * 50, "text", "a"), ("b " * 50, "text", "b")]):
+        pass
+    try:
+        results["chunker.documents"] = await _measure(parallel, repeat)
+    finally:
+        shutdown_chunk_pool()
+    return results
+
+
+async def bench_embedding(ctx: SimpleNamespace, repeat: int) -> Dict[str, Dict]:
+    from app.services.chunker_service import chunker_service
+    from app.services.embedding_service import embedding_service
+
+    with _quiet():
+        pool = [c["content"] for c in chunker_service.chunk_text(ctx.transcript, source_type="text")]
+    texts = [pool[i % len(pool)] for i in range(ctx.embed_texts)]
+    size = sum(len(t.encode()) for t in texts)
+
+    async def embed():
+        embeddings = await embedding_service.generate_embeddings(texts)
+        return {"bytes": size, "texts": len(embeddings)}
+
+    async def batch():
+        embeddings = await embedding_service.embed_batch(texts)
+        return {"bytes": size, "texts": embeddings.shape[0]}
+
+    return {
+        "embedding.generate": await _measure(embed, repeat),
+        "embedding.batch": await _measure(batch, repeat),
+    }
+
+
+async def bench_parser(ctx: SimpleNamespace, repeat: int) -> Dict[str, Dict]:
+    with _quiet():
+        from app.services.parser_service import parser_service
+
+    results = {}
+
+    async def text():
+        parsed = await parser_service._parse_text(str(ctx.transcript_path))
+        return {"bytes": ctx.transcript_path.stat().st_size, "chars": len(parsed["content"])}
+    results["parser.text"] = await _measure(text, repeat)
+
+    async def code():
+        parsed = await parser_service._parse_code(str(ctx.module_path), ".py")
+        return {"bytes": ctx.module_path.stat().st_size, "chars": len(parsed["content"])}
+    results["parser.code"] = await _measure(code, repeat)
+
+    async def pdf():
+        parsed = await parser_service._parse_pdf(str(ctx.pdf_path))
+        return {
+            "bytes": ctx.pdf_path.stat().st_size,
+            "pages": parsed.get("pages", ctx.pdf_pages),
+            "chars": len(parsed["content"]),
+        }
+    results["parser.pdf"] = await _measure(pdf, repeat)
+    return results
+
+
+async def bench_pipeline(ctx: SimpleNamespace, repeat: int) -> Dict[str, Dict]:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    with _quiet():
+        from app.db.base import Base, Project, File, Chunk
+        from app.services import job_queue
+        from app.services.parser_service import parser_service
+        from app.services.chunker_service import chunker_service, shutdown_chunk_pool
+        from app.services.vectorstore_service import vectorstore_service, VectorBatchWriter
+        from app.services.embedding_service import embedding_service
+        from app.services.rag_service import rag_service
+
+    # One file per kind, cycling, so multi-file uploads exercise every parser
+    kinds = [
+        ("lecture_{}_youtube.txt", lambda i: corpora.transcript(ctx.transcript_bytes // 2, seed=i)),
+        ("module_{}.py", lambda i: corpora.python_module(ctx.module_bytes // 2, seed=i)),
+        ("handout_{}.pdf", lambda i: corpora.text_pdf(max(ctx.pdf_pages // 2, 1), seed=i)),
+        ("notes_{}.md", lambda i: corpora.transcript(ctx.transcript_bytes // 4, seed=100 + i)),
+    ]
+    files = []
+    for i in range(ctx.pipeline_files):
+        pattern, build = kinds[i % len(kinds)]
+        files.append(str(corpora.write(ctx.workdir, pattern.format(i), build(i))))
+    size = sum(os.path.getsize(f) for f in files)
+
+    timer = StageTimer()
+
+    def setup():
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine, tables=[Project.__table__, File.__table__, Chunk.__table__])
+        db = sessionmaker(bind=engine)()
+        project_id = str(uuid.uuid4())
+        db.add(Project(id=project_id, name="Benchmark", slug=f"benchmark-{project_id[:8]}"))
+        db.commit()
+        vectorstore_service.client = stubs.InMemoryChromaClient()
+        job = SimpleNamespace(
+            id=str(uuid.uuid4()),
+            project_id=project_id,
+            type="upload",
+            input_data={"files": files, "project_name": "Benchmark"},
+            current_step=None,
+            progress=0,
+        )
+        timer.totals = {}
+        return job, db
+
+    async def pipeline(arg):
+        job, db = arg
+        start = time.perf_counter()
+        with contextlib.ExitStack() as patches:
+            for target, attr, wrap, stage in [
+                (parser_service, "parse_file", timer.wrap_async, "parse"),
+                (chunker_service, "chunk_stream", timer.wrap_iter, "chunk"),
+                (chunker_service, "chunk_documents", timer.wrap_aiter, "chunk"),
+                (job_queue, "_save_chunk_batch", timer.wrap_sync, "db"),
+                # Upserts overlap with later batches; only their foreground part is timed here
+                (VectorBatchWriter, "add", timer.wrap_async, "vector_store"),
+                (embedding_service, "embed_batch", timer.wrap_async, "embed"),
+                (rag_service, "generate_documentation", timer.wrap_async, "readme"),
+            ]:
+                patches.enter_context(mock.patch.object(target, attr, wrap(stage, getattr(target, attr))))
+            await job_queue.process_upload_job(job, db)
+
+        wall = time.perf_counter() - start
+        chunks = db.query(Chunk).count()
+        vectors = vectorstore_service.client.get_collection(f"project_{job.project_id}").count()
+        db.close()
+        stages = {name: round(seconds, 6) for name, seconds in sorted(timer.totals.items())}
+        stages["other"] = round(max(wall - sum(timer.totals.values()), 0.0), 6)
+        return {"bytes": size, "chunks": chunks, "extra": {"vectors": vectors, "files": len(files), "stages": stages}}
+
+    stubs.install_llm()
+    try:
+        return {"pipeline.upload": await _measure(pipeline, repeat, setup=setup)}
+    finally:
+        shutdown_chunk_pool()
+
+
+SUITES = {
+    "chunker": bench_chunker,
+    "embedding": bench_embedding,
+    "parser": bench_parser,
+    "pipeline": bench_pipeline,
+}
+
+
+# ---------------------------------------------------------------- runner
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _metadata(size: str, repeat: int) -> Dict:
+    from app.core.config import settings
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "size": size,
+        "corpus": SIZES[size],
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            key: getattr(settings, key)
+            for key in (
+                "CHUNK_SIZE", "CHUNK_OVERLAP", "CHUNK_BATCH_SIZE", "CHUNK_STREAM_BUFFER_CHARS",
+                "CHUNK_PARALLEL", "CHUNK_WORKERS", "EMBEDDINGS_PROVIDER", "EMBEDDING_MODEL",
+                "EMBEDDING_DIMENSION", "EMBEDDING_BATCH_SIZE", "EMBEDDING_BATCH_TOKENS",
+                "EMBEDDING_THREADS", "EMBEDDING_EXECUTOR",
+            )
+            if hasattr(settings, key)
+        },
+    }
+
+
+def _print_summary(results: Dict[str, Dict]):
+    print(f"\n{'benchmark':<22} {'seconds':>10} {'MB/s':>10} {'chunks/s':>12} {'peak MB':>10}")
+    for name, result in results.items():
+        if "seconds" not in result:
+            print(f"{name:<22} {result.get('skipped') or result.get('error')}")
+            continue
+        print(
+            f"{name:<22} {result['seconds']:>10.4f} {result.get('mb_per_s') or '-':>10} "
+            f"{result.get('chunks_per_s') or result.get('texts_per_s') or '-':>12} {result['peak_mb']:>10}"
+        )
+        for stage, seconds in result.get("stages", {}).items():
+            print(f"  {stage:<20} {seconds:>10.4f}")
+
+
+async def main(argv: Optional[List[str]] = None) -> Path:
+    parser = argparse.ArgumentParser(description="Ingestion micro-benchmarks")
+    parser.add_argument("--quick", action="store_true", help="small corpora for a fast check")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITES), help="run a subset of suites")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    stubs.install_chroma()
+
+    size = "quick" if args.quick else "full"
+    spec = SIZES[size]
+
+    with tempfile.TemporaryDirectory(prefix="lecturedocs-bench-") as tmp:
+        workdir = Path(tmp)
+        transcript = corpora.transcript(int(spec["transcript_mb"] * MB))
+        module = corpora.python_module(int(spec["python_mb"] * MB))
+        ctx = SimpleNamespace(
+            workdir=workdir,
+            transcript=transcript,
+            module=module,
+            transcript_bytes=len(transcript),
+            module_bytes=len(module),
+            transcript_path=corpora.write(workdir, "lecture.txt", transcript),
+            module_path=corpora.write(workdir, "module.py", module),
+            pdf_path=corpora.write(workdir, "handout.pdf", corpora.text_pdf(spec["pdf_pages"])),
+            pdf_pages=spec["pdf_pages"],
+            embed_texts=spec["embed_texts"],
+            pipeline_files=spec["pipeline_files"],
+        )
+
+        results: Dict[str, Dict] = {}
+        for name in args.only or SUITES:
+            print(f"⏱️ Running {name} benchmarks...")
+            try:
+                results.update(await SUITES[name](ctx, args.repeat))
+            except ImportError as e:
+                # Missing optional service dependency (e.g. pdfplumber, chromadb)
+                results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+            except Exception as e:
+                logging.exception(f"❌ {name} benchmarks failed")
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB elsewhere
+    meta = _metadata(size, args.repeat)
+    meta["max_rss_mb"] = round(usage * scale / MB, 1)
+    meta["max_rss_children_mb"] = round(children * scale / MB, 1)
+
+    output = args.output or RESULTS_DIR / f"{meta['timestamp'][:19].replace(':', '')}_{meta['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": meta, "benchmarks": results}, indent=2))
+
+    _print_summary(results)
+    print(f"\n✅ Results written to {output}")
+    return output
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
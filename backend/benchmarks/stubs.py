@@ -0,0 +1,162 @@
+"""
+Local stand-ins for the external services the ingest pipeline talks to.
+
+The Chroma client keeps collections in memory and the LLM answers instantly with a
+canned README, so benchmark numbers measure our own code rather than the network.
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CANNED_README = "# Benchmark Project\n\n" + "Generated documentation placeholder.\n" * 200
+
+
+class InMemoryCollection:
+    """Subset of the chromadb Collection API used by VectorStoreService"""
+
+    def __init__(self, name: str, metadata: Optional[Dict] = None):
+        self.name = name
+        self.metadata = metadata or {}
+        self._index: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._embeddings: List[List[float]] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict] = []
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None):
+        for i, id_ in enumerate(ids):
+            if id_ in self._index:
+                continue
+            self._index[id_] = len(self._ids)
+            self._ids.append(id_)
+            self._embeddings.append(list(embeddings[i]) if embeddings is not None else [])
+            self._documents.append(documents[i] if documents else "")
+            self._metadatas.append(dict(metadatas[i]) if metadatas else {})
+
+    upsert = add
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=None):
+        rows = [self._index[i] for i in ids if i in self._index] if ids is not None \
+            else list(range(len(self._ids)))
+        if where:
+            rows = [r for r in rows if _matches(self._metadatas[r], where)]
+        return {
+            "ids": [self._ids[r] for r in rows],
+            "documents": [self._documents[r] for r in rows],
+            "metadatas": [self._metadatas[r] for r in rows],
+        }
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        for i, id_ in enumerate(ids):
+            row = self._index.get(id_)
+            if row is None:
+                continue
+            if embeddings is not None:
+                self._embeddings[row] = list(embeddings[i])
+            if documents:
+                self._documents[row] = documents[i]
+            if metadatas:
+                self._metadatas[row].update(metadatas[i])
+
+    def delete(self, ids=None, where=None):
+        keep = [
+            r for r in range(len(self._ids))
+            if not ((ids is not None and self._ids[r] in ids)
+                    or (where and _matches(self._metadatas[r], where)))
+        ]
+        self._ids = [self._ids[r] for r in keep]
+        self._embeddings = [self._embeddings[r] for r in keep]
+        self._documents = [self._documents[r] for r in keep]
+        self._metadatas = [self._metadatas[r] for r in keep]
+        self._index = {id_: r for r, id_ in enumerate(self._ids)}
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        rows = [r for r in range(len(self._ids)) if not where or _matches(self._metadatas[r], where)]
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        matrix = np.asarray([self._embeddings[r] for r in rows], dtype=np.float32)
+        for query in query_embeddings:
+            if not rows:
+                top, distances = [], np.empty(0)
+            else:
+                distances = ((matrix - np.asarray(query, dtype=np.float32)) ** 2).sum(axis=1)
+                top = np.argsort(distances)[:n_results]
+            result["ids"].append([self._ids[rows[t]] for t in top])
+            result["documents"].append([self._documents[rows[t]] for t in top])
+            result["metadatas"].append([self._metadatas[rows[t]] for t in top])
+            result["distances"].append([float(distances[t]) for t in top])
+        return result
+
+
+def _matches(metadata: Dict, where: Dict) -> bool:
+    """Equality, $in and $and filters only"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if "$in" in condition and metadata.get(key) not in condition["$in"]:
+                return False
+            if "$eq" in condition and metadata.get(key) != condition["$eq"]:
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class InMemoryChromaClient:
+    """Drop-in for chromadb.HttpClient"""
+
+    def __init__(self, *args, **kwargs):
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def heartbeat(self) -> int:
+        return 0
+
+    def create_collection(self, name: str, metadata: Optional[Dict] = None, **kwargs):
+        if name in self._collections:
+            raise ValueError(f"Collection {name} already exists")
+        self._collections[name] = InMemoryCollection(name, metadata)
+        return self._collections[name]
+
+    def get_collection(self, name: str, **kwargs):
+        if name not in self._collections:
+            raise ValueError(f"Collection {name} does not exist")
+        return self._collections[name]
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None, **kwargs):
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name, metadata)
+        return self._collections[name]
+
+    def delete_collection(self, name: str):
+        self._collections.pop(name, None)
+
+    def list_collections(self):
+        return list(self._collections.values())
+
+
+def install_chroma():
+    """
+    Point chromadb.HttpClient at the in-memory client.
+
+    Must run before app.services.vectorstore_service is imported, since the service
+    connects at import time.
+    """
+    import chromadb
+    chromadb.HttpClient = InMemoryChromaClient
+
+
+def install_llm(latency: float = 0.0):
+    """Replace LLM generation with a canned answer after an optional simulated latency"""
+    from app.services.llm_service import llm_service
+
+    async def generate_text(*args, **kwargs) -> str:
+        if latency:
+            await asyncio.sleep(latency)
+        return CANNED_README
+
+    llm_service.generate_text = generate_text
@@ -1,4 +1,5 @@
 import pytest
+from app.core.config import settings
 from app.services.chunker_service import ChunkerService
 
 def test_text_chunking():
@@ -27,4 +28,258 @@ def function2():
     chunks = chunker.chunk_text(code, source_type="code")
     
     assert len(chunks) > 0
-    assert all(chunk["is_code_block"] for chunk in chunks)
\ No newline at end of file
+    assert all(chunk["is_code_block"] for chunk in chunks)
+
+def test_chunk_offsets():
+    """Test chunks point back into the source by char and token offsets"""
+    chunker = ChunkerService()
+    
+    text = " ".join(f"Sentence number {i} talks about blockchains." for i in range(400))
+    chunks = chunker.chunk_text(text, source_type="text")
+    
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk["start_char"]:chunk["end_char"]] == chunk["content"]
+        assert chunk["start_token"] < chunk["end_token"]
+    
+    # Consecutive chunks overlap by a token range, never skip tokens
+    for prev, curr in zip(chunks, chunks[1:]):
+        assert prev["start_token"] < curr["start_token"] <= prev["end_token"]
+    assert chunks[-1]["end_char"] == len(text)
+
+
+def test_chunk_stream_matches_chunk_text():
+    """Test streaming small segments yields the same chunks as one-shot chunking"""
+    chunker = ChunkerService()
+    
+    text = " ".join(f"Sentence number {i} talks about blockchains." for i in range(2000))
+    segments = (text[i:i + 500] for i in range(0, len(text), 500))
+    
+    streamed = list(chunker.chunk_stream(segments, source_type="text"))
+    expected = chunker.chunk_text(text, source_type="text")
+    
+    assert [c["content"] for c in streamed] == [c["content"] for c in expected]
+    assert [c["chunk_index"] for c in streamed] == list(range(len(expected)))
+
+
+def test_python_symbol_boundaries():
+    """Test Python code is cut at function/class boundaries with symbol paths"""
+    chunker = ChunkerService()
+    
+    body = "\n".join(f"        total += step_{i}(value)" for i in range(400))
+    code = f'''import os
+
+
+def helper():
+    return 1
+
+
+class Wallet:
+    def deposit(self, value):
+        total = 0
+{body}
+        return total
+
+    def balance(self):
+        return 0
+'''
+    chunks = chunker.chunk_text(code, source_type="code", source_file="wallet.py")
+    
+    assert len(chunks) > 1
+    assert chunks[0]["symbols"] == ["helper"]
+    assert any(c["symbol_path"] == "Wallet.deposit" for c in chunks)
+    assert "def balance" in chunks[-1]["content"]
+    # Methods are never glued to the middle of an oversized sibling
+    assert all("def helper" not in c["content"] for c in chunks[1:])
+
+
+def test_javascript_brace_boundaries():
+    """Test JS is cut at function/class boundaries, ignoring braces in strings and comments"""
+    chunker = ChunkerService()
+    
+    body = "\n".join(f"    total += step{i}(value);" for i in range(400))
+    code = f"""function helper() {{
+  // a stray {{ in a comment
+  return 1;
+}}
+
+class Wallet {{
+  deposit(value) {{
+    let total = 0;
+    const open = "{{";
+{body}
+    return total;
+  }}
+
+  balance() {{
+    return '{{';
+  }}
+}}
+"""
+    chunks = chunker.chunk_text(code, source_type="code", source_file="wallet.js")
+    
+    assert len(chunks) > 1
+    assert chunks[0]["symbols"] == ["helper"]
+    assert chunks[0]["content"].rstrip().endswith("}")
+    # Unstripped braces would nest Wallet under helper and balance under deposit
+    assert any(c["symbol_path"] == "Wallet.deposit" for c in chunks)
+    assert chunks[-1]["symbol_path"] == "Wallet.balance"
+    assert all("function helper" not in c["content"] for c in chunks[1:])
+
+
+def test_go_brace_boundaries_and_unbalanced_fallback():
+    """Test Go functions and methods are separate chunks, and an unclosed block runs to the end"""
+    chunker = ChunkerService()
+    
+    body = "\n".join(f"\ttotal += step{i}(value)" for i in range(400))
+    code = f"""package wallet
+
+func Helper() int {{
+\treturn 1
+}}
+
+func (w *Wallet) Deposit(value int) int {{
+\ttotal := 0
+{body}
+\treturn total
+}}
+
+func (w *Wallet) Balance() int {{
+\treturn 0
+}}
+"""
+    chunks = chunker.chunk_text(code, source_type="code", source_file="wallet.go")
+    
+    assert len(chunks) > 1
+    assert "Helper" in chunks[0]["symbols"]
+    assert "func Helper" in chunks[0]["content"]
+    assert any(c["symbol_path"] == "Deposit" for c in chunks)
+    assert chunks[-1]["symbol_path"] == "Balance"
+    assert chunks[-1]["content"].lstrip().startswith("func (w *Wallet) Balance")
+    
+    # Balance's closing brace missing: it still becomes its own symbol, up to the end of file
+    unbalanced = chunker.chunk_text(code.rstrip().rstrip("}"), source_type="code", source_file="wallet.go")
+    assert any(c["symbol_path"] == "Deposit" for c in unbalanced)
+    assert unbalanced[-1]["symbol_path"] == "Balance"
+    assert unbalanced[-1]["content"].rstrip().endswith("return 0")
+
+
+@pytest.fixture
+def chunk_pool(monkeypatch):
+    """Two-worker chunking pool, stopped after the test"""
+    from app.services.chunker_service import shutdown_chunk_pool
+    monkeypatch.setattr(settings, "CHUNK_PARALLEL", True)
+    monkeypatch.setattr(settings, "CHUNK_WORKERS", 2)
+    shutdown_chunk_pool()
+    yield
+    shutdown_chunk_pool()
+
+
+@pytest.mark.asyncio
+async def test_parallel_chunking_matches_serial(chunk_pool, monkeypatch):
+    """Test the process pool yields the same chunks, in the same order, as serial and streamed chunking"""
+    chunker = ChunkerService()
+    documents = [
+        (" ".join(f"Lecture {d} point {i} is important." for i in range(1500)), "text", f"l{d}.txt")
+        for d in range(4)
+    ]
+    
+    parallel = [table.to_dicts() async for table in chunker.chunk_documents(documents)]
+    # Single-file uploads stream the file in blocks instead
+    streamed = [
+        list(chunker.chunk_stream((text[i:i + 4096] for i in range(0, len(text), 4096)), source_type, name))
+        for text, source_type, name in documents
+    ]
+    
+    monkeypatch.setattr(settings, "CHUNK_PARALLEL", False)
+    serial = [table.to_dicts() async for table in chunker.chunk_documents(documents)]
+    
+    assert parallel == serial
+    assert parallel == streamed
+    assert [chunks[0]["source_file"] for chunks in parallel] == ["l0.txt", "l1.txt", "l2.txt", "l3.txt"]
+
+
+@pytest.mark.asyncio
+async def test_chunk_documents_can_return_failures_in_place(monkeypatch):
+    """Test a document that fails to chunk yields its error and the others still yield tables"""
+    monkeypatch.setattr(settings, "CHUNK_PARALLEL", False)
+    chunker = ChunkerService()
+    chunk_table = chunker.chunk_table
+    
+    def flaky_chunk_table(text, source_type="text", source_file=None):
+        if source_file == "bad.txt":
+            raise ValueError("unparseable")
+        return chunk_table(text, source_type, source_file)
+    
+    monkeypatch.setattr(chunker, "chunk_table", flaky_chunk_table)
+    documents = [("Some lecture text.", "text", name) for name in ("a.txt", "bad.txt", "c.txt")]
+    
+    results = [table async for table in chunker.chunk_documents(documents, return_exceptions=True)]
+    assert isinstance(results[1], ValueError)
+    assert [results[0].source_file, results[2].source_file] == ["a.txt", "c.txt"]
+    with pytest.raises(ValueError):
+        [table async for table in chunker.chunk_documents(documents)]
+
+
+def test_markdown_sections(monkeypatch):
+    """Test markdown keeps fenced code and tables whole and records heading paths"""
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 120)
+    monkeypatch.setattr(settings, "MIN_CHUNK_SIZE", 20)
+    chunker = ChunkerService()
+    
+    intro = " ".join(f"Blocks link to the previous block number {i}." for i in range(12))
+    code = "\n".join(f"    balance[{i}] = {i}. # ends with a period." for i in range(12))
+    notes = f"""# Blockchain
+
+## Basics
+
+{intro}
+
+## Smart Contracts
+
+```python
+def transfer():
+{code}
+```
+
+| Term | Meaning. |
+|------|----------|
+| Gas | Fee. |
+"""
+    chunks = chunker.chunk_text(notes, source_type="text", source_file="notes.md")
+    
+    fenced = [c for c in chunks if "```python" in c["content"]]
+    assert len(fenced) == 1 and fenced[0]["content"].count("```") == 2
+    assert fenced[0]["heading_path"] == "Blockchain > Smart Contracts"
+    # A chunk spanning several headings keeps the path they share
+    assert chunks[0]["heading_path"] == "Blockchain"
+    assert all(not c["content"].rstrip().endswith("## Smart Contracts") for c in chunks)
+
+
+def test_chunk_table_shares_source():
+    """Test chunk tables point into one source buffer and materialize on demand"""
+    chunker = ChunkerService()
+    
+    text = " ".join(f"Sentence number {i} talks about blockchains." for i in range(400))
+    table = chunker.chunk_table(text, source_type="text", source_file="notes.txt")
+    
+    assert table.source is text
+    assert len(table) > 1
+    assert table.content(1) == text[table.starts[1]:table.ends[1]]
+    assert table.to_dicts() == chunker.chunk_text(text, source_type="text", source_file="notes.txt")
+
+def test_content_hash_keeps_code_layout():
+    """Test code chunks differing in indentation or line breaks hash apart, prose does not"""
+    from app.services.chunk_table import content_hash
+    
+    nested = "if ready:\n    if valid:\n        run()\n    stop()"
+    flat = "if ready:\n    if valid:\n        run()\n        stop()"
+    assert content_hash(nested, is_code=True) != content_hash(flat, is_code=True)
+    assert content_hash("x = 1\ny = 2", is_code=True) != content_hash("x = 1 y = 2", is_code=True)
+    # Line endings and trailing whitespace don't change what the code does
+    assert content_hash("x = 1  \r\ny = 2\r\n", is_code=True) == content_hash("x = 1\ny = 2", is_code=True)
+    assert content_hash("Some  prose\nwrapped.") == content_hash("Some prose wrapped.")
+    
+    chunker = ChunkerService()
+    chunks = chunker.chunk_text(nested, source_type="code", source_file="a.py")
+    assert chunks[0]["content_hash"] == content_hash(chunks[0]["content"], is_code=True)
@@ -0,0 +1,55 @@
+from app.services.context_builder import build_context, count_tokens, group_chunks, trim_to_tokens
+
+
+def _sentences(n, start=0):
+    return " ".join(f"Sentence number {i} explains one idea." for i in range(start, start + n))
+
+
+def test_build_context_respects_budget_and_order():
+    """Test whole chunks are packed best first and the overflow chunk is trimmed"""
+    chunks = [{"id": str(i), "content": _sentences(20, i * 100)} for i in range(5)]
+    budget = count_tokens(chunks[0]["content"]) * 2 + 100
+    
+    packed = build_context(chunks, budget)
+    
+    assert packed["tokens"] <= budget
+    assert count_tokens(packed["context"]) <= budget
+    assert [c["id"] for c in packed["chunks"]] == ["0", "1", "2"]
+    assert packed["chunks"][2].get("trimmed")
+    assert packed["dropped"] == 2
+
+
+def test_trim_cuts_at_sentence_boundary():
+    """Test trimmed chunks end on a full sentence"""
+    text = _sentences(30)
+    trimmed = trim_to_tokens(text, count_tokens(text) // 2)
+    assert trimmed.endswith("idea.")
+    assert text.startswith(trimmed)
+    assert trim_to_tokens(text, count_tokens(text)) == text
+
+
+def test_small_leftover_is_not_trimmed_into():
+    """Test a chunk is skipped rather than cut to a useless sliver"""
+    chunks = [{"id": "a", "content": _sentences(10)}, {"id": "b", "content": _sentences(10)}]
+    packed = build_context(chunks, count_tokens(chunks[0]["content"]) + 10)
+    assert [c["id"] for c in packed["chunks"]] == ["a"]
+    assert build_context(chunks, 0)["chunks"] == []
+
+
+def test_group_chunks_splits_per_file_within_budget():
+    """Test README map groups stay within budget and never span two files"""
+    chunks = [
+        {"id": f"{name}{i}", "source_file": name, "content": _sentences(10, i * 10)}
+        for name in ("a.md", "b.md")
+        for i in range(5)
+    ]
+    chunks.append({"id": "big", "source_file": "b.md", "content": _sentences(200)})
+    budget = count_tokens(chunks[0]["content"]) * 2 + 10
+    
+    groups = list(group_chunks(chunks, budget))
+    
+    assert all(len({c["source_file"] for c in group}) == 1 for group in groups)
+    assert all(count_tokens("\n\n".join(c["content"] for c in group)) <= budget for group in groups)
+    assert [c["id"] for group in groups for c in group] == [c["id"] for c in chunks]
+    assert groups[-1][0].get("trimmed")
+    assert len(list(group_chunks(chunks, budget, by_file=False))) < len(groups)
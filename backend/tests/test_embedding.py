@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import numpy as np
+import pytest
+from app.services.embedding_service import EmbeddingService
+from app.services.embedding_providers import plan_batches
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+@pytest.mark.asyncio
+async def test_embed_batch_matrix():
+    """Test batch embeddings come back as one contiguous float32 matrix"""
+    service = EmbeddingService(provider="hash")
+    
+    embeddings = await service.embed_batch(["first chunk", "second chunk", ""])
+    
+    assert isinstance(embeddings, np.ndarray)
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (3, service.embedding_dim)
+    assert embeddings.flags["C_CONTIGUOUS"]
+
+
+@pytest.mark.asyncio
+async def test_embed_batch_matches_per_text_hash():
+    """Test the vectorized path reproduces the original per-text vectors"""
+    service = EmbeddingService(provider="hash")
+    text = "Merkle trees let light clients verify transactions"
+    
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    expected = [
+        (digest[i % len(digest)] ^ digest[(i + 1) % len(digest)]) / 255.0
+        for i in range(service.embedding_dim)
+    ]
+    
+    embeddings = await service.embed_batch([text])
+    single = await service.generate_embeddings(text)
+    
+    assert np.allclose(embeddings[0], expected, atol=1e-6)
+    assert np.allclose(single, expected, atol=1e-6)
+
+
+def test_plan_batches_bounds():
+    """Test inference batches respect item and padded-token limits"""
+    lengths = [5, 120, 7, 6, 118, 512, 8]
+    
+    batches = plan_batches(lengths, max_items=3, max_tokens=300)
+    
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 3
+        assert len(batch) == 1 or len(batch) * max(lengths[i] for i in batch) <= 300
+    # Short texts are grouped together instead of being padded to a long one
+    assert [0, 3, 2] in batches
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_computes_each_text_once():
+    """Test the cache only computes distinct, unseen texts and keeps input order"""
+    cache = EmbeddingCache(max_bytes=1024 * 1024)
+    calls = []
+    
+    async def compute(texts):
+        calls.append(list(texts))
+        return np.array([[len(t), 0.0, 1.0] for t in texts], dtype=np.float32)
+    
+    first = await cache.get_or_compute("model", ["aa", "b", "aa"], 3, compute)
+    second = await cache.get_or_compute("model", ["b", "ccc", "aa"], 3, compute)
+    
+    assert calls == [["aa", "b"], ["ccc"]]
+    assert first[:, 0].tolist() == [2, 1, 2]
+    assert second[:, 0].tolist() == [1, 3, 2]
+    assert cache.stats()["misses"] == 4
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_keys_code_by_its_layout():
+    """Test code differing only in indentation is embedded separately, prose whitespace is not"""
+    from app.services.chunk_table import content_hash
+    
+    cache = EmbeddingCache(max_bytes=1024 * 1024)
+    calls = []
+    
+    async def compute(texts):
+        calls.append(list(texts))
+        return np.ones((len(texts), 3), dtype=np.float32)
+    
+    nested, flat = "if a:\n    if b:\n        f()\n    g()", "if a:\n    if b:\n        f()\n        g()"
+    await cache.get_or_compute("model", [nested, flat], 3, compute, is_code=[True, True])
+    await cache.get_or_compute("model", ["two  words", "two words"], 3, compute)
+    
+    assert calls == [[nested, flat], ["two  words"]]
+    assert cache.key("model", nested, True) == f"emb:model:{content_hash(nested, True)}"
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_byte_bound():
+    """Test the in-process tier evicts least recently used vectors past its byte bound"""
+    vector_bytes = 4 * 4
+    cache = EmbeddingCache(max_bytes=2 * vector_bytes)
+    
+    async def compute(texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+    
+    for text in ["one", "two", "three"]:
+        await cache.get_or_compute("model", [text], 4, compute)
+    
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= 2 * vector_bytes
+    assert cache._get_local(cache.key("model", "one")) is None
+
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_concurrent_queries():
+    """Test concurrent query embeddings are served by batched calls, in order"""
+    batches = []
+    
+    async def embed_batch(texts):
+        batches.append(list(texts))
+        return np.array([[float(t)] for t in texts], dtype=np.float32)
+    
+    batcher = EmbeddingBatcher(embed_batch, max_delay=0.01, max_batch=4)
+    results = await asyncio.gather(*(batcher.embed(str(i)) for i in range(10)))
+    
+    assert [float(r[0]) for r in results] == list(range(10))
+    assert [len(b) for b in batches] == [4, 4, 2]
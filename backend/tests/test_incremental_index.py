@@ -0,0 +1,190 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from app.core.config import settings
+from app.services.chunk_table import content_hash
+from app.services.lexical_index import LexicalIndexService
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """VectorStoreService over a local store in tmp_path"""
+    monkeypatch.setattr(settings, "VECTOR_DB", "local")
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_DIR", str(tmp_path / "vectors"))
+    from app.services.vectorstore_service import VectorStoreService
+    service = VectorStoreService()
+    yield service
+    service.shutdown()
+
+
+def _chunk(text, source_file, index=0):
+    return {
+        "id": f"{source_file}-{index}",
+        "content": text,
+        "content_hash": content_hash(text),
+        "source_file": source_file,
+        "chunk_index": index,
+    }
+
+
+def test_remove_source_detaches_shared_and_deletes_sole_vectors(store):
+    """Test a vector shared with another file survives under it, one only this file used is deleted"""
+    shared = "Gradient descent updates weights against the gradient."
+    only_a = "Momentum keeps a running average of past gradients."
+    chunks = [_chunk(shared, "a.md", 0), _chunk(only_a, "a.md", 1), _chunk(shared, "b.md", 0)]
+    ids = [content_hash(shared), content_hash(only_a)]
+
+    async def run():
+        async with store.batch_writer("p1") as writer:
+            await writer.add(chunks)
+        removed = await store.remove_source("p1", ids, "a.md")
+        return removed, await store.get_chunks("p1", ids)
+
+    removed, remaining = asyncio.run(run())
+    assert removed == {"deleted": 1, "detached": 1, "deleted_ids": [content_hash(only_a)]}
+    assert [chunk["id"] for chunk in remaining] == [content_hash(shared)]
+    assert remaining[0]["metadata"]["source_file"] == "b.md"
+    assert json.loads(remaining[0]["metadata"]["source_files"]) == ["b.md"]
+
+
+def _replace_job(tmp_path, monkeypatch, chunk_counts, parallel_max_chars=None):
+    """
+    Run an incremental upload that replaces file old-id, with chunking, indexing and
+    file removal replaced by recorders; returns the recorded events. With
+    parallel_max_chars the files go through the pool path, in batches of that size.
+    A file whose count is an exception fails: in chunking on the pool path, in
+    ingest on the serial one.
+    """
+    try:
+        from app.services import job_queue
+    except Exception as e:  # Needs the ORM models and a server database engine
+        pytest.skip(f"job queue unavailable: {e}")
+    monkeypatch.setattr(settings, "CHUNK_PARALLEL", parallel_max_chars is not None)
+    monkeypatch.setattr(settings, "CHUNK_PARALLEL_MAX_CHARS", parallel_max_chars or 0)
+    monkeypatch.setattr(job_queue, "lexical_index", LexicalIndexService(str(tmp_path / "lexical")))
+    events = []
+
+    async def ingest(job, db, project_id, name, chunks, keywords=None, total_chars=0):
+        events.append(("ingest", name))
+        if isinstance(chunk_counts[name], Exception):
+            raise chunk_counts[name]
+        return chunk_counts[name]
+
+    async def remove(db, project_id, file_record):
+        events.append(("remove", file_record.id))
+
+    async def chunk_documents(documents, return_exceptions=False):
+        events.append(("chunk", [name for _, _, name in documents]))
+        for text, _, name in documents:
+            if isinstance(chunk_counts[name], Exception):
+                yield chunk_counts[name]
+            else:
+                yield SimpleNamespace(source=text, iter_dicts=lambda: iter(()))
+
+    monkeypatch.setattr(job_queue, "_ingest_chunks", ingest)
+    monkeypatch.setattr(job_queue.chunker_service, "chunk_documents", chunk_documents)
+    monkeypatch.setattr(job_queue, "remove_file_from_index", remove)
+
+    old_file = SimpleNamespace(id="old-id", filename="notes.md")
+    query = SimpleNamespace(filter=lambda *args: query, first=lambda: old_file)
+    db = SimpleNamespace(add=lambda record: None, commit=lambda: None, query=lambda *args: query)
+
+    paths = []
+    for name in chunk_counts:
+        path = tmp_path / name
+        path.write_text(f"Lecture notes for {name}. " * 20)
+        paths.append(str(path))
+    job = SimpleNamespace(
+        project_id="p1",
+        current_step=None,
+        progress=0,
+        input_data={
+            "files": paths,
+            "project_name": "P",
+            "incremental": True,
+            "replaces": {"notes_v2.md": "old-id"},
+        },
+    )
+    asyncio.run(job_queue.process_upload_job(job, db))
+    return events
+
+
+def test_replace_removes_old_file_after_new_version_is_indexed(tmp_path, monkeypatch):
+    """Test the old file's chunks stay searchable until its replacement is in"""
+    events = _replace_job(tmp_path, monkeypatch, {"notes_v2.md": 3})
+    assert events == [("ingest", "notes_v2.md"), ("remove", "old-id")]
+
+
+def test_replace_keeps_old_file_when_new_version_is_empty(tmp_path, monkeypatch):
+    """Test a replacement that yields no chunks leaves the old file in place"""
+    events = _replace_job(tmp_path, monkeypatch, {"notes_v2.md": 0, "other.md": 2})
+    assert ("remove", "old-id") not in events
+
+
+def test_parallel_upload_chunks_parsed_files_in_bounded_batches(tmp_path, monkeypatch):
+    """Test parsed text is handed to the pool once it reaches the limit, not after every file"""
+    counts = {"a.md": 1, "b.md": 1, "notes_v2.md": 1}
+    # Each file is ~500 chars: two fill a batch, the last is flushed after the loop
+    events = _replace_job(tmp_path, monkeypatch, counts, parallel_max_chars=900)
+    assert events == [
+        ("chunk", ["a.md", "b.md"]),
+        ("ingest", "a.md"),
+        ("ingest", "b.md"),
+        ("chunk", ["notes_v2.md"]),
+        ("ingest", "notes_v2.md"),
+        ("remove", "old-id"),
+    ]
+
+
+@pytest.mark.parametrize("parallel_max_chars", [None, 900])
+def test_failing_file_is_skipped_and_the_rest_ingested(tmp_path, monkeypatch, parallel_max_chars):
+    """Test one file failing to chunk or embed doesn't abort the upload or the rest of its batch"""
+    counts = {"a.md": RuntimeError("embedding service down"), "b.md": 2, "notes_v2.md": 1}
+    events = _replace_job(tmp_path, monkeypatch, counts, parallel_max_chars=parallel_max_chars)
+    assert ("ingest", "b.md") in events
+    assert ("ingest", "notes_v2.md") in events
+    assert events[-1] == ("remove", "old-id")
+
+
+def test_failed_ingest_rolls_back_the_files_chunks(store, tmp_path, monkeypatch):
+    """Test a file failing partway leaves no chunk rows, vectors or keyword docs, but shared vectors stay"""
+    try:
+        from app.services import job_queue
+    except Exception as e:  # Needs the ORM models and a server database engine
+        pytest.skip(f"job queue unavailable: {e}")
+    from app.services import vectorstore_service
+    monkeypatch.setattr(settings, "CHUNK_BATCH_SIZE", 2)
+    monkeypatch.setattr(vectorstore_service, "vectorstore_service", store)
+    monkeypatch.setattr(job_queue, "vectorstore_service", store)
+    lexical = LexicalIndexService(str(tmp_path / "lexical"))
+    monkeypatch.setattr(job_queue, "lexical_index", lexical)
+    
+    deleted = []
+    query = SimpleNamespace(filter=lambda *args: query, delete=lambda **kwargs: deleted.append(True))
+    db = SimpleNamespace(
+        add=lambda record: None, commit=lambda: None, rollback=lambda: None, query=lambda *args: query
+    )
+    job = SimpleNamespace(current_step=None, progress=0)
+    shared = "Dynamic programming stores the answers to overlapping subproblems."
+    own = ["Memoization caches a recursive function by its arguments.", "Tabulation fills the table bottom-up."]
+    
+    def failing_stream():
+        yield from (_chunk(text, "b.md", i) for i, text in enumerate([shared] + own))
+        raise RuntimeError("chunker crashed")
+    
+    async def run():
+        keywords = lexical.writer("p1")
+        await job_queue._ingest_chunks(job, db, "p1", "a.md", [_chunk(shared, "a.md")], keywords)
+        with pytest.raises(RuntimeError):
+            await job_queue._ingest_chunks(job, db, "p1", "b.md", failing_stream(), keywords)
+        await keywords.flush()
+        ids = [content_hash(text) for text in [shared] + own]
+        return await store.get_chunks("p1", ids), lexical.get("p1").doc_count
+    
+    remaining, keyword_docs = asyncio.run(run())
+    assert deleted
+    assert [chunk["id"] for chunk in remaining] == [content_hash(shared)]
+    assert json.loads(remaining[0]["metadata"]["source_files"]) == ["a.md"]
+    assert keyword_docs == 1
@@ -0,0 +1,98 @@
+import asyncio
+from app.core.config import settings
+from app.services.lexical_index import LexicalIndexService, reciprocal_rank_fusion, tokenize
+
+
+def _chunks(texts):
+    return [{"id": f"chunk{i}", "content": text} for i, text in enumerate(texts)]
+
+
+def test_tokenize_splits_identifiers():
+    """Test identifiers index both whole and by their parts"""
+    tokens = tokenize("Call parseJSONFile or load_data()")
+    assert "parsejsonfile" in tokens
+    assert {"parse", "json", "file"} <= set(tokens)
+    assert {"load_data", "load", "data"} <= set(tokens)
+
+
+def test_bm25_ranks_exact_identifier_first(tmp_path):
+    """Test a rare identifier outranks documents that only share common words"""
+    service = LexicalIndexService(str(tmp_path))
+    texts = [f"the function returns the value number {i}" for i in range(50)]
+    texts.append("the function calculate_gradient_norm returns the value")
+    
+    async def build():
+        writer = service.writer("p1")
+        await writer.add(_chunks(texts))
+        await writer.flush()
+        return await service.search("p1", "calculate_gradient_norm function", top_k=3)
+    
+    hits = asyncio.run(build())
+    assert hits[0][0] == "chunk50"
+    assert hits[0][1] > hits[1][1]
+
+
+def test_segments_merge_and_reload(tmp_path, monkeypatch):
+    """Test incremental segments merge, survive a reload and skip re-added chunks"""
+    monkeypatch.setattr(settings, "LEXICAL_MAX_SEGMENTS", 2)
+    texts = [f"lecture {i} covers topic{i} in depth" for i in range(30)]
+    chunks = _chunks(texts)
+    
+    async def build():
+        service = LexicalIndexService(str(tmp_path))
+        for start in range(0, 30, 10):
+            writer = service.writer("p1")
+            await writer.add(chunks[start:start + 10])
+            await writer.flush()
+        writer = service.writer("p1")
+        await writer.add(chunks[:5])
+        await writer.flush()
+        return writer.added
+    
+    assert asyncio.run(build()) == 0
+    
+    reloaded = LexicalIndexService(str(tmp_path)).get("p1")
+    reloaded.refresh()
+    assert len(reloaded.segments) == 1
+    assert reloaded.doc_count == 30
+    assert reloaded.search("topic17", top_k=1)[0][0] == "chunk17"
+
+
+
+def test_removed_docs_are_tombstoned_then_purged(tmp_path):
+    """Test removed docs stop matching and counting at once, and a merge drops them"""
+    texts = [f"notes on sorting algorithm number {i}" for i in range(10)] + ["quicksort partition pivot"]
+    service = LexicalIndexService(str(tmp_path))
+    
+    async def build():
+        writer = service.writer("p1")
+        await writer.add(_chunks(texts))
+        await writer.flush()
+        assert await service.remove("p1", ["chunk10", "missing"]) == 1
+    
+    asyncio.run(build())
+    index = LexicalIndexService(str(tmp_path)).get("p1")
+    assert index.search("quicksort pivot", top_k=3) == []
+    assert index.doc_count == 10
+    assert not index.contains("chunk10")
+    
+    # Re-adding the same content after removal makes it searchable again
+    async def readd():
+        writer = service.writer("p1")
+        await writer.add(_chunks(texts)[10:])
+        await writer.flush()
+    
+    asyncio.run(readd())
+    assert index.search("quicksort pivot", top_k=3)[0][0] == "chunk10"
+    
+    index.remove([f"chunk{i}" for i in range(5)])
+    assert len(index.segments) == 1
+    assert index.deleted == {}
+    assert index.doc_count == 6
+
+
+def test_reciprocal_rank_fusion():
+    """Test ids ranked well in both lists beat ids ranked first in one"""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]], k=60)
+    assert [doc_id for doc_id, _ in fused][:2] == ["b", "a"]
+    assert {doc_id for doc_id, _ in fused} == {"a", "b", "c", "d"}
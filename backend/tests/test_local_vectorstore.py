@@ -0,0 +1,151 @@
+import json
+import multiprocessing
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services import local_vectorstore
+from app.services.local_vectorstore import LocalVectorClient
+
+
+def _vectors(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_local_collection_roundtrip(tmp_path):
+    """Test add, query, update and delete persist across a reload"""
+    vectors = _vectors(50)
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("project_a")
+    collection.add(
+        ids=[f"id{i}" for i in range(50)],
+        embeddings=vectors.tolist(),
+        documents=[f"doc {i}" for i in range(50)],
+        metadatas=[{"source_file": "a.txt" if i % 2 else "b.txt"} for i in range(50)]
+    )
+    collection.update(ids=["id3"], metadatas=[{"source_files": json.dumps(["a.txt", "c.txt"])}])
+    collection.delete(ids=["id7"])
+    
+    reloaded = LocalVectorClient(str(tmp_path)).get_collection("project_a")
+    assert reloaded.count() == 49
+    
+    results = reloaded.query(query_embeddings=[vectors[3].tolist()], n_results=3)
+    assert results["ids"][0][0] == "id3"
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-4)
+    assert results["metadatas"][0][0]["source_files"] == json.dumps(["a.txt", "c.txt"])
+    
+    assert "id7" not in reloaded.query(query_embeddings=[vectors[7].tolist()], n_results=5)["ids"][0]
+    filtered = reloaded.query(query_embeddings=[vectors[3].tolist()], n_results=10, where={"source_file": "b.txt"})
+    assert all(m["source_file"] == "b.txt" for m in filtered["metadatas"][0])
+
+
+def test_local_collection_discards_uncommitted_append(tmp_path):
+    """Test a crash mid-append leaves the last committed state intact"""
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("project_a")
+    collection.add(ids=["a", "b"], embeddings=_vectors(2).tolist(), documents=["a", "b"])
+    
+    # Simulate vectors and a log record written without the manifest commit
+    with open(collection._vectors_file, "ab") as f:
+        f.write(_vectors(1).tobytes())
+    with open(collection._records_file, "ab") as f:
+        f.write(b'{"op": "add", "id": "c", "document": "c", "metadata": {}}\n')
+    
+    reloaded = LocalVectorClient(str(tmp_path)).get_collection("project_a")
+    assert reloaded.count() == 2
+    assert reloaded.get(ids=["c"])["ids"] == []
+
+
+def test_local_collection_compaction(tmp_path, monkeypatch):
+    """Test superseded and deleted rows are compacted away without changing results"""
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_COMPACT_MIN_DEAD", 10)
+    vectors = _vectors(40)
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("project_a")
+    ids = [f"id{i}" for i in range(40)]
+    collection.upsert(ids=ids, embeddings=vectors.tolist(), documents=ids)
+    collection.upsert(ids=ids[:10], embeddings=(vectors[:10] + 1).tolist(), documents=ids[:10])
+    collection.delete(ids=ids[10:15])
+    
+    assert collection._generation >= 1
+    assert collection._rows == 35
+    reloaded = LocalVectorClient(str(tmp_path)).get_collection("project_a")
+    assert reloaded.query(query_embeddings=[(vectors[4] + 1).tolist()], n_results=1)["ids"][0] == ["id4"]
+    assert reloaded.count() == 35
+
+
+def test_local_collection_ivf_recall(tmp_path, monkeypatch):
+    """Test the approximate index finds the exact nearest neighbour for near-duplicate queries"""
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_IVF_MIN_ROWS", 1000)
+    vectors = _vectors(4000, dim=32)
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("project_a")
+    collection.add(ids=[str(i) for i in range(4000)], embeddings=vectors.tolist())
+    
+    hits = sum(
+        collection.query(query_embeddings=[(vectors[i] + 0.01).tolist()], n_results=1)["ids"][0] == [str(i)]
+        for i in range(0, 4000, 100)
+    )
+    assert collection._ivf is not None
+    assert hits >= 38
+
+
+def test_local_collection_filtered_query_fills_top_k(tmp_path):
+    """Test where filters are applied before scoring, so every result slot matches"""
+    vectors = _vectors(200)
+    metadatas = [
+        {"source_file": f"file{i % 4}.py", "is_code": i % 3 == 0, "chunk_index": i}
+        for i in range(200)
+    ]
+    collection = LocalVectorClient(str(tmp_path)).get_or_create_collection("project_a")
+    collection.add(ids=[str(i) for i in range(200)], embeddings=vectors.tolist(), metadatas=metadatas)
+    
+    where = {"$and": [
+        {"source_file": {"$in": ["file1.py", "file2.py"]}},
+        {"is_code": {"$eq": True}},
+        {"chunk_index": {"$gte": 20}},
+    ]}
+    expected = {str(i) for i in range(200) if i % 4 in (1, 2) and i % 3 == 0 and i >= 20}
+    
+    results = collection.query(query_embeddings=[vectors[0].tolist()], n_results=10, where=where)
+    assert len(results["ids"][0]) == 10
+    assert set(results["ids"][0]) <= expected
+    assert set(collection.get(where=where)["ids"]) == expected
+
+
+def _write_rows(path, prefix, n, seed):
+    """Child process: upsert rows one call at a time, deleting every third"""
+    collection = LocalVectorClient(path).get_or_create_collection("project_a")
+    vectors = _vectors(n, seed=seed)
+    for i in range(n):
+        collection.upsert(ids=[f"{prefix}{i}"], embeddings=[vectors[i].tolist()], documents=[f"{prefix}{i}"])
+        if i % 3 == 0:
+            collection.delete(ids=[f"{prefix}{i}"])
+
+
+@pytest.mark.skipif(local_vectorstore.fcntl is None, reason="needs fcntl")
+def test_local_collection_shared_between_processes(tmp_path, monkeypatch):
+    """Test processes writing one collection concurrently see each other's writes without corrupting it"""
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_COMPACT_MIN_DEAD", 5)  # Compactions race the writers too
+    reader = LocalVectorClient(str(tmp_path)).get_or_create_collection("project_a")
+    reader.add(ids=["a"], embeddings=_vectors(1).tolist(), documents=["a"])
+    
+    context = multiprocessing.get_context("fork")
+    writers = [
+        context.Process(target=_write_rows, args=(str(tmp_path), prefix, 60, seed))
+        for seed, prefix in enumerate("xy", start=1)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(timeout=60)
+        assert writer.exitcode == 0
+    
+    expected = {"a"} | {f"{prefix}{i}" for prefix in "xy" for i in range(60) if i % 3}
+    assert reader.count() == len(expected)
+    assert set(reader.get()["ids"]) == expected
+    assert reader.query(query_embeddings=[_vectors(60, seed=1)[4].tolist()], n_results=1)["ids"][0] == ["x4"]
+    
+    reader.add(ids=["b"], embeddings=_vectors(1, seed=9).tolist(), documents=["b"])
+    fresh = LocalVectorClient(str(tmp_path)).get_collection("project_a")
+    assert set(fresh.get()["ids"]) == expected | {"b"}
+    
+    LocalVectorClient(str(tmp_path)).delete_collection("project_a")
+    with pytest.raises(ValueError):
+        reader.count()
@@ -0,0 +1,40 @@
+import numpy as np
+from app.services.quantization import QuantizedMatrix
+
+
+def _vectors(n=2000, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_quantized_sizes():
+    """Test float16 and int8 storage shrink vectors 2x and ~4x"""
+    vectors = _vectors()
+    
+    full = QuantizedMatrix.from_float(vectors, "none")
+    half = QuantizedMatrix.from_float(vectors, "float16")
+    int8 = QuantizedMatrix.from_float(vectors, "int8")
+    
+    assert half.nbytes * 2 == full.nbytes
+    assert int8.nbytes < full.nbytes / 3.5
+    assert np.abs(int8.dequantize() - vectors).max() < 0.01
+
+
+def test_quantized_search_matches_exact():
+    """Test dequantize-on-score search finds the same neighbours as float32"""
+    vectors = _vectors()
+    queries = vectors[:20] + 0.01
+    
+    exact, exact_distances = QuantizedMatrix.from_float(vectors, "none").search(queries, 5)
+    
+    for mode in ("float16", "int8"):
+        found, distances = QuantizedMatrix.from_float(vectors, mode).search(queries, 5)
+        assert (found[:, 0] == np.arange(20)).all()
+        assert np.allclose(distances, exact_distances, atol=0.05)
+        assert np.mean([len(set(a) & set(b)) for a, b in zip(found, exact)]) >= 4.5
+    
+    # Searching a subset returns indices into the full matrix
+    rows = np.arange(10, 30)
+    found, _ = QuantizedMatrix.from_float(vectors, "int8").search(vectors[15], 1, rows=rows)
+    assert found[0, 0] == 15
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.services.retrieval_cache import RetrievalCache
+
+
+def test_key_normalizes_query_and_scopes_version():
+    """Test trivially different phrasings share a key, versions and filters don't"""
+    key = RetrievalCache.key("p1", "3", "What is a Closure?", None, 5)
+    assert key == RetrievalCache.key("p1", "3", "  what is a   closure ", None, 5)
+    assert key != RetrievalCache.key("p1", "4", "What is a Closure?", None, 5)
+    assert key != RetrievalCache.key("p1", "3", "What is a Closure?", {"is_code": True}, 5)
+    assert key != RetrievalCache.key("p1", "3", "What is a Closure?", None, 10)
+
+
+def test_local_tier_is_lru_bounded():
+    """Test the in-process tier serves hits and evicts the least recently used entry"""
+    cache = RetrievalCache(max_entries=2, ttl=60)
+    ranked = [{"id": "a", "distance": 0.1, "score": 1.0, "similarity": 0.9}]
+    
+    async def run():
+        await cache.put("k1", ranked)
+        await cache.put("k2", ranked)
+        assert await cache.get("k1") == ranked
+        await cache.put("k3", ranked)
+        return await cache.get("k2")
+    
+    assert asyncio.run(run()) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_worker_refuses_to_start_without_redis_when_results_are_cached(monkeypatch):
+    """Test the worker stops at startup rather than writing indexes it can't invalidate"""
+    try:
+        from app.services import job_queue
+    except Exception as e:  # Needs the ORM models and a server database engine
+        pytest.skip(f"job queue unavailable: {e}")
+    
+    async def connect():
+        raise ConnectionError("redis down")
+    
+    monkeypatch.setattr(redis_client, "connect", connect)
+    monkeypatch.setattr(settings, "ENABLE_RESULT_CACHE", True)
+    with pytest.raises(RuntimeError, match="ENABLE_RESULT_CACHE"):
+        asyncio.run(job_queue.worker_loop())
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services.chunk_table import content_hash
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """VectorStoreService over a local store in tmp_path"""
+    monkeypatch.setattr(settings, "VECTOR_DB", "local")
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_DIR", str(tmp_path / "vectors"))
+    from app.services.vectorstore_service import VectorStoreService
+    service = VectorStoreService()
+    yield service
+    service.shutdown()
+
+
+def _chunks(texts, source_file="notes.md"):
+    return [
+        {
+            "id": f"{source_file}-{i}",
+            "content": text,
+            "content_hash": content_hash(text),
+            "source_file": source_file,
+            "chunk_index": i,
+        }
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_collections_record_and_enforce_embedding_model(store):
+    """Test new collections are tagged with the model, and other models' collections refuse queries and writes"""
+    from app.services.embedding_service import embedding_service
+    from app.services.vectorstore_service import EmbeddingModelMismatch
+
+    async def run():
+        await store.add_chunks("p1", _chunks(["Binary search halves the interval each step."]))
+        query = await embedding_service.embed_query("binary search")
+        assert await store.search("p1", query, top_k=1)
+
+        # Untagged collections predate the model registry and hold hash vectors
+        for project_id, metadata in (("p2", {}), ("p3", {"embedding_model": "sentence-transformers:other"})):
+            store.client.get_or_create_collection(f"project_{project_id}", metadata=metadata).add(
+                ids=["a"], embeddings=[np.ones(len(query)).tolist()], documents=["a"]
+            )
+        return query
+
+    query = asyncio.run(run())
+    model_id = embedding_service.provider.model_id
+    assert store.client.get_collection("project_p1").metadata["embedding_model"] == model_id
+
+    with pytest.raises(EmbeddingModelMismatch):
+        asyncio.run(store.search("p3", query, top_k=1))
+    with pytest.raises(EmbeddingModelMismatch):
+        asyncio.run(store.add_chunks("p3", _chunks(["More notes."])))
+    if model_id != "hash":
+        with pytest.raises(EmbeddingModelMismatch):
+            asyncio.run(store.search("p2", query, top_k=1))
+    else:
+        assert asyncio.run(store.search("p2", query, top_k=1))
+
+    # A reindex drops the old collection; the next write recreates it for the configured model
+    asyncio.run(store.delete_collection("p3"))
+    asyncio.run(store.add_chunks("p3", _chunks(["More notes."])))
+    assert asyncio.run(store.search("p3", query, top_k=1))
+
+
+def test_source_file_filter_matches_deduplicated_chunks(store):
+    """Test filtering on a file finds chunks deduplicated under another file, until it is removed"""
+    from app.services.embedding_service import embedding_service
+    from app.services.vectorstore_service import build_where
+
+    shared = "A hash map trades memory for constant time lookups."
+    chunks = _chunks([shared, "Linked lists insert in constant time."], "a.md") + _chunks([shared], "b.md")
+
+    async def run():
+        async with store.batch_writer("p1") as writer:
+            await writer.add(chunks)
+        query = await embedding_service.embed_query("hash map lookups")
+        before = await store.search("p1", query, top_k=5, where=build_where({"source_files": ["b.md"]}))
+        await store.remove_source("p1", [content_hash(shared)], "b.md")
+        after = await store.search("p1", query, top_k=5, where=build_where({"source_files": ["b.md"]}))
+        still_a = await store.search("p1", query, top_k=5, where=build_where({"source_files": ["a.md"]}))
+        return before, after, still_a
+
+    before, after, still_a = asyncio.run(run())
+    assert [hit["id"] for hit in before] == [content_hash(shared)]
+    assert before[0]["metadata"]["source_file"] == "a.md"
+    assert after == []
+    assert len(still_a) == 2
+
+
+class _Hits(list):
+    """Hit list that records how many entries the merge read"""
+    
+    def __iter__(self):
+        self.read = 0
+        for hit in list.__iter__(self):
+            self.read += 1
+            yield hit
+
+
+def test_search_projects_merges_and_reports_slow_and_failed_projects(store, monkeypatch):
+    """Test the fan-out merge, early break, per-project timeout, deadline and failure reporting"""
+    monkeypatch.setattr(settings, "SEMANTIC_SEARCH_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "SEMANTIC_SEARCH_PROJECT_TIMEOUT", 0.3)
+    monkeypatch.setattr(settings, "SEMANTIC_SEARCH_DEADLINE", 0.6)
+    
+    hits = {
+        "near": _Hits({"id": f"n{i}", "distance": 0.1 * i} for i in range(10)),
+        "far": _Hits({"id": f"f{i}", "distance": 1.0 + i} for i in range(10)),
+        "quick": [{"id": "q0", "distance": 0.15}],
+    }
+    # One at a time: slow times out at ~0.35s, quick ends ~0.45s, late would end ~0.7s
+    delays = {"near": 0.0, "far": 0.05, "slow": 5.0, "broken": 0.0, "quick": 0.1, "late": 0.25}
+    cancelled = []
+    
+    async def search(project_id, query_embedding, top_k=10, where=None, timeout=None):
+        try:
+            await asyncio.sleep(delays[project_id])
+        except asyncio.CancelledError:
+            cancelled.append(project_id)
+            raise
+        if project_id == "broken":
+            raise RuntimeError("collection unavailable")
+        return hits[project_id]
+    
+    monkeypatch.setattr(store, "search", search)
+    found = asyncio.run(store.search_projects(list(delays), [0.0], top_k=3))
+    
+    assert [hit["id"] for hit in found["results"]] == ["n0", "n1", "q0"]
+    assert [hit["project_id"] for hit in found["results"]] == ["near", "near", "quick"]
+    # Sorted lists are read only until a hit can no longer make the top 3
+    assert all(hits[name].read <= 4 for name in ("near", "far"))
+    assert found["failed"] == ["broken"]
+    assert set(found["timed_out"]) == {"slow", "late"}
+    assert found["searched"] == 3
+    assert set(cancelled) == {"slow", "late"}
+
+
+class _FlakyCollection:
+    """Local collection whose upserts are slow, fail on chosen attempts and count concurrency"""
+    
+    def __init__(self, collection, fail_attempts):
+        self._collection = collection
+        self._fail_attempts = set(fail_attempts)
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+    
+    def upsert(self, **kwargs):
+        with self._lock:
+            self.attempts += 1
+            attempt = self.attempts
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.05)
+            if attempt in self._fail_attempts:
+                raise ConnectionError("chroma unavailable")
+            self._collection.upsert(**kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_batch_writer_retries_bounds_writes_and_merges_sources(store, monkeypatch):
+    """Test failed upserts are retried, in-flight writes stay bounded and late duplicates keep their file"""
+    monkeypatch.setattr(settings, "VECTOR_WRITE_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "VECTOR_WRITE_MAX_IN_FLIGHT", 2)
+    monkeypatch.setattr(settings, "VECTOR_WRITE_RETRY_DELAY", 0.01)
+    
+    async def run():
+        collection = _FlakyCollection(await store.create_collection("p1"), fail_attempts={1, 3})
+        
+        async def create_collection(project_id):
+            return collection
+        
+        monkeypatch.setattr(store, "create_collection", create_collection)
+        texts = [f"Lecture paragraph number {i} on graph traversal." for i in range(8)]
+        landed = []
+        async with store.batch_writer("p1", on_batch=landed.append) as writer:
+            await writer.add(_chunks(texts, "a.md"))
+            # Same text from another file while the first writes may still be in flight
+            await writer.add(_chunks(texts[:2], "b.md"))
+        return collection, writer, landed, texts
+    
+    collection, writer, landed, texts = asyncio.run(run())
+    assert writer.written == 8
+    assert collection.count() == 8
+    assert collection.attempts == 4 + 2
+    assert collection.max_in_flight <= 2
+    # Every batch reports progress, including the one that was all duplicates
+    assert sorted(len(batch) for batch in landed) == [2, 2, 2, 2, 2]
+    
+    stored = collection.get(ids=[content_hash(texts[0]), content_hash(texts[5])])["metadatas"]
+    assert json.loads(stored[0]["source_files"]) == ["a.md", "b.md"]
+    assert stored[0]["src:b.md"] is True
+    assert json.loads(stored[1]["source_files"]) == ["a.md"]